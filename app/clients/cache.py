@@ -0,0 +1,130 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class CacheMissError(LookupError):
+    """
+    Raised in offline mode when a requested response is not cached.
+    """
+
+
+class CacheEntry(NamedTuple):
+    payload: Dict[str, Any]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    is_fresh: bool
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of API responses keyed by (endpoint, symbol).
+
+    Entries older than ttl_seconds are still returned but marked stale so the
+    caller can revalidate them with their ETag / Last-Modified validators.
+    When more than max_entries rows are stored, the least recently used ones
+    are evicted.
+
+    Args:
+        path: SQLite database file
+        ttl_seconds: Age after which an entry must be revalidated
+        max_entries: Maximum number of cached responses kept on disk
+    """
+
+    def __init__(self, path: str = "data/cache/fmp_cache.sqlite", ttl_seconds: float = 86400,
+                 max_entries: int = 50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                endpoint TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (endpoint, symbol)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, endpoint: str, symbol: str) -> Optional[CacheEntry]:
+        """
+        Look up a cached response, fresh or stale.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, etag, last_modified, fetched_at FROM responses WHERE endpoint = ? AND symbol = ?",
+                (endpoint, symbol),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE endpoint = ? AND symbol = ?",
+                (now, endpoint, symbol),
+            )
+            self._conn.commit()
+        payload, etag, last_modified, fetched_at = row
+        return CacheEntry(
+            payload=json.loads(payload),
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at,
+            is_fresh=now - fetched_at < self.ttl_seconds,
+        )
+
+    def put(self, endpoint: str, symbol: str, payload: Dict[str, Any], etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        """
+        Store a response and evict least recently used entries beyond max_entries.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (endpoint, symbol, json.dumps(payload), etag, last_modified, now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE rowid IN (
+                    SELECT rowid FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def touch(self, endpoint: str, symbol: str):
+        """
+        Mark an entry as freshly fetched after a successful revalidation.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE endpoint = ? AND symbol = ?",
+                (now, now, endpoint, symbol),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -1,13 +1,44 @@
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from pprint import pprint
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from app import instrumentation
+from app.clients.cache import CacheMissError, ResponseCache
+from app.clients.rate_limiter import RateLimiter
 
 load_dotenv()
 FMP_API_KEY = os.getenv("FMP_API_KEY")
+FMP_BASE_URL = os.getenv("FMP_BASE_URL", "https://financialmodelingprep.com/stable")
+FMP_MAX_IN_FLIGHT = int(os.getenv("FMP_MAX_IN_FLIGHT", "16"))
+FMP_REQUESTS_PER_MINUTE = float(os.getenv("FMP_REQUESTS_PER_MINUTE", "300"))
+FMP_BURST = int(os.getenv("FMP_BURST", "10"))
+FMP_MAX_RETRIES = int(os.getenv("FMP_MAX_RETRIES", "5"))
+FMP_REQUEST_TIMEOUT = float(os.getenv("FMP_REQUEST_TIMEOUT", "10"))
+FMP_CACHE_ENABLED = os.getenv("FMP_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+FMP_CACHE_PATH = os.getenv("FMP_CACHE_PATH", "data/cache/fmp_cache.sqlite")
+FMP_CACHE_TTL = float(os.getenv("FMP_CACHE_TTL", "86400"))
+FMP_CACHE_MAX_ENTRIES = int(os.getenv("FMP_CACHE_MAX_ENTRIES", "50000"))
+FMP_OFFLINE = os.getenv("FMP_OFFLINE", "0").lower() in ("1", "true", "yes")
+
+RATIOS_TTM_ENDPOINT = "ratios-ttm"
+KEY_METRICS_TTM_ENDPOINT = "key-metrics-ttm"
+PROFILE_ENDPOINT = "profile"
+
+_session = None
+_session_lock = threading.Lock()
+_response_cache = None
+_response_cache_lock = threading.Lock()
+rate_limiter = RateLimiter(
+    requests_per_minute=FMP_REQUESTS_PER_MINUTE,
+    burst=FMP_BURST,
+    max_retries=FMP_MAX_RETRIES,
+)
 
 
 def load_metrics_schema(file_path: str) -> Dict[str, Any]:
@@ -17,26 +48,130 @@ def load_metrics_schema(file_path: str) -> Dict[str, Any]:
     with open(file_path) as f:
         return json.load(f)
     
-def fetchFMP_RATIOS_TTM(symbol: str) -> Dict[str, Any]:
+
+def get_session() -> requests.Session:
     """
-    Fetch TTM ratios from Financial Modeling Prep API.
+    Return the process-wide keep-alive session shared by all FMP calls.
+
+    The connection pool is sized to FMP_MAX_IN_FLIGHT so concurrent fetches
+    reuse TLS connections instead of opening a new one per request.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FMP_MAX_IN_FLIGHT)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache, opening it on first use.
+
+    The SQLite file is only created once a request actually needs it, so
+    importing this module has no side effects on disk. None when
+    FMP_CACHE_ENABLED is off.
+    """
+    global _response_cache
+    if not FMP_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(FMP_CACHE_PATH, FMP_CACHE_TTL, FMP_CACHE_MAX_ENTRIES)
+    return _response_cache
+
+
+def fetchFMP_endpoint(endpoint: str, symbol: str) -> Dict[str, Any]:
+    """
+    Fetch the first record of a per-symbol FMP endpoint.
+
+    Fresh responses are served from the response cache. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since, and in offline mode
+    (FMP_OFFLINE) only the cache is read. All network calls go through the
+    shared rate_limiter, which enforces the plan's request budget and retries
+    429/5xx responses. Each attempt is bounded by FMP_REQUEST_TIMEOUT seconds.
     """
-    url = f"https://financialmodelingprep.com/stable/ratios-ttm?symbol={symbol}&apikey={FMP_API_KEY}"
-    response = requests.get(url)
+    response_cache = get_response_cache()
+    entry = response_cache.get(endpoint, symbol) if response_cache is not None else None
+    if entry is not None and entry.is_fresh:
+        instrumentation.increment("fmp_cache_total", endpoint=endpoint, result="hit")
+        return entry.payload
+    if FMP_OFFLINE:
+        if entry is not None:
+            instrumentation.increment("fmp_cache_total", endpoint=endpoint, result="stale_offline")
+            return entry.payload
+        instrumentation.increment("fmp_cache_total", endpoint=endpoint, result="offline_miss")
+        raise CacheMissError(f"No cached {endpoint} response for {symbol} in offline mode")
+
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    url = f"{FMP_BASE_URL}/{endpoint}"
+    with instrumentation.span("fmp.request", {"endpoint": endpoint}, symbol=symbol) as span:
+        response = rate_limiter.get(get_session(), url, params={"symbol": symbol, "apikey": FMP_API_KEY},
+                                    headers=headers, timeout=FMP_REQUEST_TIMEOUT)
+        span.set(status=response.status_code)
+    instrumentation.increment("fmp_responses_total", endpoint=endpoint, status=f"{response.status_code // 100}xx")
+    if response.status_code == 304 and entry is not None:
+        instrumentation.increment("fmp_cache_total", endpoint=endpoint, result="revalidated")
+        response_cache.touch(endpoint, symbol)
+        return entry.payload
+    instrumentation.increment("fmp_cache_total", endpoint=endpoint, result="miss")
     response.raise_for_status()
     data = response.json()
-    return data[0] if data else {}
+    payload = data[0] if data else {}
+    if response_cache is not None:
+        response_cache.put(endpoint, symbol, payload, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return payload
+
+
+def fetchFMP_RATIOS_TTM(symbol: str) -> Dict[str, Any]:
+    """
+    Fetch TTM ratios from Financial Modeling Prep API.
+    """
+    return fetchFMP_endpoint(RATIOS_TTM_ENDPOINT, symbol)
 
 
 def fetchFMP_KEY_Metrics_TTM(symbol: str) -> Dict[str, Any]:
     """
     Fetch TTM key metrics from Financial Modeling Prep API.
     """
-    url = f"https://financialmodelingprep.com/stable/key-metrics-ttm?symbol={symbol}&apikey={FMP_API_KEY}"
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
-    return data[0] if data else {}
+    return fetchFMP_endpoint(KEY_METRICS_TTM_ENDPOINT, symbol)
+
+
+def fetchFMP_PROFILE(symbol: str) -> Dict[str, Any]:
+    """
+    Fetch the company profile (sector, industry, asset type) from Financial Modeling Prep API.
+    """
+    return fetchFMP_endpoint(PROFILE_ENDPOINT, symbol)
+
+
+def fetch_profiles_many(symbols: List[str], max_in_flight: int = FMP_MAX_IN_FLIGHT) -> Dict[str, Union[Dict[str, Any], Exception]]:
+    """
+    Fetch company profiles for many symbols concurrently.
+
+    Returns:
+        Dictionary mapping each symbol (in input order) to its profile, or to
+        the exception raised while fetching it
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        futures = {symbol: executor.submit(fetchFMP_PROFILE, symbol) for symbol in dict.fromkeys(symbols)}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                results[symbol] = e
+    return results
 
 
 def build_ftoken_object(data: Dict[str, Any], metrics_schema) -> Dict[str, Any]:
@@ -66,6 +201,89 @@ def fetch_and_build_ftoken(symbol: str, metrics_schema) -> Dict[str, Any]:
     return build_ftoken_object(combined_TTM, metrics_schema)
 
 
+def _fetch_started(fetch, symbol: str, started: Dict[str, float]):
+    """
+    Run fetch(symbol), noting when the symbol's first request began executing.
+    """
+    started.setdefault(symbol, time.perf_counter())
+    return fetch(symbol)
+
+
+def iter_combined_ttm(symbols: List[str], max_in_flight: int = FMP_MAX_IN_FLIGHT) -> Iterator[Tuple[str, Union[Dict[str, Any], Exception]]]:
+    """
+    Fetch and merge both TTM payloads for many symbols, yielding each symbol as soon as it completes.
+
+    Both TTM endpoint calls for every symbol are queued on one thread pool, so at
+    most max_in_flight requests are open at once over the shared session.
+    Failures are isolated per symbol. With instrumentation enabled, each
+    symbol's fetch time (first request start to last response) is recorded
+    as a ticker.fetch span.
+
+    Args:
+        symbols: Ticker symbols to fetch
+        max_in_flight: Maximum number of concurrent HTTP requests
+
+    Yields:
+        Tuples of (symbol, combined TTM payload or the exception raised while fetching it)
+    """
+    started: Dict[str, float] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        futures = {}
+        pending = {}
+        for symbol in dict.fromkeys(symbols):
+            futures[symbol] = (
+                executor.submit(_fetch_started, fetchFMP_RATIOS_TTM, symbol, started),
+                executor.submit(_fetch_started, fetchFMP_KEY_Metrics_TTM, symbol, started),
+            )
+            for future in futures[symbol]:
+                pending[future] = symbol
+        for future in as_completed(pending):
+            symbol = pending[future]
+            if symbol not in futures or not all(f.done() for f in futures[symbol]):
+                continue
+            ratios_future, key_metrics_future = futures.pop(symbol)
+            instrumentation.record_span("ticker.fetch", time.perf_counter() - started.pop(symbol), symbol=symbol)
+            try:
+                yield symbol, {**ratios_future.result(), **key_metrics_future.result()}
+            except Exception as e:
+                yield symbol, e
+
+
+def fetch_combined_ttm_many(symbols: List[str], max_in_flight: int = FMP_MAX_IN_FLIGHT) -> Dict[str, Union[Dict[str, Any], Exception]]:
+    """
+    Fetch and merge both TTM payloads for many symbols concurrently.
+
+    Args:
+        symbols: Ticker symbols to fetch
+        max_in_flight: Maximum number of concurrent HTTP requests
+
+    Returns:
+        Dictionary mapping each symbol (in input order) to its combined TTM
+        payload, or to the exception raised while fetching it
+    """
+    results = dict(iter_combined_ttm(symbols, max_in_flight))
+    return {symbol: results[symbol] for symbol in dict.fromkeys(symbols)}
+
+
+def fetch_and_build_ftokens(symbols: List[str], metrics_schema, max_in_flight: int = FMP_MAX_IN_FLIGHT) -> Dict[str, Union[Dict[str, Any], Exception]]:
+    """
+    Fetch financial data for many symbols concurrently and build FToken objects.
+
+    Args:
+        symbols: Ticker symbols to fetch
+        metrics_schema: Metric schema used by build_ftoken_object
+        max_in_flight: Maximum number of concurrent HTTP requests
+
+    Returns:
+        Dictionary mapping each symbol to its FToken object, or to the exception
+        raised while fetching it
+    """
+    return {
+        symbol: data if isinstance(data, Exception) else build_ftoken_object(data, metrics_schema)
+        for symbol, data in fetch_combined_ttm_many(symbols, max_in_flight).items()
+    }
+
+
 def print_metrics(data: Dict[str, Any]):
     '''
     Print the metrics in a structured format.
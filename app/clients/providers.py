@@ -0,0 +1,247 @@
+import json
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+import numpy as np
+from app.clients.fmp import FMP_MAX_IN_FLIGHT, fetchFMP_KEY_Metrics_TTM, fetchFMP_RATIOS_TTM
+
+
+class Provider(ABC):
+    """
+    A source of flat TTM metric payloads ({metric: value}) for one symbol.
+
+    Each provider runs its calls on its own bounded thread pool, so a slow
+    source can only queue up behind itself.
+
+    Args:
+        name: Identifier reported in consensus statistics
+        timeout: Seconds a running call may take before it is ignored
+        max_in_flight: Maximum concurrent calls to this provider
+    """
+
+    def __init__(self, name: str, timeout: float = 10.0, max_in_flight: int = FMP_MAX_IN_FLIGHT):
+        self.name = name
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=max(1, self.max_in_flight),
+                                                        thread_name_prefix=f"provider-{self.name}")
+        return self._executor
+
+    @abstractmethod
+    def fetch(self, symbol: str) -> Dict[str, Any]:
+        """
+        Return the flat payload for symbol, raising on failure.
+        """
+
+
+class FMPProvider(Provider):
+    def __init__(self, timeout: float = 10.0, max_in_flight: int = FMP_MAX_IN_FLIGHT):
+        super().__init__("fmp", timeout, max_in_flight)
+
+    def fetch(self, symbol: str) -> Dict[str, Any]:
+        return {**fetchFMP_RATIOS_TTM(symbol), **fetchFMP_KEY_Metrics_TTM(symbol)}
+
+
+class FixtureProvider(Provider):
+    """
+    Provider backed by local JSON fixtures, one <SYMBOL>.json payload per file.
+
+    Args:
+        name: Identifier reported in consensus statistics
+        directory: Directory holding the fixture files
+        delay: Artificial latency in seconds, to exercise timeouts and quorum
+        timeout: Seconds a running call may take before it is ignored
+        max_in_flight: Maximum concurrent calls to this provider
+    """
+
+    def __init__(self, name: str, directory: str, delay: float = 0.0, timeout: float = 10.0,
+                 max_in_flight: int = FMP_MAX_IN_FLIGHT):
+        super().__init__(name, timeout, max_in_flight)
+        self.directory = Path(directory)
+        self.delay = delay
+
+    def fetch(self, symbol: str) -> Dict[str, Any]:
+        if self.delay:
+            time.sleep(self.delay)
+        with open(self.directory / f"{symbol}.json") as f:
+            data = json.load(f)
+        return data[0] if isinstance(data, list) else data
+
+
+class ConsensusError(RuntimeError):
+    """
+    Raised when fewer than the quorum of providers answer in time.
+    """
+
+
+class ConsensusResult(NamedTuple):
+    payload: Dict[str, Any]
+    sources: List[str]
+    failed: Dict[str, str]
+    agreement: Dict[str, Dict[str, float]]
+
+
+# How often fetch_consensus checks whether queued provider calls have started
+_START_POLL_SECONDS = 0.05
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def aggregate_payloads(payloads: Dict[str, Dict[str, Any]], method: str = "median", trim: float = 0.2,
+                       tolerance: float = 0.05):
+    """
+    Combine per-provider payloads into one consensus payload with agreement stats.
+
+    Args:
+        payloads: Provider name -> flat payload
+        method: "median" or "trimmed_mean"
+        trim: Fraction trimmed from each end for "trimmed_mean"
+        tolerance: Relative distance from the consensus that counts as agreeing
+
+    Returns:
+        Tuple of (consensus payload, {metric: {sources, agreement, spread}})
+    """
+    metrics = dict.fromkeys(k for payload in payloads.values() for k in payload)
+    consensus = {}
+    agreement = {}
+    for metric in metrics:
+        values = [p[metric] for p in payloads.values() if metric in p and p[metric] is not None]
+        numbers = np.array([v for v in values if _is_number(v)], dtype=float)
+        if len(numbers) == 0:
+            consensus[metric] = values[0] if values else None
+            continue
+        if method == "trimmed_mean" and len(numbers) >= 3:
+            ordered = np.sort(numbers)
+            cut = int(len(ordered) * trim)
+            value = float(ordered[cut:len(ordered) - cut].mean())
+        else:
+            value = float(np.median(numbers))
+        consensus[metric] = value
+        scale = max(abs(value), 1e-12)
+        agreement[metric] = {
+            'sources': int(len(numbers)),
+            'agreement': float(np.mean(np.abs(numbers - value) <= tolerance * scale)),
+            'spread': float((numbers.max() - numbers.min()) / scale),
+        }
+    return consensus, agreement
+
+
+def _timed_fetch(provider: Provider, symbol: str, clock: List[Optional[float]]) -> Dict[str, Any]:
+    """
+    Run provider.fetch(symbol), noting in clock when the call actually started.
+    """
+    clock[0] = time.monotonic()
+    return provider.fetch(symbol)
+
+
+def fetch_consensus(symbol: str, providers: List[Provider], quorum: Optional[int] = None,
+                    method: str = "median", tolerance: float = 0.05,
+                    deadline: Optional[float] = None) -> ConsensusResult:
+    """
+    Fetch one symbol from every provider concurrently and aggregate as soon as a quorum answers.
+
+    Calls run on each provider's own pool. A provider's timeout counts from
+    when its call starts running, not from when it was queued. On top of
+    that the symbol has a wall-clock deadline from submission, covering queue
+    wait plus call time, so a call stuck behind a hung call in its
+    provider's pool fails instead of waiting forever. Once quorum providers
+    have succeeded (or the quorum becomes unreachable) the calls still
+    queued are cancelled; calls already running are ignored.
+
+    Args:
+        symbol: Ticker symbol
+        providers: Providers to query
+        quorum: Successful answers required, defaults to a simple majority
+        method: "median" or "trimmed_mean"
+        tolerance: Relative distance from the consensus that counts as agreeing
+        deadline: Seconds from submission before unanswered calls count as
+            failed, defaults to twice the longest provider timeout
+
+    Raises:
+        ConsensusError: If the quorum cannot be reached before the timeouts
+    """
+    quorum = quorum or len(providers) // 2 + 1
+    deadline = 2 * max(provider.timeout for provider in providers) if deadline is None else deadline
+    deadline_at = time.monotonic() + deadline
+    pending = {}
+    for provider in providers:
+        clock = [None]
+        pending[provider.executor.submit(_timed_fetch, provider, symbol, clock)] = (provider, clock)
+    payloads = {}
+    failed = {}
+
+    try:
+        while pending and len(payloads) < quorum:
+            now = time.monotonic()
+            for future, (provider, clock) in list(pending.items()):
+                if future.done():
+                    continue
+                if clock[0] is not None and now - clock[0] >= provider.timeout:
+                    failed[provider.name] = "timeout"
+                elif now >= deadline_at:
+                    failed[provider.name] = "timeout" if clock[0] is not None else "deadline passed while queued"
+                else:
+                    continue
+                future.cancel()
+                del pending[future]
+            if not pending or len(payloads) + len(pending) < quorum:
+                break
+            running = [clock[0] + provider.timeout - now for provider, clock in pending.values() if clock[0] is not None]
+            deadlines = running + [deadline_at - now]
+            if len(running) < len(pending):
+                deadlines.append(_START_POLL_SECONDS)
+            done, _ = wait(pending, timeout=max(min(deadlines), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                provider, _ = pending.pop(future)
+                try:
+                    payloads[provider.name] = future.result()
+                except Exception as e:
+                    failed[provider.name] = f"{type(e).__name__}: {e}"
+    finally:
+        for future in pending:
+            future.cancel()
+
+    if len(payloads) < quorum:
+        raise ConsensusError(f"{symbol}: {len(payloads)}/{quorum} providers answered ({failed})")
+
+    payload, agreement = aggregate_payloads(payloads, method=method, tolerance=tolerance)
+    payload["symbol"] = payload.get("symbol") or symbol
+    return ConsensusResult(payload=payload, sources=list(payloads), failed=failed, agreement=agreement)
+
+
+def fetch_consensus_many(symbols: List[str], providers: List[Provider], quorum: Optional[int] = None,
+                         method: str = "median", max_symbols_in_flight: int = FMP_MAX_IN_FLIGHT,
+                         deadline: Optional[float] = None) -> Dict[str, Union[ConsensusResult, Exception]]:
+    """
+    Run fetch_consensus for many symbols concurrently.
+
+    Each symbol's deadline (see fetch_consensus) counts from when its
+    consensus call is submitted to the providers.
+
+    Returns:
+        Dictionary mapping each symbol (in input order) to its ConsensusResult
+        or the exception raised for it
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_symbols_in_flight)) as executor:
+        futures = {s: executor.submit(fetch_consensus, s, providers, quorum, method, deadline=deadline) for s in dict.fromkeys(symbols)}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                results[symbol] = e
+    return results
@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import requests
+from app import instrumentation
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an adjustable refill rate.
+
+    Tokens refill continuously at rate_per_minute / 60 per second, up to burst.
+    A pause blocks every caller until the pause deadline, which is how
+    server-side Retry-After hints are applied to all threads at once.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate_per_minute = float(rate_per_minute)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_minute / 60.0)
+
+    def acquire(self):
+        """
+        Block until one token is available and consume it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                else:
+                    wait = (1.0 - self._tokens) * 60.0 / self.rate_per_minute
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Stop handing out tokens for the given number of seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+
+    def set_rate(self, rate_per_minute: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate_per_minute = float(rate_per_minute)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either as seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Shared rate limiter and retry policy for outgoing HTTP requests.
+
+    Every request first takes a token from the bucket. On 429 the limiter
+    pauses the bucket for Retry-After seconds (or an exponential backoff when
+    the header is missing) and halves the refill rate; successful responses
+    then recover the rate step by step back to requests_per_minute. 5xx
+    responses and connection errors are retried with full-jitter exponential
+    backoff.
+
+    Args:
+        requests_per_minute: Request budget allowed by the API plan
+        burst: Maximum number of requests sent back-to-back
+        max_retries: Retries per request before giving up
+        backoff_base: Base delay in seconds for exponential backoff
+        backoff_max: Upper bound in seconds for a single backoff
+        min_requests_per_minute: Floor for the adaptive rate after 429s
+    """
+
+    def __init__(self, requests_per_minute: float = 300, burst: int = 10, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, min_requests_per_minute: float = 10):
+        self.requests_per_minute = float(requests_per_minute)
+        self.min_requests_per_minute = min(float(min_requests_per_minute), self.requests_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(requests_per_minute, burst)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _throttle(self):
+        self.bucket.set_rate(max(self.min_requests_per_minute, self.bucket.rate_per_minute / 2))
+
+    def _recover(self):
+        rate = self.bucket.rate_per_minute
+        if rate < self.requests_per_minute:
+            step = max(1.0, self.requests_per_minute / 20)
+            self.bucket.set_rate(min(self.requests_per_minute, rate + step))
+
+    def request(self, session: requests.Session, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the limiter, retrying on 429, 5xx and connection errors.
+
+        Returns:
+            The final response; callers still decide whether to raise_for_status
+        """
+        attempt = 0
+        while True:
+            if instrumentation.enabled():
+                waited = time.perf_counter()
+                self.bucket.acquire()
+                instrumentation.observe("rate_limiter_wait_seconds", time.perf_counter() - waited)
+            else:
+                self.bucket.acquire()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                instrumentation.increment("http_retries_total", reason="connection")
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 429:
+                self._throttle()
+                if attempt >= self.max_retries:
+                    return response
+                instrumentation.increment("http_retries_total", reason="429")
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                self.bucket.pause(delay if delay is not None else self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code >= 500:
+                if attempt >= self.max_retries:
+                    return response
+                instrumentation.increment("http_retries_total", reason="5xx")
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            self._recover()
+            return response
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        return self.request(session, "GET", url, **kwargs)
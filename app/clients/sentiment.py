@@ -0,0 +1,77 @@
+import json
+import queue
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, Optional
+from app.models.Sentiment import SentimentEvent
+
+
+class SentimentSource(ABC):
+    """
+    A stream of SentimentEvent objects in timestamp order.
+    """
+
+    @abstractmethod
+    def events(self) -> Iterator[SentimentEvent]:
+        """
+        Yield events until the source is exhausted or closed.
+        """
+
+
+class JsonlReplaySource(SentimentSource):
+    """
+    Replay events from a JSON lines file, one event object per line.
+
+    Args:
+        path: File to replay
+        speed: If set, sleep between events to replay at this multiple of real time
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = None):
+        self.path = path
+        self.speed = speed
+
+    def events(self) -> Iterator[SentimentEvent]:
+        previous = None
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                event = SentimentEvent(**json.loads(line))
+                if self.speed and previous is not None and event.timestamp > previous:
+                    time.sleep((event.timestamp - previous) / self.speed)
+                previous = event.timestamp
+                yield event
+
+
+class IterableSource(SentimentSource):
+    """
+    Wrap any iterable of events or event dictionaries.
+    """
+
+    def __init__(self, items: Iterable[Any]):
+        self.items = items
+
+    def events(self) -> Iterator[SentimentEvent]:
+        for item in self.items:
+            yield item if isinstance(item, SentimentEvent) else SentimentEvent(**item)
+
+
+class QueueSource(SentimentSource):
+    """
+    Live source fed by other threads via put(); put(None) ends the stream.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event: Optional[Dict[str, Any]]):
+        self._queue.put(event)
+
+    def events(self) -> Iterator[SentimentEvent]:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            yield item if isinstance(item, SentimentEvent) else SentimentEvent(**item)
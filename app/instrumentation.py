@@ -0,0 +1,403 @@
+"""
+Lightweight metrics, spans and structured logging for pipeline runs.
+
+Counters and histograms are kept in a process-wide Registry; spans time a
+block of work, feed a "<name>_seconds" histogram and are emitted as events
+to the configured sinks (JSON lines file, Prometheus text exposition,
+in-memory). Everything is off unless INSTRUMENTATION_ENABLED is set or
+configure() is called; when off, span() returns a shared no-op object and
+increment()/observe() return immediately.
+"""
+import bisect
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+
+class Registry:
+    """
+    Thread-safe store of labelled counters and histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def increment(self, name: str, value: float = 1.0, labels: Optional[Dict[str, Any]] = None):
+        key = _label_key(labels or {})
+        with self._lock:
+            series = self.counters.setdefault(_metric_name(name), {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        key = _label_key(labels or {})
+        with self._lock:
+            series = self.histograms.setdefault(_metric_name(name), {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Plain-dict copy of every series, e.g. for JSON output or test assertions.
+        """
+        with self._lock:
+            return {
+                'counters': {name: [{'labels': dict(k), 'value': v} for k, v in series.items()]
+                             for name, series in self.counters.items()},
+                'histograms': {name: [{'labels': dict(k), **h.to_dict()} for k, h in series.items()]
+                               for name, series in self.histograms.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Render all series in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Sink:
+    """
+    Receives span events as they happen and the registry on flush().
+    """
+
+    def emit(self, record: Dict[str, Any]):
+        pass
+
+    def flush(self, registry: Registry):
+        pass
+
+    def close(self):
+        pass
+
+
+class InMemorySink(Sink):
+    """
+    Keeps events and the last flushed metrics in memory, for tests and notebooks.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.metrics: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict[str, Any]):
+        with self._lock:
+            self.records.append(record)
+
+    def flush(self, registry: Registry):
+        self.metrics = registry.snapshot()
+
+
+class JsonLinesSink(Sink):
+    """
+    Appends one JSON object per span event, and a metrics record on flush.
+
+    Args:
+        path: File to append to
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict[str, Any]):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def flush(self, registry: Registry):
+        line = json.dumps({'type': 'metrics', 'ts': time.time(), **registry.snapshot()}, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusTextSink(Sink):
+    """
+    Writes the registry in Prometheus text format on flush, atomically
+    replacing the file (suitable for the node_exporter textfile collector).
+
+    Args:
+        path: Target .prom file
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+
+    def flush(self, registry: Registry):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(registry.render_prometheus())
+        os.replace(tmp, self.path)
+
+
+registry = Registry()
+_enabled = False
+_sinks: List[Sink] = []
+
+
+def configure(enabled: bool = True, sinks: Optional[List[Sink]] = None, reset: bool = False):
+    """
+    Turn instrumentation on or off and replace the active sinks.
+
+    Args:
+        enabled: Whether spans and metrics are recorded
+        sinks: Sinks receiving events and flushed metrics
+        reset: Clear previously recorded metrics
+    """
+    global _enabled, _sinks
+    for sink in _sinks:
+        if sink not in (sinks or []):
+            sink.close()
+    _sinks = list(sinks or [])
+    _enabled = enabled
+    if reset:
+        registry.reset()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def increment(name: str, value: float = 1.0, **labels):
+    if not _enabled:
+        return
+    registry.increment(name, value, labels)
+
+
+def observe(name: str, value: float, **labels):
+    if not _enabled:
+        return
+    registry.observe(name, value, labels)
+
+
+def emit(record: Dict[str, Any]):
+    for sink in _sinks:
+        sink.emit(record)
+
+
+def record_span(name: str, seconds: float, labels: Optional[Dict[str, Any]] = None, **attributes):
+    """
+    Record an already measured duration as a span.
+
+    labels become histogram labels (keep them low-cardinality); attributes
+    such as a ticker symbol only appear on the emitted event.
+    """
+    if not _enabled:
+        return
+    labels = labels or {}
+    registry.observe(f"{name}_seconds", seconds, labels)
+    if _sinks:
+        emit({'type': 'span', 'name': name, 'ts': time.time(), 'seconds': seconds, **labels, **attributes})
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 'attributes', '_start')
+
+    def __init__(self, name: str, labels: Optional[Dict[str, Any]], attributes: Dict[str, Any]):
+        self.name = name
+        self.labels = labels or {}
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """
+        Attach attributes known only after the span started (e.g. a status code).
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+            registry.increment(f"{self.name}_errors_total", 1.0, self.labels)
+        record_span(self.name, seconds, self.labels, **self.attributes)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, labels: Optional[Dict[str, Any]] = None, **attributes):
+    """
+    Context manager timing a block as span name; a shared no-op when disabled.
+
+    Usage:
+        with span("fmp.request", {"endpoint": endpoint}, symbol=symbol) as s:
+            response = ...
+            s.set(status=response.status_code)
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, labels, attributes)
+
+
+def timed(name: str, **labels) -> Callable:
+    """
+    Decorator recording every call of the function as span name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, labels, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def flush():
+    """
+    Push the current registry to every sink.
+    """
+    for sink in _sinks:
+        sink.flush(registry)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """
+    One JSON object per log record, including any extra= fields.
+    """
+
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {'message', 'asctime'}
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in self._RESERVED})
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def configure_logging(level: str = None, json_format: bool = None):
+    """
+    Configure the root logger from LOG_LEVEL and LOG_FORMAT ("text" or "json").
+    """
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    json_format = os.getenv("LOG_FORMAT", "text").lower() == "json" if json_format is None else json_format
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonLogFormatter() if json_format
+                         else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.basicConfig(level=level.upper(), handlers=[handler], force=True)
+
+
+def configure_from_env():
+    """
+    Enable instrumentation from INSTRUMENTATION_ENABLED, with sinks from
+    INSTRUMENTATION_JSONL and INSTRUMENTATION_PROMETHEUS file paths.
+    """
+    if os.getenv("INSTRUMENTATION_ENABLED", "0").lower() not in ("1", "true", "yes"):
+        return
+    sinks: List[Sink] = []
+    if os.getenv("INSTRUMENTATION_JSONL"):
+        sinks.append(JsonLinesSink(os.environ["INSTRUMENTATION_JSONL"]))
+    if os.getenv("INSTRUMENTATION_PROMETHEUS"):
+        sinks.append(PrometheusTextSink(os.environ["INSTRUMENTATION_PROMETHEUS"]))
+    configure(True, sinks)
+
+
+configure_from_env()
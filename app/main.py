@@ -1,10 +1,30 @@
-from app.services.create_company import createCompany
-from app.services.data_collection import fetch_and_create_companies, extract_all_metrics_dataframe
-from app.services.calculate_min_max import calculate_metric_boundaries, save_metric_boundaries, load_metric_boundaries
-from app.services.calculate_index import calculate_all_companies_indexes
-import time
+from app import instrumentation
+from app.instrumentation import configure_logging
+from app.services.data_collection import fetch_company_profiles, fetch_metrics_dataframe
+from app.services.calculate_min_max import (BoundaryStore, calculate_cohort_boundaries, calculate_metric_boundaries,
+                                            load_cohort_boundaries, load_metric_boundaries, save_cohort_boundaries,
+                                            save_metric_boundaries)
+from app.services.calculate_index import calculate_all_companies_indexes, decompose_score_change
+from app.services.backtest import load_price_panel, panel_from_snapshots, run_backtest
+from app.services.bootstrap import bootstrap_index_scores
+from app.services.checkpoint import run_universe
+from app.services.incremental import incremental_rescore
+from app.services.publication import PublishedState, build_publication_batches, confirm_publication
+from app.services.sharded_runner import run_sharded
+from app.services.smoothing import SMOOTHED_COLUMN, ScoreSmoother, smooth_index_scores
+from app.services.snapshot_store import SnapshotStore
+from app.services.universe import UniverseRegistry
+from app.services.validation import validate_metrics
+from datetime import date, datetime
+from pathlib import Path
+import logging
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+# Companies with less than this fraction of metrics present are left out of boundary computation
+MIN_BOUNDARY_COVERAGE = 0.5
+
 tickers = [
     "AAPL", "TSLA", "AMZN", "MSFT", "NVDA", "GOOGL", "META", "NFLX", "JPM", "V",
     "BAC", "AMD", "PYPL", "DIS", "T", "PFE", "COST", "INTC", "KO", "TGT", 
@@ -17,98 +37,350 @@ tickers = [
     "UNH", "CARR", "FUBO", "HCA", "TWTR", "BILI", "RKT"
 ]
 
+def load_universe_registry():
+    """Load the universe registry and classify any new or stale tickers"""
+    registry = UniverseRegistry.load()
+    registry.classify(tickers)
+    registry.save()
+    return registry
+
 def recalculate_and_save_boundaries():
     """Fetch data, calculate boundaries, and save them"""
-    companies = fetch_and_create_companies(tickers)
-    df = extract_all_metrics_dataframe(companies)
-    boundaries = calculate_metric_boundaries(df)
+    df = fetch_metrics_dataframe(tickers, registry=load_universe_registry())
+    boundaries = calculate_metric_boundaries(df, min_coverage=MIN_BOUNDARY_COVERAGE)
     save_metric_boundaries(boundaries)
     return df, boundaries
 
+def recalculate_and_save_cohort_boundaries(min_cohort_size=10):
+    """Fetch data and sector metadata, then calculate and save per-sector boundaries"""
+    df = fetch_metrics_dataframe(tickers, registry=load_universe_registry())
+    sectors = fetch_company_profiles(df.index.tolist())['sector']
+    _, cache = load_cohort_boundaries()
+    cohort_boundaries = calculate_cohort_boundaries(df, sectors, min_cohort_size=min_cohort_size, cache=cache,
+                                                    min_coverage=MIN_BOUNDARY_COVERAGE)
+    save_cohort_boundaries(cohort_boundaries, cache)
+    return df, cohort_boundaries
+
+def update_boundaries_incrementally(new_tickers, sketch_file="data/metric_boundary_sketches.json"):
+    """Fold newly fetched companies into the boundary sketches and save updated boundaries"""
+    store = BoundaryStore.load(sketch_file)
+    store.update_frame(fetch_metrics_dataframe(new_tickers, registry=load_universe_registry()),
+                       min_coverage=MIN_BOUNDARY_COVERAGE)
+    store.save(sketch_file)
+    boundaries = store.boundaries()
+    save_metric_boundaries(boundaries)
+    return boundaries
+
 def calculate_indexes_demo(num_companies=5):
     """Calculate indexes for a subset of companies"""
 
     boundaries = load_metric_boundaries()
     
     subset_tickers = tickers[:num_companies]
-    companies = fetch_and_create_companies(subset_tickers)
-    companies_df = extract_all_metrics_dataframe(companies)
+    companies_df = fetch_metrics_dataframe(subset_tickers)
     
     
     indexes_df = calculate_all_companies_indexes(companies_df, boundaries)
     
-    print(f"\nFinancial Indexes for {num_companies} companies:")
-    print(indexes_df)
+    logger.info(f"Financial Indexes for {num_companies} companies:\n{indexes_df}")
     
     
     return companies_df, indexes_df
 
+def calculate_index_confidence_intervals(replicates=1000, confidence=0.90):
+    """Bootstrap score and rank confidence intervals over the whole universe"""
+    companies_df = fetch_metrics_dataframe(tickers, registry=load_universe_registry())
+    boundaries = calculate_metric_boundaries(companies_df, min_coverage=MIN_BOUNDARY_COVERAGE)
+
+    result = bootstrap_index_scores(companies_df, boundaries, replicates=replicates, confidence=confidence,
+                                    min_coverage=MIN_BOUNDARY_COVERAGE)
+
+    logger.info(f"Index scores with {confidence:.0%} bootstrap intervals ({replicates} replicates):\n"
+                f"{result['summary'].sort_values('rank')}")
+    return result['summary']
+
 def calculate_index_for_specific_company(ticker):
     """Calculate index for a specific company"""
    
     boundaries = load_metric_boundaries()
     
    
-    company = createCompany(ticker)
-    company_df = extract_all_metrics_dataframe([company])
+    company_df = fetch_metrics_dataframe([ticker])
     
 
     index_df = calculate_all_companies_indexes(company_df, boundaries)
     
 
-    print(f"\nFinancial Index for {ticker}:")
-    print(index_df)
+    logger.info(f"Financial Index for {ticker}:\n{index_df}")
     
     return company_df, index_df
 
-def calculate_and_save_all_company_indexes(output_file="company_financial_indexes.csv"):
+def validate_against_history(combined_df, store, lookback=30):
+    """Run the anomaly checks against recent snapshots and report what was flagged"""
+    snapshots = [s for s in (store.load(d) for d in store.dates()[-lookback:]) if s is not None]
+    history = [s.metrics for s in snapshots]
+    previous = history[-1] if history else None
+    age_days = (date.today() - date.fromisoformat(snapshots[-1].date)).days if snapshots else 1.0
+
+    validation = validate_metrics(
+        combined_df,
+        history=pd.concat(history) if history else None,
+        previous=previous,
+        previous_age_days=max(age_days, 1),
+    )
+    logger.info(f"Validation flagged {validation.flagged_fraction:.1%} of metric values, "
+                f"quarantined {len(validation.quarantined_tickers)} tickers")
+    if validation.tripped:
+        logger.error("Circuit breaker tripped: too many anomalous values, results will not be published.")
+    return validation
+
+def score_and_record_run(combined_df, boundaries, output_file, sector_relative=False):
+    """
+    Shared tail of every full run: validate the fetched metrics, score them,
+    smooth the scores, then save the CSV and the snapshot.
+
+    Args:
+        combined_df: Fetched metrics (ticker index)
+        boundaries: Dictionary of metric boundaries to score with
+        output_file: Path to save the CSV file
+        sector_relative: Score each company against its sector's boundaries
+
+    Returns:
+        DataFrame with all company index scores, or None if the circuit breaker tripped
+    """
+    store = SnapshotStore()
+    with instrumentation.span("stage.validate"):
+        validation = validate_against_history(combined_df, store)
+    if validation.tripped:
+        return None
+
+    sectors = cohort_boundaries = None
+    if sector_relative:
+        cohort_boundaries, _ = load_cohort_boundaries()
+        sectors = fetch_company_profiles(combined_df.index.tolist())['sector']
+
+    indexes_df = calculate_all_companies_indexes(validation.cleaned, boundaries,
+                                                 cohorts=sectors, cohort_boundaries=cohort_boundaries)
+    smoother = ScoreSmoother.load()
+    indexes_df = smooth_index_scores(indexes_df, smoother)
+
+    indexes_df.to_csv(output_file, index=False)
+    logger.info(f"Financial indexes saved to {output_file}")
+
+    with instrumentation.span("stage.snapshot"):
+        store.append(combined_df, boundaries, indexes_df, cohorts=sectors, cohort_boundaries=cohort_boundaries)
+    smoother.save()
+
+    top_companies = indexes_df.sort_values('index_score', ascending=False).head(10)
+    logger.info(f"Top 10 companies by financial index:\n{top_companies}")
+    return indexes_df
+
+def calculate_and_save_all_company_indexes(output_file="company_financial_indexes.csv", sector_relative=False):
     """
     Calculate financial indexes for all companies in the tickers list 
     and save the results to a CSV file.
+
+    Fetched companies are checkpointed per ticker, so a restart on the same
+    day only fetches tickers that have not succeeded yet.
     
     Args:
         output_file: Path to save the CSV file
+        sector_relative: Score each company against its sector's boundaries
+            (from recalculate_and_save_cohort_boundaries) instead of global ones
     
     Returns:
         DataFrame with all company index scores
     """
-    print(f"Calculating financial indexes for {len(tickers)} companies...")
+    logger.info(f"Calculating financial indexes for {len(tickers)} companies...")
     
     boundaries = load_metric_boundaries()
-    
-    batch_size = 10
-    all_company_data = []
-    
-    for i in range(0, len(tickers), batch_size):
-        batch_tickers = tickers[i:i+batch_size]
-        print(f"Processing batch {i//batch_size + 1}/{(len(tickers) + batch_size - 1)//batch_size}: {batch_tickers}")
-        
-        try:
-            companies = fetch_and_create_companies(batch_tickers)
-            companies_df = extract_all_metrics_dataframe(companies)
-            all_company_data.append(companies_df)
-            
 
-            time.sleep(2)
-        except Exception as e:
-            print(f"Error processing batch: {e}")
+    with instrumentation.span("stage.run_universe", tickers=len(tickers)):
+        combined_df, report = run_universe(tickers, registry=load_universe_registry())
+    report.print_summary()
     
-    if all_company_data:
-        combined_df = pd.concat(all_company_data)
-        
-        indexes_df = calculate_all_companies_indexes(combined_df, boundaries)
+    if combined_df.empty:
+        logger.error("No company data collected. Check for errors.")
+        return None
+    return score_and_record_run(combined_df, boundaries, output_file, sector_relative)
+
+def calculate_and_save_all_company_indexes_sharded(output_file="data/company_financial_indexes.csv", processes=None,
+                                                   sector_relative=False, update_boundaries=False):
+    """
+    Fetch and build the universe across a process pool, then validate,
+    score, smooth and snapshot it like calculate_and_save_all_company_indexes.
+    Run from a __main__ guard.
+
+    Args:
+        output_file: Path to save the CSV file
+        processes: Worker processes, defaults to the CPU count
+        sector_relative: Score each company against its sector's boundaries
+        update_boundaries: Recompute metric_boundaries.json from this run's
+            data and score with them, instead of the saved boundaries
+
+    Returns:
+        DataFrame with all company index scores
+    """
+    boundaries = None if update_boundaries else load_metric_boundaries()
+    with instrumentation.span("stage.run_universe", tickers=len(tickers)):
+        result = run_sharded(tickers, processes=processes, exact_boundaries=True, min_coverage=MIN_BOUNDARY_COVERAGE,
+                             boundaries=boundaries, registry=load_universe_registry(), score=False)
+    if result.excluded:
+        logger.info(f"{len(result.excluded)} symbols excluded by the universe registry")
+    if result.failed:
+        logger.error(f"{len(result.failed)} tickers in failed shards")
+    if result.metrics.empty:
+        logger.error("No company data collected. Check for errors.")
+        return None
+    if update_boundaries:
+        save_metric_boundaries(result.boundaries)
+    return score_and_record_run(result.metrics, result.boundaries, output_file, sector_relative)
+
+def refresh_indexes_incrementally(output_file="data/company_financial_indexes.csv", threshold=0.0,
+                                  sector_relative=None):
+    """
+    Refetch the universe and rescore only companies whose inputs changed
+    since the last snapshot. A change in metric_boundaries.json (or in the
+    cohort boundaries, or the scoring mode) triggers a full rescore.
+
+    Args:
+        sector_relative: Score against sector boundaries; None keeps the
+            mode of the last snapshot
+
+    Returns:
+        DataFrame of score changes (ticker, status, old_score, new_score, change)
+    """
+    boundaries = load_metric_boundaries()
+    store = SnapshotStore()
+
+    # Each refresh cycle checkpoints on its own, so it never resumes from an earlier run that day
+    cycle = datetime.utcnow().strftime("%H%M%S%f")
+    combined_df, report = run_universe(tickers, registry=load_universe_registry(), run_id=f"refresh-{cycle}")
+    report.print_summary()
+    if combined_df.empty:
+        logger.error("No company data collected. Check for errors.")
+        return None
+
+    validation = validate_against_history(combined_df, store)
+    if validation.tripped:
+        return None
+
+    previous = store.load()
+    if sector_relative is None:
+        sector_relative = previous is not None and previous.cohort_boundaries is not None
+    sectors = cohort_boundaries = None
+    if sector_relative:
+        cohort_boundaries, _ = load_cohort_boundaries()
+        sectors = fetch_company_profiles(combined_df.index.tolist())['sector']
+
+    result = incremental_rescore(combined_df, boundaries, previous, threshold=threshold,
+                                 scoring_df=validation.cleaned, cohorts=sectors, cohort_boundaries=cohort_boundaries)
+    logger.info(f"Rescored {result.rescored}/{len(combined_df)} companies"
+                f"{' (full rescore: boundaries changed)' if result.full_rescore else ''}")
 
+    if result.rescored or not result.delta.empty:
+        smoother = ScoreSmoother.load()
+        indexes_df = smooth_index_scores(result.indexes, smoother)
         indexes_df.to_csv(output_file, index=False)
-        print(f"Financial indexes saved to {output_file}")
-
-        print("\nTop 10 companies by financial index:")
-        top_companies = indexes_df.sort_values('index_score', ascending=False).head(10)
-        print(top_companies)
-        
-        return indexes_df
-    else:
-        print("No company data collected. Check for errors.")
+        store.append(combined_df, boundaries, indexes_df, cohorts=sectors, cohort_boundaries=cohort_boundaries)
+        smoother.save()
+
+    logger.info(f"{len(result.delta)} index scores changed:\n{result.delta}")
+    return result.delta
+
+def explain_score_changes(top=10):
+    """
+    Split the score changes between the last two snapshot runs into input
+    and boundary effects, logging the largest movers and their top metrics.
+
+    Returns:
+        Dictionary from decompose_score_change, or None with fewer than two runs
+    """
+    store = SnapshotStore()
+    runs = [(d, r) for d in store.dates() for r in store.runs(d)][-2:]
+    if len(runs) < 2:
+        logger.warning("Need at least two snapshot runs to explain score changes.")
         return None
+    previous, current = store.load(*runs[0]), store.load(*runs[1])
+    result = decompose_score_change(previous.metrics, previous.boundaries, current.metrics, current.boundaries,
+                                    previous_cohorts=previous.cohorts,
+                                    previous_cohort_boundaries=previous.cohort_boundaries,
+                                    current_cohorts=current.cohorts,
+                                    current_cohort_boundaries=current.cohort_boundaries)
+
+    summary = result['summary'].set_index('ticker')
+    movers = summary['change'].abs().sort_values(ascending=False).head(top).index
+    logger.info(f"Largest score changes {runs[0]} -> {runs[1]}:\n{summary.loc[movers]}")
+    for ticker in movers:
+        effects = result['input_effects'].loc[ticker] + result['boundary_effects'].loc[ticker]
+        drivers = effects.abs().sort_values(ascending=False).head(3).index
+        logger.info(f"{ticker}: " + ", ".join(f"{m} {effects[m]:+.4f}" for m in drivers))
+    return result
+
+def backtest_index(prices_file="data/prices.csv", horizon=21, quantiles=5, fixed_boundaries=False):
+    """
+    Backtest the current weights over the snapshot history against local prices.
+
+    Args:
+        prices_file: CSV/Parquet of prices (wide date x ticker, or long date/ticker/close)
+        horizon: Forward return horizon in snapshot dates
+        quantiles: Number of quantile portfolios
+        fixed_boundaries: Score every date with the saved boundaries instead of
+            point-in-time cross-sectional ones
+
+    Returns:
+        Dictionary from run_backtest
+    """
+    panel = panel_from_snapshots(SnapshotStore())
+    boundaries = load_metric_boundaries() if fixed_boundaries else None
+    result = run_backtest(panel, load_price_panel(prices_file), boundaries, horizon=horizon, quantiles=quantiles)
+    logger.info(f"Backtest {result['config_hash']} over {len(panel.dates)} dates x {len(panel.tickers)} tickers: "
+                f"{result['summary']}")
+    return result
+
+def rebuild_smoothing_state(half_life_days=7.0):
+    """
+    Recompute the persisted EMA smoothing state from the snapshot history,
+    e.g. after changing the half-life or losing the state file.
+    """
+    smoother = ScoreSmoother(half_life_days=half_life_days).rebuild(SnapshotStore())
+    smoother.save()
+    return smoother.frame()
+
+def prepare_publication_batches(output_dir="data/publication", threshold=0.0005, smoothed=True):
+    """
+    Encode the latest snapshot's score changes into on-chain submission batches.
+
+    With smoothed set, the EMA-smoothed score is published when the snapshot has one.
+
+    Each batch is written to <output_dir>/batch-<sequence>.bin and named in the
+    logged summary with its Merkle root. The batches are recorded as pending;
+    call confirm_publication_batches once they land on-chain. Running again
+    before that rebuilds from the last confirmed state.
+    """
+    snapshot = SnapshotStore().load()
+    if snapshot is None:
+        logger.warning("No snapshot to publish.")
+        return []
+
+    state = PublishedState.load()
+    column = SMOOTHED_COLUMN if smoothed and SMOOTHED_COLUMN in snapshot.scores.columns else 'index_score'
+    batches, new_state = build_publication_batches(snapshot.scores.reset_index(), state, threshold=threshold,
+                                                   score_column=column)
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    for batch in batches:
+        path = Path(output_dir) / f"batch-{batch.sequence:08d}.bin"
+        path.write_bytes(batch.payload)
+        logger.info(f"{path}: {len(batch.tickers)} updates, {len(batch.payload)} bytes, root {batch.merkle_root.hex()}")
+    new_state.save_pending(batches)
+    return batches
+
+def confirm_publication_batches(sequence):
+    """
+    Mark pending publication batches up to sequence as confirmed on-chain.
+    """
+    return confirm_publication(sequence)
 
 if __name__ == "__main__":
     # Uncomment the analysis you want to run
@@ -123,4 +395,8 @@ if __name__ == "__main__":
     # calculate_index_for_specific_company("AAPL")
     
     # Calculate indexes for all companies and save to CSV
-    calculate_and_save_all_company_indexes("data/company_financial_indexes.csv")
\ No newline at end of file
+    configure_logging()
+    try:
+        calculate_and_save_all_company_indexes("data/company_financial_indexes.csv")
+    finally:
+        instrumentation.flush()
\ No newline at end of file
@@ -5,5 +5,7 @@ from app.models.FinancialModel import CompanyFinancialMetrics
 
 class Company(BaseModel):
     ticker: Optional[str]
+    sector: Optional[str] = None
+    industry: Optional[str] = None
     fiscalYear: Optional[str]
     financials: CompanyFinancialMetrics
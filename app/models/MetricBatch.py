@@ -0,0 +1,56 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.models.MetricsSchema import MetricsSchema, get_metrics_schema
+
+
+class MetricBatch:
+    """
+    Compact batch of company metrics stored in one preallocated float64 array.
+
+    Rows are companies and columns follow the compiled schema's metric
+    ordering; missing values are NaN. This replaces the per-company
+    Company/CompanyFinancialMetrics object tree when all that is needed is
+    the metrics matrix.
+
+    Args:
+        capacity: Number of rows to preallocate (grows if exceeded)
+        schema: Compiled metrics schema, defaults to get_metrics_schema()
+    """
+
+    def __init__(self, capacity: int = 0, schema: Optional[MetricsSchema] = None):
+        self.schema = schema or get_metrics_schema()
+        self.columns = self.schema.metrics
+        self.values = np.full((max(capacity, 1), len(self.columns)), np.nan)
+        self.tickers: List[str] = []
+        self.fiscal_years: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def append(self, ticker: str, fiscal_year: Optional[str], payload: Dict[str, Any]):
+        """
+        Add one company from a flat payload of metric -> value (e.g. combined FMP TTM data).
+        """
+        row = len(self.tickers)
+        if row == self.values.shape[0]:
+            grown = np.full((row * 2, len(self.columns)), np.nan)
+            grown[:row] = self.values
+            self.values = grown
+        self.values[row] = self.schema.build_row(payload)
+        self.tickers.append(ticker)
+        self.fiscal_years.append(fiscal_year)
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        View of the filled company x metric matrix.
+        """
+        return self.values[:len(self.tickers)]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Build the same frame as extract_all_metrics_dataframe: ticker index, fiscalYear, then metrics.
+        """
+        df = pd.DataFrame(self.to_numpy(), index=pd.Index(self.tickers, name='ticker'), columns=list(self.columns))
+        df.insert(0, 'fiscalYear', self.fiscal_years)
+        return df
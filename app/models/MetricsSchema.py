@@ -0,0 +1,94 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable
+import numpy as np
+from app.models.FinancialModel import CompanyFinancialMetrics
+
+METRICS_SCHEMA_PATH = "app/specifications/ftoken-metrics.json"
+
+# Metrics where lower values are better; normalization flips them
+INVERSE_METRICS = [
+    'capexToOperatingCashFlowTTM', 'capexToDepreciationTTM', 'capexToRevenueTTM',
+    'stockBasedCompensationToRevenueTTM', 'intangiblesToTotalAssetsTTM',
+    'debtToEquityRatioTTM', 'debtToAssetsRatioTTM', 'debtToCapitalRatioTTM',
+    'financialLeverageRatioTTM', 'effectiveTaxRateTTM', 'cashConversionCycleTTM',
+    'daysOfInventoryOutstandingTTM', 'daysOfSalesOutstandingTTM',
+    'salesGeneralAndAdministrativeToRevenueTTM'
+]
+
+INVERSE_METRICS_SET = frozenset(INVERSE_METRICS)
+
+
+def _as_float(value) -> float:
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class MetricsSchema:
+    """
+    Compiled form of ftoken-metrics.json.
+
+    Holds the raw category -> metric mapping plus precomputed lookups: the
+    fixed metric ordering, metric -> column position, metric -> category,
+    category -> CompanyFinancialMetrics field, and inverse-metric flags.
+
+    Args:
+        raw: Category -> {metric: description} mapping as loaded from JSON
+        inverse_metrics: Metrics where lower values are better
+    """
+
+    def __init__(self, raw: Dict[str, Dict[str, str]], inverse_metrics: Iterable[str] = INVERSE_METRICS_SET):
+        self.raw = raw
+        self.categories = tuple(raw)
+        self.metrics = tuple(metric for metrics in raw.values() for metric in metrics)
+        self.metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+        self.metric_category = {metric: category for category, metrics in raw.items() for metric in metrics}
+        self.category_field = {category: category[0].lower() + category[1:] for category in self.categories}
+        inverse_metrics = frozenset(inverse_metrics)
+        self.inverse = np.array([metric in inverse_metrics for metric in self.metrics], dtype=bool)
+
+    def validate_against_models(self):
+        """
+        Check that categories and metrics match the CompanyFinancialMetrics models exactly.
+
+        Raises:
+            ValueError: Listing every category or metric that drifted
+        """
+        problems = []
+        model_fields = CompanyFinancialMetrics.model_fields
+        for category in self.categories:
+            field = self.category_field[category]
+            if field not in model_fields:
+                problems.append(f"category {category} has no CompanyFinancialMetrics.{field} field")
+                continue
+            model_metrics = set(model_fields[field].annotation.model_fields)
+            schema_metrics = set(self.raw[category])
+            for metric in sorted(schema_metrics - model_metrics):
+                problems.append(f"{category}.{metric} is missing from the model")
+            for metric in sorted(model_metrics - schema_metrics):
+                problems.append(f"{category}.{metric} is missing from the schema")
+        for field in sorted(set(model_fields) - set(self.category_field.values())):
+            problems.append(f"model field {field} has no schema category")
+        if problems:
+            raise ValueError("Metrics schema does not match FinancialModel: " + "; ".join(problems))
+        return self
+
+    def build_row(self, payload: Dict[str, Any]) -> np.ndarray:
+        """
+        Map a flat FMP payload to a float64 row in schema order in a single pass.
+        """
+        return np.fromiter((_as_float(payload.get(metric)) for metric in self.metrics), dtype=float, count=len(self.metrics))
+
+
+@lru_cache(maxsize=None)
+def get_metrics_schema(file_path: str = METRICS_SCHEMA_PATH) -> MetricsSchema:
+    """
+    Load, compile and validate the metrics schema once per process.
+    """
+    with open(file_path) as f:
+        raw = json.load(f)
+    return MetricsSchema(raw).validate_against_models()
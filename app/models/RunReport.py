@@ -0,0 +1,20 @@
+import logging
+from typing import Dict, List
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class RunReport(BaseModel):
+    runDate: str
+    succeeded: List[str] = []
+    failed: Dict[str, str] = {}
+    skipped: List[str] = []
+    excluded: Dict[str, str] = {}
+
+    def print_summary(self):
+        logger.info(f"Run {self.runDate}: {len(self.succeeded)} succeeded, "
+                    f"{len(self.failed)} failed, {len(self.skipped)} skipped (already checkpointed), "
+                    f"{len(self.excluded)} excluded by the universe registry")
+        for ticker, error in self.failed.items():
+            logger.warning(f"failed {ticker}: {error}")
@@ -0,0 +1,28 @@
+from typing import Dict, Optional
+from pydantic import BaseModel, Field
+
+
+# One mention / sentiment observation from a source
+class SentimentEvent(BaseModel):
+    ticker: str
+    timestamp: float
+    component: str
+    sentiment: float = Field(ge=-1.0, le=1.0)
+    weight: float = Field(default=1.0, ge=0.0)
+    source: Optional[str] = None
+
+
+# Windowed statistics for one component of one ticker
+class SentimentComponentScore(BaseModel):
+    score: float
+    emaSentiment: Optional[float]
+    windowMentions: float
+    windowSentiment: Optional[float]
+
+
+# Root S-Index update
+class SentimentIndex(BaseModel):
+    ticker: str
+    timestamp: float
+    index_score: float
+    components: Dict[str, SentimentComponentScore]
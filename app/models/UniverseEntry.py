@@ -0,0 +1,12 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class UniverseEntry(BaseModel):
+    symbol: str
+    assetType: Optional[str] = None        # stock | etf | fund
+    classifiedAt: Optional[float] = None
+    status: str = "active"                 # active | empty | not_found | inactive
+    failures: int = 0
+    retryAfter: Optional[float] = None
+    lastCheckedAt: Optional[float] = None
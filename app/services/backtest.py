@@ -0,0 +1,272 @@
+import hashlib
+import json
+import logging
+import warnings
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.services.calculate_index import METRIC_WEIGHTS, PILLAR_WEIGHTS, ScoringEngine
+from app.services.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_CACHE_DIR = "data/backtests"
+
+
+class MetricPanel(NamedTuple):
+    dates: pd.DatetimeIndex
+    tickers: pd.Index
+    metrics: List[str]
+    values: np.ndarray  # dates x tickers x metrics, NaN for missing
+
+
+def panel_from_long_frame(df: pd.DataFrame, date_column: str = 'date', ticker_column: str = 'ticker') -> MetricPanel:
+    """
+    Build a panel from a long frame with one row per (date, ticker) and one column per metric.
+    """
+    metrics = [c for c in df.columns if c not in (date_column, ticker_column, 'fiscalYear')]
+    dates = pd.DatetimeIndex(sorted(pd.to_datetime(df[date_column]).unique()))
+    tickers = pd.Index(sorted(df[ticker_column].astype(str).unique()), name='ticker')
+    values = np.full((len(dates), len(tickers), len(metrics)), np.nan)
+    d = dates.get_indexer(pd.to_datetime(df[date_column]))
+    t = tickers.get_indexer(df[ticker_column].astype(str))
+    values[d, t] = df[metrics].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    return MetricPanel(dates=dates, tickers=tickers, metrics=metrics, values=values)
+
+
+def panel_from_snapshots(store: Optional[SnapshotStore] = None, start: Optional[str] = None,
+                         end: Optional[str] = None, columns: Optional[List[str]] = None) -> MetricPanel:
+    """
+    Build a panel from the snapshot store, using the latest run of each date.
+
+    Dates without a completed run (e.g. an interrupted append) are skipped.
+    """
+    store = store or SnapshotStore()
+    dates = [d for d in store.dates() if (start is None or d >= start) and (end is None or d <= end)]
+    snapshots = {d: s for d, s in ((d, store.load(d, columns=columns)) for d in dates) if s is not None}
+    frames = {d: s.metrics.drop(columns=['fiscalYear'], errors='ignore') for d, s in snapshots.items()}
+    dates = list(frames)
+    tickers = pd.Index(sorted(set().union(*(f.index for f in frames.values()))) if frames else [], name='ticker')
+    metrics = list(dict.fromkeys(c for f in frames.values() for c in f.columns))
+    values = np.stack([f.reindex(index=tickers, columns=metrics).to_numpy(dtype=float) for f in frames.values()]) \
+        if frames else np.empty((0, len(tickers), len(metrics)))
+    return MetricPanel(dates=pd.DatetimeIndex(pd.to_datetime(dates)), tickers=tickers, metrics=metrics, values=values)
+
+
+def load_price_panel(path: str) -> pd.DataFrame:
+    """
+    Load local prices as a date x ticker frame.
+
+    Accepts CSV or Parquet, either wide (a date column then one column per
+    ticker) or long (date, ticker and close columns).
+    """
+    df = pd.read_parquet(path) if str(path).endswith('.parquet') else pd.read_csv(path)
+    date_column = 'date' if 'date' in df.columns else df.columns[0]
+    df[date_column] = pd.to_datetime(df[date_column])
+    if {'ticker', 'close'} <= set(df.columns):
+        df = df.pivot_table(index=date_column, columns='ticker', values='close')
+    else:
+        df = df.set_index(date_column)
+    return df.sort_index().apply(pd.to_numeric, errors='coerce')
+
+
+def _fingerprint(digest, *arrays):
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+
+
+def config_hash(panel: MetricPanel, prices: pd.DataFrame, config: dict) -> str:
+    """
+    Content hash of the inputs and configuration identifying a backtest result.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    digest.update("\x1f".join(map(str, panel.tickers)).encode())
+    digest.update("\x1f".join(panel.metrics).encode())
+    _fingerprint(digest, panel.dates.asi8, panel.values)
+    digest.update("\x1f".join(map(str, prices.columns)).encode())
+    _fingerprint(digest, prices.index.asi8, prices.to_numpy(dtype=float))
+    return digest.hexdigest()
+
+
+def rolling_boundaries(values: np.ndarray, lower: float = 0.10, upper: float = 0.90) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Point-in-time p10/p90 per date and metric across tickers (D x M each).
+
+    Uses one sort along the ticker axis and linear interpolation, matching the
+    pandas quantiles of calculate_metric_boundaries. Metrics with no data on a
+    date get its default of (0, 1).
+    """
+    ordered = np.sort(values, axis=1)  # NaN sorts last
+    counts = (~np.isnan(values)).sum(axis=1)
+    bounds = []
+    for q in (lower, upper):
+        position = q * np.maximum(counts - 1, 0)
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, np.maximum(counts - 1, 0))
+        low = np.take_along_axis(ordered, below[:, None, :], axis=1)[:, 0, :]
+        high = np.take_along_axis(ordered, above[:, None, :], axis=1)[:, 0, :]
+        bounds.append(np.where(counts > 0, low + (high - low) * (position - below), np.nan))
+    empty = counts == 0
+    return np.where(empty, 0.0, bounds[0]), np.where(empty, 1.0, bounds[1])
+
+
+def score_panel(panel: MetricPanel, boundaries: Optional[Dict[str, Tuple[float, float]]] = None,
+                pillar_weights=PILLAR_WEIGHTS, metric_weights=METRIC_WEIGHTS, chunk_size: int = 256) -> np.ndarray:
+    """
+    Score every (date, ticker) of a panel with array operations.
+
+    Args:
+        panel: Metric panel
+        boundaries: Fixed boundaries for every date; None uses point-in-time
+            cross-sectional p10/p90 per date
+        chunk_size: Dates scored per batch, to bound memory
+
+    Returns:
+        dates x tickers array of index scores, NaN where a ticker has no data on a date
+    """
+    per_date = {m: (0.0, 1.0) for m in panel.metrics} if boundaries is None else boundaries
+    engine = ScoringEngine(per_date, pillar_weights, metric_weights)
+    columns = [panel.metrics.index(m) if m in panel.metrics else -1 for m in engine.metrics]
+    available = np.array([c >= 0 for c in columns], dtype=bool)
+    pillar_matrix = engine.pillar_weight_matrix(available)
+
+    scores = np.full(panel.values.shape[:2], np.nan)
+    present = ~np.isnan(panel.values).all(axis=2)
+    for start in range(0, len(panel.dates), chunk_size):
+        stop = min(start + chunk_size, len(panel.dates))
+        block = np.full((stop - start, len(panel.tickers), len(engine.metrics)), np.nan)
+        block[:, :, available] = panel.values[start:stop][:, :, [c for c in columns if c >= 0]]
+        if boundaries is None:
+            lower, upper = rolling_boundaries(block)
+            normalized = engine.normalize(block, lower[:, None, :], upper[:, None, :])
+        else:
+            normalized = engine.normalize(block)
+        scores[start:stop] = engine.index_scores(normalized @ pillar_matrix)
+    scores[~present] = np.nan
+    return scores
+
+
+def _row_ranks(values: np.ndarray) -> np.ndarray:
+    return pd.DataFrame(values).rank(axis=1).to_numpy()
+
+
+def rank_ic(scores: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """
+    Spearman rank correlation between scores and forward returns for each date.
+    """
+    valid = ~np.isnan(scores) & ~np.isnan(returns)
+    a = _row_ranks(np.where(valid, scores, np.nan))
+    b = _row_ranks(np.where(valid, returns, np.nan))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        a = a - np.nanmean(a, axis=1, keepdims=True)
+        b = b - np.nanmean(b, axis=1, keepdims=True)
+        ic = np.nansum(a * b, axis=1) / np.sqrt(np.nansum(a * a, axis=1) * np.nansum(b * b, axis=1))
+    ic[valid.sum(axis=1) < 3] = np.nan
+    return ic
+
+
+def quantile_buckets(scores: np.ndarray, quantiles: int) -> np.ndarray:
+    """
+    Quantile bucket (1 = lowest scores ... quantiles = highest) per date, 0 where unscored.
+    """
+    pct = pd.DataFrame(scores).rank(axis=1, pct=True).to_numpy()
+    return np.where(np.isnan(pct), 0, np.ceil(pct * quantiles)).astype(int)
+
+
+def run_backtest(panel: MetricPanel, prices: pd.DataFrame, boundaries: Optional[Dict[str, Tuple[float, float]]] = None,
+                 pillar_weights=PILLAR_WEIGHTS, metric_weights=METRIC_WEIGHTS, horizon: int = 1, quantiles: int = 5,
+                 cache_dir: Optional[str] = BACKTEST_CACHE_DIR, chunk_size: int = 256) -> dict:
+    """
+    Backtest an index configuration against local prices.
+
+    The whole panel is scored in batched array passes, then each date's
+    scores are compared with forward returns over horizon panel periods:
+    rank IC, equal-weighted quantile portfolio returns, the top-minus-bottom
+    spread and top-quantile turnover. Results are cached under cache_dir by
+    a hash of the panel, prices and configuration.
+
+    Args:
+        panel: Metric panel (dates x tickers x metrics)
+        prices: Date x ticker prices, e.g. from load_price_panel; aligned to
+            panel dates with the last price on or before each date
+        boundaries: Fixed boundaries; None uses point-in-time cross-sectional p10/p90
+        pillar_weights: Dictionary of weights for each pillar
+        metric_weights: Dictionary of metric weights within each pillar
+        horizon: Forward return horizon in panel periods
+        quantiles: Number of quantile portfolios
+        cache_dir: Directory for cached results, None to disable caching
+
+    Returns:
+        Dictionary with 'config_hash', 'summary' (dict of mean_ic, ic_std,
+        ic_ir, ic_hit_rate, mean quantile returns, long_short, turnover) and
+        'daily' (DataFrame per date with ic, q1..qN, long_short, turnover, coverage)
+    """
+    config = {
+        'boundaries': boundaries if boundaries is None else {k: list(v) for k, v in sorted(boundaries.items())},
+        'pillar_weights': pillar_weights,
+        'metric_weights': metric_weights,
+        'horizon': horizon,
+        'quantiles': quantiles,
+    }
+    key = config_hash(panel, prices, config)
+    cache_path = Path(cache_dir) / f"{key}.json" if cache_dir else None
+    if cache_path is not None and cache_path.exists():
+        with open(cache_path) as f:
+            cached = json.load(f)
+        daily = pd.DataFrame(**cached['daily'])
+        daily.index = pd.to_datetime(daily.index)
+        logger.info(f"Backtest {key} loaded from cache")
+        return {'config_hash': key, 'summary': cached['summary'], 'daily': daily}
+
+    scores = score_panel(panel, boundaries, pillar_weights, metric_weights, chunk_size)
+
+    aligned = prices.reindex(columns=panel.tickers).reindex(panel.dates, method='ffill').to_numpy(dtype=float)
+    forward = np.full(aligned.shape, np.nan)
+    if horizon < len(aligned):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            forward[:-horizon] = aligned[horizon:] / aligned[:-horizon] - 1.0
+
+    ic = rank_ic(scores, forward)
+    buckets = quantile_buckets(np.where(np.isnan(forward), np.nan, scores), quantiles)
+    quantile_returns = np.full((len(panel.dates), quantiles), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # empty bucket on a date
+        for q in range(1, quantiles + 1):
+            quantile_returns[:, q - 1] = np.nanmean(np.where(buckets == q, forward, np.nan), axis=1)
+
+    top = buckets == quantiles
+    held = top.sum(axis=1)
+    kept = (top[1:] & top[:-1]).sum(axis=1)
+    turnover = np.full(len(panel.dates), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        turnover[1:] = np.where(held[1:] > 0, 1.0 - kept / held[1:], np.nan)
+
+    daily = pd.DataFrame({'ic': ic}, index=panel.dates)
+    for q in range(quantiles):
+        daily[f'q{q + 1}'] = quantile_returns[:, q]
+    daily['long_short'] = quantile_returns[:, -1] - quantile_returns[:, 0]
+    daily['turnover'] = turnover
+    daily['coverage'] = (~np.isnan(scores) & ~np.isnan(forward)).sum(axis=1)
+
+    ic_std = float(daily['ic'].std())
+    summary = {
+        'dates': int(daily['ic'].notna().sum()),
+        'mean_ic': float(daily['ic'].mean()),
+        'ic_std': ic_std,
+        'ic_ir': float(daily['ic'].mean() / ic_std) if ic_std > 0 else float('nan'),
+        'ic_hit_rate': float((daily['ic'].dropna() > 0).mean()),
+        'quantile_returns': [float(daily[f'q{q + 1}'].mean()) for q in range(quantiles)],
+        'long_short': float(daily['long_short'].mean()),
+        'turnover': float(daily['turnover'].mean()),
+    }
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        serialized = daily.copy()
+        serialized.index = serialized.index.strftime('%Y-%m-%d')
+        with open(cache_path, 'w') as f:
+            json.dump({'config': config, 'summary': summary, 'daily': serialized.to_dict(orient='split')}, f)
+    return {'config_hash': key, 'summary': summary, 'daily': daily}
@@ -0,0 +1,111 @@
+import warnings
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from app.services.calculate_index import METRIC_WEIGHTS, PILLAR_WEIGHTS, ScoringEngine
+from app.services.calculate_min_max import filter_min_coverage
+
+
+def _rank_descending(scores: np.ndarray) -> np.ndarray:
+    """
+    Rank along the last axis, 1 being the highest score.
+    """
+    order = np.argsort(-scores, axis=-1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(1, scores.shape[-1] + 1), order.shape), axis=-1)
+    return ranks
+
+
+def bootstrap_boundaries(values: np.ndarray, replicates: int, seed: Optional[int] = None,
+                         lower: float = 0.10, upper: float = 0.90, chunk_size: int = 100):
+    """
+    Resample the universe with replacement and recompute p10/p90 per replicate.
+
+    Replicates are resampled chunk_size at a time, so at most a
+    chunk_size x N x M array is held in memory.
+
+    Args:
+        values: N x M metric matrix (NaN for missing)
+        replicates: Number of bootstrap replicates B
+        chunk_size: Replicates resampled per batch
+
+    Returns:
+        Tuple of (B x M lower bounds, B x M upper bounds); metrics with no data
+        in a replicate get the calculate_metric_boundaries default of (0, 1)
+    """
+    rng = np.random.default_rng(seed)
+    bounds = np.empty((2, replicates, values.shape[1]))
+    for start in range(0, replicates, chunk_size):
+        stop = min(start + chunk_size, replicates)
+        samples = rng.integers(0, len(values), size=(stop - start, len(values)))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN metric in a replicate
+            bounds[:, start:stop] = np.nanquantile(values[samples], [lower, upper], axis=1)  # 2 x b x M
+    empty = np.isnan(bounds[0])
+    return np.where(empty, 0.0, bounds[0]), np.where(empty, 1.0, bounds[1])
+
+
+def bootstrap_index_scores(companies_data: pd.DataFrame, boundaries, replicates: int = 1000,
+                           confidence: float = 0.90, seed: Optional[int] = None, chunk_size: int = 100,
+                           min_coverage: float = 0.0, pillar_weights=PILLAR_WEIGHTS,
+                           metric_weights=METRIC_WEIGHTS) -> Dict[str, pd.DataFrame]:
+    """
+    Bootstrap confidence intervals for index scores and ranks.
+
+    The universe is resampled B times; each replicate's p10/p90 boundaries
+    and the resulting scores for every company are computed as stacked
+    B x N x M array operations, processed chunk_size replicates at a time
+    to bound memory. Only companies passing min_coverage are resampled for
+    the boundaries, as in calculate_metric_boundaries, while every company
+    is scored.
+
+    Args:
+        companies_data: DataFrame where rows are companies and columns are metrics
+        boundaries: Dictionary of metric boundaries; selects the scored metrics
+            and gives the point estimate
+        replicates: Number of bootstrap replicates B
+        confidence: Two-sided interval coverage, e.g. 0.90 for 5%-95%
+        seed: Random seed for reproducible intervals
+        chunk_size: Replicates scored per batch
+        min_coverage: Minimum fraction of present metrics for a company to be
+            resampled into the boundaries; use the value the point boundaries
+            were computed with
+
+    Returns:
+        Dictionary with:
+            'summary': DataFrame per ticker with index_score, score_low, score_high,
+                score_std, rank, rank_low, rank_high
+            'scores': DataFrame of replicate scores, replicates x tickers
+    """
+    engine = ScoringEngine(boundaries, pillar_weights, metric_weights)
+    values, available = engine.matrix_from_frame(companies_data)
+    pillar_matrix = engine.pillar_weight_matrix(available)
+    total_weight = engine.pillar_weights.sum()
+
+    boundary_values, _ = engine.matrix_from_frame(filter_min_coverage(companies_data, min_coverage))
+    lower_bounds, upper_bounds = bootstrap_boundaries(boundary_values, replicates, seed, chunk_size=chunk_size)
+    scores = np.empty((replicates, len(values)))
+    for start in range(0, replicates, chunk_size):
+        stop = min(start + chunk_size, replicates)
+        normalized = engine.normalize(values[None, :, :], lower_bounds[start:stop, None, :],
+                                      upper_bounds[start:stop, None, :])  # b x N x M
+        pillar_scores = normalized @ pillar_matrix  # b x N x P
+        scores[start:stop] = pillar_scores @ engine.pillar_weights / total_weight if total_weight > 0 else 0.0
+
+    ranks = _rank_descending(scores)
+    point = engine.index_scores(engine.pillar_scores(engine.normalize(values), available))
+    alpha = (1.0 - confidence) / 2.0
+    score_low, score_high = np.quantile(scores, [alpha, 1.0 - alpha], axis=0)
+    rank_low, rank_high = np.quantile(ranks, [alpha, 1.0 - alpha], axis=0)
+
+    tickers = companies_data.index
+    summary = pd.DataFrame({
+        'index_score': point,
+        'score_low': score_low,
+        'score_high': score_high,
+        'score_std': scores.std(axis=0),
+        'rank': _rank_descending(point),
+        'rank_low': np.floor(rank_low).astype(int),
+        'rank_high': np.ceil(rank_high).astype(int),
+    }, index=tickers)
+    return {'summary': summary, 'scores': pd.DataFrame(scores, columns=tickers)}
@@ -1,5 +1,9 @@
+from typing import NamedTuple
 import numpy as np
 import pandas as pd
+from app import instrumentation
+from app.models.MetricsSchema import INVERSE_METRICS, INVERSE_METRICS_SET
+from app.services.calculate_min_max import GLOBAL_COHORT
 
 PILLAR_WEIGHTS = {
     'Profitability': 0.25,
@@ -59,14 +63,16 @@ METRIC_WEIGHTS = {
     }
 }
 
-INVERSE_METRICS = [
-    'capexToOperatingCashFlowTTM', 'capexToDepreciationTTM', 'capexToRevenueTTM',
-    'stockBasedCompensationToRevenueTTM', 'intangiblesToTotalAssetsTTM',
-    'debtToEquityRatioTTM', 'debtToAssetsRatioTTM', 'debtToCapitalRatioTTM',
-    'financialLeverageRatioTTM', 'effectiveTaxRateTTM', 'cashConversionCycleTTM',
-    'daysOfInventoryOutstandingTTM', 'daysOfSalesOutstandingTTM',
-    'salesGeneralAndAdministrativeToRevenueTTM'
-]
+# Attribution cell flags (bitmask)
+CLIPPED_LOW = 1     # raw value below the lower (p10) boundary
+CLIPPED_HIGH = 2    # raw value above the upper (p90) boundary
+MISSING = 4         # no value, scored 0
+DEGENERATE = 8      # lower == upper, scored 0.5
+
+class Attribution(NamedTuple):
+    contributions: pd.DataFrame
+    flags: pd.DataFrame
+    effective_weights: pd.Series
 
 def normalize_metric(value, min_val, max_val, is_inverse=False):
     """
@@ -120,7 +126,7 @@ def calculate_pillar_score(company_data, boundaries, pillar_name, metrics_weight
             value = company_data[metric]
             min_val, max_val = boundaries[metric]
             
-            is_inverse = metric in INVERSE_METRICS
+            is_inverse = metric in INVERSE_METRICS_SET
 
             norm_value = normalize_metric(value, min_val, max_val, is_inverse)
 
@@ -166,29 +172,323 @@ def calculate_company_index(company_data, boundaries, pillar_weights=PILLAR_WEIG
         'pillar_scores': pillar_scores
     }
 
-def calculate_all_companies_indexes(companies_data, boundaries):
+class ScoringEngine:
+    """
+    Batch scorer compiled once from weights and boundaries.
+
+    PILLAR_WEIGHTS, METRIC_WEIGHTS, the inverse flags and the boundaries are
+    turned into arrays so a whole company x metric matrix is scored with
+    clip/normalize/matmul operations. Results match calculate_company_index,
+    including missing values scoring 0 and min == max scoring 0.5.
+
+    Args:
+        boundaries: Dictionary of metric boundaries (min, max)
+        pillar_weights: Dictionary of weights for each pillar
+        metric_weights: Dictionary of metric weights within each pillar
+    """
+
+    def __init__(self, boundaries, pillar_weights=PILLAR_WEIGHTS, metric_weights=METRIC_WEIGHTS):
+        self.pillars = [pillar for pillar in pillar_weights if pillar in metric_weights]
+        self.pillar_weights = np.array([pillar_weights[pillar] for pillar in self.pillars], dtype=float)
+
+        self.metrics = []
+        for pillar in self.pillars:
+            for metric in metric_weights[pillar]:
+                if metric in boundaries and metric not in self.metrics:
+                    self.metrics.append(metric)
+        self.metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+        # metrics x pillars matrix of raw (unnormalized) metric weights
+        self.weight_matrix = np.zeros((len(self.metrics), len(self.pillars)))
+        for j, pillar in enumerate(self.pillars):
+            for metric, weight in metric_weights[pillar].items():
+                if metric in self.metric_index:
+                    self.weight_matrix[self.metric_index[metric], j] = weight
+
+        self.lower = np.array([boundaries[metric][0] for metric in self.metrics], dtype=float)
+        self.upper = np.array([boundaries[metric][1] for metric in self.metrics], dtype=float)
+        self.inverse = np.array([metric in INVERSE_METRICS_SET for metric in self.metrics], dtype=bool)
+
+    def matrix_from_frame(self, companies_data):
+        """
+        Extract the metric matrix in engine column order.
+
+        Returns:
+            Tuple of (N x M float array, boolean mask of metrics present as columns)
+        """
+        available = np.array([metric in companies_data.columns for metric in self.metrics], dtype=bool)
+        values = companies_data.reindex(columns=self.metrics).to_numpy(dtype=float)
+        return values, available
+
+    def normalize(self, values, lower=None, upper=None):
+        """
+        Normalize a matrix of raw metric values to [0, 1].
+
+        Args:
+            values: Array whose last axis follows self.metrics; NaN marks missing values
+            lower: Optional override of the lower bounds, broadcastable to values
+            upper: Optional override of the upper bounds, broadcastable to values
+
+        Returns:
+            Array of normalized values with the same shape as values
+        """
+        lower = self.lower if lower is None else lower
+        upper = self.upper if upper is None else upper
+        span = upper - lower
+        degenerate = span == 0
+
+        clipped = np.minimum(np.maximum(values, lower), upper)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normalized = (clipped - lower) / np.where(degenerate, 1.0, span)
+        normalized = np.where(self.inverse, 1.0 - normalized, normalized)
+        normalized = np.where(degenerate, 0.5, normalized)
+        return np.where(np.isnan(values), 0.0, normalized)
+
+    def pillar_weight_matrix(self, available=None):
+        """
+        Metric weights per pillar scaled so each pillar's available weights sum to 1.
+        """
+        weights = self.weight_matrix if available is None else self.weight_matrix * available[:, None]
+        totals = weights.sum(axis=0)
+        return np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+    def pillar_scores(self, normalized, available=None):
+        return normalized @ self.pillar_weight_matrix(available)
+
+    def effective_weights(self, available=None, pillar_weights=None):
+        """
+        Weight of each metric in the index: metric weight within its pillar(s)
+        times pillar weight over the total pillar weight. Contributions are
+        normalized values times these weights and sum to the index score.
+        """
+        pillar_weights = self.pillar_weights if pillar_weights is None else pillar_weights
+        total = pillar_weights.sum()
+        if total <= 0:
+            return np.zeros(len(self.metrics))
+        return self.pillar_weight_matrix(available) @ pillar_weights / total
+
+    def cell_flags(self, values, lower=None, upper=None):
+        """
+        Attribution flags (CLIPPED_LOW, CLIPPED_HIGH, MISSING, DEGENERATE) per cell.
+        """
+        lower = self.lower if lower is None else lower
+        upper = self.upper if upper is None else upper
+        missing = np.isnan(values)
+        flags = np.where(missing, MISSING, 0)
+        flags |= np.where(values < lower, CLIPPED_LOW, 0)
+        flags |= np.where(values > upper, CLIPPED_HIGH, 0)
+        flags |= np.where(~missing & (upper == lower), DEGENERATE, 0)
+        return flags
+
+    def index_scores(self, pillar_scores, pillar_weights=None):
+        pillar_weights = self.pillar_weights if pillar_weights is None else pillar_weights
+        total = pillar_weights.sum()
+        return pillar_scores @ pillar_weights / total if total > 0 else np.zeros(pillar_scores.shape[:-1])
+
+    def fallback_bounds(self, cohort_boundaries):
+        """
+        Bounds used where a company or metric has no cohort bound of its own.
+
+        This is the run's GLOBAL_COHORT entry from calculate_cohort_boundaries
+        when present (the same global bounds the cohort computation fell back
+        to), otherwise the engine's bounds.
+
+        Returns:
+            Tuple of (M lower bounds, M upper bounds)
+        """
+        lower, upper = self.lower.copy(), self.upper.copy()
+        for metric, (min_val, max_val) in cohort_boundaries.get(GLOBAL_COHORT, {}).items():
+            j = self.metric_index.get(metric)
+            if j is not None:
+                lower[j], upper[j] = min_val, max_val
+        return lower, upper
+
+    def compile_cohort_bounds(self, cohort_boundaries):
+        """
+        Stack per-cohort boundaries into arrays; metrics a cohort lacks use fallback_bounds.
+
+        Returns:
+            Tuple of (cohort names, C x M lower bounds, C x M upper bounds)
+        """
+        names = list(cohort_boundaries)
+        fallback_lower, fallback_upper = self.fallback_bounds(cohort_boundaries)
+        lower = np.tile(fallback_lower, (len(names), 1))
+        upper = np.tile(fallback_upper, (len(names), 1))
+        for i, cohort in enumerate(names):
+            for metric, (min_val, max_val) in cohort_boundaries[cohort].items():
+                j = self.metric_index.get(metric)
+                if j is not None:
+                    lower[i, j], upper[i, j] = min_val, max_val
+        return names, lower, upper
+
+    def row_bounds(self, index, cohorts, cohort_boundaries):
+        """
+        Per-company lower/upper bound matrices chosen by cohort label in one gather.
+
+        Companies with no label or an unknown cohort use fallback_bounds, the
+        same global bounds a cohort's sparse metrics fall back to.
+        """
+        names, lower, upper = self.compile_cohort_bounds(cohort_boundaries)
+        fallback_lower, fallback_upper = self.fallback_bounds(cohort_boundaries)
+        codes = pd.Categorical(cohorts.reindex(index), categories=names).codes.astype(np.int64)
+        codes[codes < 0] = len(names)
+        lower = np.vstack([lower, fallback_lower])
+        upper = np.vstack([upper, fallback_upper])
+        return lower[codes], upper[codes]
+
+    def score_frame(self, companies_data, cohorts=None, cohort_boundaries=None):
+        """
+        Score every company in a DataFrame in one batched pass.
+
+        Args:
+            companies_data: DataFrame where rows are companies and columns are metrics
+            cohorts: Optional Series mapping ticker -> cohort label (e.g. sector)
+            cohort_boundaries: Optional dictionary of cohort -> metric boundaries;
+                with cohorts, each company is scored against its cohort's bounds
+
+        Returns:
+            DataFrame with ticker, index_score and one <Pillar>_score column per pillar
+        """
+        return self._score(companies_data, cohorts, cohort_boundaries, attribution=False)[0]
+
+    def attribute_frame(self, companies_data, cohorts=None, cohort_boundaries=None):
+        """
+        Score every company and attribute each score to its metrics in the same batched pass.
+
+        Returns:
+            Tuple of (score_frame result, Attribution with the ticker x metric
+            contribution matrix, the per-cell flag bitmask and the effective
+            metric weights)
+        """
+        return self._score(companies_data, cohorts, cohort_boundaries, attribution=True)
+
+    def _score(self, companies_data, cohorts, cohort_boundaries, attribution):
+        values, available = self.matrix_from_frame(companies_data)
+        lower = upper = None
+        if cohorts is not None and cohort_boundaries:
+            lower, upper = self.row_bounds(companies_data.index, cohorts, cohort_boundaries)
+        normalized = self.normalize(values, lower, upper)
+        pillar_scores = self.pillar_scores(normalized, available)
+        index_scores = self.index_scores(pillar_scores)
+
+        result = pd.DataFrame({'ticker': companies_data.index.to_numpy(), 'index_score': index_scores})
+        for j, pillar in enumerate(self.pillars):
+            result[f'{pillar}_score'] = pillar_scores[:, j]
+        if not attribution:
+            return result, None
+
+        weights = self.effective_weights(available)
+        index = companies_data.index
+        return result, Attribution(
+            contributions=pd.DataFrame(normalized * weights, index=index, columns=self.metrics),
+            flags=pd.DataFrame(self.cell_flags(values, lower, upper), index=index, columns=self.metrics),
+            effective_weights=pd.Series(weights, index=self.metrics),
+        )
+
+@instrumentation.timed("stage.score")
+def calculate_all_companies_indexes(companies_data, boundaries, pillar_weights=PILLAR_WEIGHTS, metric_weights=METRIC_WEIGHTS,
+                                    cohorts=None, cohort_boundaries=None):
     """
     Calculate financial indexes for multiple companies.
     
     Args:
         companies_data: DataFrame where rows are companies and columns are metrics
         boundaries: Dictionary of metric boundaries
+        pillar_weights: Dictionary of weights for each pillar
+        metric_weights: Dictionary of metric weights within each pillar
+        cohorts: Optional Series mapping ticker -> cohort label (e.g. sector)
+        cohort_boundaries: Optional dictionary of cohort -> metric boundaries
         
     Returns:
         DataFrame with company tickers and their index scores
     """
-    results = []
-    
-    for ticker, company_data in companies_data.iterrows():
-        try:
-            index_result = calculate_company_index(company_data, boundaries)
-            
-            results.append({
-                'ticker': ticker,
-                'index_score': index_result['index_score'],
-                **{f'{pillar}_score': score for pillar, score in index_result['pillar_scores'].items()}
-            })
-        except Exception as e:
-            print(f"Error calculating index for {ticker}: {e}")
-
-    return pd.DataFrame(results)
+    engine = ScoringEngine(boundaries, pillar_weights, metric_weights)
+    return engine.score_frame(companies_data, cohorts=cohorts, cohort_boundaries=cohort_boundaries)
+
+
+def calculate_index_attribution(companies_data, boundaries, pillar_weights=PILLAR_WEIGHTS, metric_weights=METRIC_WEIGHTS,
+                                cohorts=None, cohort_boundaries=None):
+    """
+    Calculate financial indexes together with per-metric contributions.
+
+    Returns:
+        Tuple of (DataFrame as from calculate_all_companies_indexes, Attribution)
+    """
+    engine = ScoringEngine(boundaries, pillar_weights, metric_weights)
+    return engine.attribute_frame(companies_data, cohorts=cohorts, cohort_boundaries=cohort_boundaries)
+
+def decompose_score_change(previous_data, previous_boundaries, current_data, current_boundaries,
+                           pillar_weights=PILLAR_WEIGHTS, metric_weights=METRIC_WEIGHTS,
+                           previous_cohorts=None, previous_cohort_boundaries=None,
+                           current_cohorts=None, current_cohort_boundaries=None):
+    """
+    Split each company's run-over-run score change into input and boundary effects.
+
+    With x0/x1 the previous/current metrics and b0/b1 the previous/current
+    boundaries, the change s(x1, b1) - s(x0, b0) is split symmetrically:
+
+        input effect    = ((s(x1, b0) - s(x0, b0)) + (s(x1, b1) - s(x0, b1))) / 2
+        boundary effect = ((s(x0, b1) - s(x0, b0)) + (s(x1, b1) - s(x1, b0))) / 2
+
+    which add up exactly to the change. The four scorings run as one stacked
+    array pass and the split is also reported per metric. Companies present
+    in both runs are compared over the metrics present in both boundary sets.
+
+    Args:
+        previous_data: Previous run's metrics (ticker index)
+        previous_boundaries: Boundaries the previous run was scored with
+        current_data: Current metrics (ticker index)
+        current_boundaries: Current boundaries
+        previous_cohorts, previous_cohort_boundaries: Cohort labels and cohort
+            boundaries the previous run was scored with, if cohort-relative
+        current_cohorts, current_cohort_boundaries: Same for the current run;
+            a cohort change counts as a boundary effect
+
+    Returns:
+        Dictionary with:
+            'summary': DataFrame per ticker with old_score, new_score, change,
+                input_effect and boundary_effect
+            'input_effects': ticker x metric DataFrame of input effects
+            'boundary_effects': ticker x metric DataFrame of boundary effects
+    """
+    shared = {m: current_boundaries[m] for m in current_boundaries if m in previous_boundaries}
+    engine = ScoringEngine(shared, pillar_weights, metric_weights)
+    tickers = current_data.index.intersection(previous_data.index)
+    x0, available0 = engine.matrix_from_frame(previous_data.loc[tickers])
+    x1, available1 = engine.matrix_from_frame(current_data.loc[tickers])
+    shape = (len(tickers), len(engine.metrics))
+
+    def run_bounds(boundaries, cohorts, cohort_boundaries):
+        run_engine = ScoringEngine({m: boundaries[m] for m in engine.metrics}, pillar_weights, metric_weights)
+        if cohorts is not None and cohort_boundaries:
+            return run_engine.row_bounds(tickers, cohorts, cohort_boundaries)
+        return np.broadcast_to(run_engine.lower, shape), np.broadcast_to(run_engine.upper, shape)
+
+    b0 = run_bounds(previous_boundaries, previous_cohorts, previous_cohort_boundaries)
+    b1 = run_bounds(current_boundaries, current_cohorts, current_cohort_boundaries)
+
+    # stacked scorings: s(x0, b0), s(x0, b1), s(x1, b0), s(x1, b1)
+    values = np.stack([x0, x0, x1, x1])
+    lower = np.stack([b0[0], b1[0], b0[0], b1[0]])
+    upper = np.stack([b0[1], b1[1], b0[1], b1[1]])
+    weights = np.stack([engine.effective_weights(available0)] * 2 + [engine.effective_weights(available1)] * 2)
+    contributions = engine.normalize(values, lower, upper) * weights[:, None, :]
+    c00, c01, c10, c11 = contributions
+
+    input_effects = ((c10 - c00) + (c11 - c01)) / 2
+    boundary_effects = ((c01 - c00) + (c11 - c10)) / 2
+    old_score = c00.sum(axis=1)
+    new_score = c11.sum(axis=1)
+    summary = pd.DataFrame({
+        'ticker': tickers.to_numpy(),
+        'old_score': old_score,
+        'new_score': new_score,
+        'change': new_score - old_score,
+        'input_effect': input_effects.sum(axis=1),
+        'boundary_effect': boundary_effects.sum(axis=1),
+    })
+    return {
+        'summary': summary,
+        'input_effects': pd.DataFrame(input_effects, index=tickers, columns=engine.metrics),
+        'boundary_effects': pd.DataFrame(boundary_effects, index=tickers, columns=engine.metrics),
+    }
@@ -1,19 +1,46 @@
+import logging
+import hashlib
 import pandas as pd
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 import json
 from pathlib import Path
+from app import instrumentation
+from app.services.quantile_sketch import QuantileSketch
 
-def calculate_metric_boundaries(df: pd.DataFrame) -> Dict[str, Tuple[float, float]]:
+logger = logging.getLogger(__name__)
+
+GLOBAL_COHORT = "__global__"
+
+def filter_min_coverage(df: pd.DataFrame, min_coverage: float) -> pd.DataFrame:
+    """
+    Keep companies with at least min_coverage (0-1) of their metrics present.
+
+    Sparse rows (e.g. funds or symbols that returned an almost empty payload)
+    would otherwise pull the percentiles of the few metrics they do have.
+    """
+    if min_coverage <= 0:
+        return df
+    metrics = [c for c in df.columns if c not in ['fiscalYear']]
+    coverage = df[metrics].apply(pd.to_numeric, errors='coerce').notna().mean(axis=1)
+    kept = df[coverage >= min_coverage]
+    if len(kept) < len(df):
+        logger.info(f"Excluded {len(df) - len(kept)} companies below {min_coverage:.0%} metric coverage from boundaries")
+    return kept
+
+@instrumentation.timed("stage.boundaries")
+def calculate_metric_boundaries(df: pd.DataFrame, min_coverage: float = 0.0) -> Dict[str, Tuple[float, float]]:
     """
     Calculate the 10th and 90th percentiles for each metric across all companies.
     
     Args:
         df: DataFrame where rows are companies and columns are metrics
+        min_coverage: Minimum fraction of present metrics for a company to be included
         
     Returns:
         Dictionary where keys are metric names and values are tuples of (10th_percentile, 90th_percentile)
     """
     metric_boundaries = {}
+    df = filter_min_coverage(df, min_coverage)
     
 
     for column in df.columns:
@@ -30,12 +57,106 @@ def calculate_metric_boundaries(df: pd.DataFrame) -> Dict[str, Tuple[float, floa
             metric_boundaries[column] = (tenth_percentile, ninetieth_percentile)
         else:
             metric_boundaries[column] = (0.0, 1.0)
-            print(f"Warning: No valid data for metric {column}, using default bounds")
+            logger.warning(f"No valid data for metric {column}, using default bounds")
     
     return metric_boundaries
 
 
 
+def _cohort_fingerprint(values: pd.DataFrame, min_cohort_size: int) -> str:
+    """
+    Content hash of a cohort's rows and settings, used to skip recomputing unchanged cohorts.
+    """
+    ordered = values.sort_index()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"min_cohort_size={min_cohort_size}".encode())
+    digest.update("\x1f".join(map(str, ordered.index)).encode())
+    digest.update("\x1f".join(ordered.columns).encode())
+    digest.update(ordered.to_numpy(dtype=float).tobytes())
+    return digest.hexdigest()
+
+def calculate_cohort_boundaries(df: pd.DataFrame, cohorts: pd.Series, min_cohort_size: int = 10,
+                                cache: Optional[Dict[str, dict]] = None,
+                                min_coverage: float = 0.0) -> Dict[str, Dict[str, Tuple[float, float]]]:
+    """
+    Calculate 10th/90th percentile boundaries per cohort (e.g. sector) in one grouped pass.
+
+    A cohort metric with fewer than min_cohort_size values falls back to the
+    global boundary. Cohorts whose rows are unchanged since the cached run
+    are not recomputed.
+
+    Args:
+        df: DataFrame where rows are companies and columns are metrics
+        cohorts: Series mapping ticker -> cohort label (None/NaN for unknown)
+        min_cohort_size: Minimum values per cohort metric before cohort bounds are used
+        cache: Optional dictionary of cohort -> {'fingerprint', 'boundaries'},
+            updated in place
+        min_coverage: Minimum fraction of present metrics for a company to be included
+
+    Returns:
+        Dictionary of cohort -> metric boundaries, plus GLOBAL_COHORT with the
+        global boundaries
+    """
+    cache = {} if cache is None else cache
+    metrics = [c for c in df.columns if c not in ['fiscalYear']]
+    values = filter_min_coverage(df[metrics].apply(pd.to_numeric, errors='coerce'), min_coverage)
+    labels = cohorts.reindex(values.index)
+    global_boundaries = calculate_metric_boundaries(values)
+
+    fingerprints = {cohort: _cohort_fingerprint(group, min_cohort_size) for cohort, group in values.groupby(labels)}
+    dirty = [c for c, fp in fingerprints.items() if cache.get(c, {}).get('fingerprint') != fp]
+
+    if dirty:
+        subset = values[labels.isin(dirty)]
+        grouped = subset.groupby(labels[subset.index])
+        quantiles = grouped.quantile([0.10, 0.90])
+        counts = grouped.count()
+        for cohort in dirty:
+            enough = counts.loc[cohort] >= min_cohort_size
+            lower = quantiles.loc[(cohort, 0.10)]
+            upper = quantiles.loc[(cohort, 0.90)]
+            cache[cohort] = {
+                'fingerprint': fingerprints[cohort],
+                'boundaries': {m: (float(lower[m]), float(upper[m])) for m in metrics if enough[m]},
+            }
+
+    cohort_boundaries = {GLOBAL_COHORT: global_boundaries}
+    for cohort in fingerprints:
+        own = cache[cohort]['boundaries']
+        cohort_boundaries[cohort] = {m: tuple(own.get(m, global_boundaries[m])) for m in metrics}
+    return cohort_boundaries
+
+def save_cohort_boundaries(cohort_boundaries: Dict[str, Dict[str, Tuple[float, float]]], cache: Dict[str, dict],
+                           filepath: str = "data/cohort_boundaries.json"):
+    """
+    Save cohort boundaries and their per-cohort cache to a JSON file.
+    """
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump({
+            'boundaries': {c: {k: list(v) for k, v in b.items()} for c, b in cohort_boundaries.items()},
+            'cache': {c: {'fingerprint': e['fingerprint'], 'boundaries': {k: list(v) for k, v in e['boundaries'].items()}}
+                      for c, e in cache.items()},
+        }, f, indent=4)
+    logger.info(f"Cohort boundaries saved to {filepath}")
+
+def load_cohort_boundaries(filepath: str = "data/cohort_boundaries.json") -> Tuple[Dict[str, Dict[str, Tuple[float, float]]], Dict[str, dict]]:
+    """
+    Load cohort boundaries and their cache from a JSON file.
+
+    Returns:
+        Tuple of (cohort -> metric boundaries, cache); both empty if the file does not exist
+    """
+    try:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"File {filepath} not found. Returning empty cohort boundaries.")
+        return {}, {}
+    boundaries = {c: {k: tuple(v) for k, v in b.items()} for c, b in data['boundaries'].items()}
+    logger.info(f"Cohort boundaries loaded from {filepath}")
+    return boundaries, data['cache']
+
 def save_metric_boundaries(boundaries: Dict[str, Tuple[float, float]], filepath: str = "data/metric_boundaries.json"):
     """
     Save metric boundaries to a JSON file.
@@ -51,7 +172,7 @@ def save_metric_boundaries(boundaries: Dict[str, Tuple[float, float]], filepath:
     with open(filepath, 'w') as f:
         json.dump(boundaries_json, f, indent=4)
     
-    print(f"Metric boundaries saved to {filepath}")
+    logger.info(f"Metric boundaries saved to {filepath}")
 
 def load_metric_boundaries(filepath: str = "data/metric_boundaries.json") -> Dict[str, Tuple[float, float]]:
     """
@@ -68,8 +189,99 @@ def load_metric_boundaries(filepath: str = "data/metric_boundaries.json") -> Dic
             boundaries_json = json.load(f)
 
         boundaries = {k: tuple(v) for k, v in boundaries_json.items()}
-        print(f"Metric boundaries loaded from {filepath}")
+        logger.info(f"Metric boundaries loaded from {filepath}")
         return boundaries
     except FileNotFoundError:
-        print(f"Warning: File {filepath} not found. Returning empty dictionary.")
-        return {}
\ No newline at end of file
+        logger.warning(f"File {filepath} not found. Returning empty dictionary.")
+        return {}
+
+class BoundaryStore:
+    """
+    Per-metric quantile sketches that maintain boundaries incrementally.
+
+    The store is updated one company (or one DataFrame shard) at a time,
+    merged across workers, and serialized next to metric_boundaries.json, so
+    boundary refreshes never need the whole universe in memory. Sketches
+    cannot forget values, so start a new store for each refresh period.
+
+    Args:
+        k: Sketch size per metric; None keeps every value for exact percentiles
+    """
+
+    def __init__(self, k: Optional[int] = 200):
+        self.k = k
+        self.sketches: Dict[str, QuantileSketch] = {}
+
+    def _sketch(self, metric: str) -> QuantileSketch:
+        if metric not in self.sketches:
+            self.sketches[metric] = QuantileSketch(k=self.k)
+        return self.sketches[metric]
+
+    def update_company(self, metrics):
+        """
+        Add one company's metrics (a dictionary or Series of metric -> value).
+        """
+        for metric, value in metrics.items():
+            if metric in ['fiscalYear']:
+                continue
+            self._sketch(metric).update(value)
+
+    def update_frame(self, df: pd.DataFrame, min_coverage: float = 0.0):
+        """
+        Add every company in a DataFrame where rows are companies and columns are metrics,
+        skipping companies below min_coverage.
+        """
+        df = filter_min_coverage(df, min_coverage)
+        for column in df.columns:
+            if column in ['fiscalYear']:
+                continue
+            self._sketch(column).update_many(pd.to_numeric(df[column], errors='coerce').dropna())
+
+    def merge(self, other: "BoundaryStore") -> "BoundaryStore":
+        """
+        Merge the sketches of another store (e.g. from a worker shard) into this one.
+        """
+        for metric, sketch in other.sketches.items():
+            self._sketch(metric).merge(sketch)
+        return self
+
+    def boundaries(self, lower: float = 0.10, upper: float = 0.90) -> Dict[str, Tuple[float, float]]:
+        """
+        Produce boundaries in the same format as calculate_metric_boundaries.
+        """
+        metric_boundaries = {}
+        for metric, sketch in self.sketches.items():
+            if sketch.n > 0:
+                metric_boundaries[metric] = (sketch.quantile(lower), sketch.quantile(upper))
+            else:
+                metric_boundaries[metric] = (0.0, 1.0)
+                logger.warning(f"No valid data for metric {metric}, using default bounds")
+        return metric_boundaries
+
+    def to_dict(self) -> dict:
+        return {'k': self.k, 'sketches': {m: s.to_dict() for m, s in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BoundaryStore":
+        store = cls(k=data['k'])
+        store.sketches = {m: QuantileSketch.from_dict(s) for m, s in data['sketches'].items()}
+        return store
+
+    def save(self, filepath: str = "data/metric_boundary_sketches.json"):
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f)
+        logger.info(f"Metric boundary sketches saved to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str = "data/metric_boundary_sketches.json", k: Optional[int] = 200) -> "BoundaryStore":
+        """
+        Load a store from disk, or return an empty one if the file does not exist.
+        """
+        try:
+            with open(filepath, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"File {filepath} not found. Starting an empty boundary store.")
+            return cls(k=k)
+        return cls.from_dict(data)
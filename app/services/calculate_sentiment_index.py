@@ -0,0 +1,200 @@
+import json
+import math
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional
+import pandas as pd
+from app.clients.sentiment import SentimentSource
+from app.models.Sentiment import SentimentComponentScore, SentimentEvent, SentimentIndex
+
+STOKEN_SPEC_PATH = "app/specifications/stoken-metrics.json"
+
+
+@lru_cache(maxsize=None)
+def load_sentiment_spec(file_path: str = STOKEN_SPEC_PATH) -> dict:
+    """
+    Load the S-token spec (component weights, window and EMA settings) once per process.
+    """
+    with open(file_path, 'r') as f:
+        spec = json.load(f)
+    total = sum(c['weight'] for c in spec['components'].values())
+    if not math.isclose(total, 1.0, abs_tol=1e-9):
+        raise ValueError(f"S-token component weights sum to {total}, expected 1.0")
+    return spec
+
+
+class _ComponentState:
+    """
+    Time-aware EMA plus a bucketed sliding window for one ticker component.
+
+    The window is a fixed ring of buckets holding weight and weighted
+    sentiment sums with running totals, so memory is bounded by the bucket
+    count and each event costs O(1) amortized.
+    """
+
+    __slots__ = ('ema_sum', 'ema_weight', 'last_ts', 'bucket_weight', 'bucket_sum',
+                 'window_weight', 'window_sum', 'head')
+
+    def __init__(self, buckets: int):
+        self.ema_sum = 0.0
+        self.ema_weight = 0.0
+        self.last_ts: Optional[float] = None
+        self.bucket_weight = [0.0] * buckets
+        self.bucket_sum = [0.0] * buckets
+        self.window_weight = 0.0
+        self.window_sum = 0.0
+        self.head: Optional[int] = None  # absolute index of the newest bucket
+
+
+class SentimentAggregator:
+    """
+    Streaming S-Index calculator holding per-ticker aggregates in bounded memory.
+
+    Each component keeps an exponentially decayed weighted sum of sentiment
+    (half-life emaHalfLifeSeconds, decay scaled by the real gap between
+    events) and a sliding window of windowSeconds split into windowBuckets.
+    A component's sentiment is the decayed sum over the decayed weight plus
+    priorWeight, which pulls sparse or stale components back to neutral.
+    Its score maps sentiment from [-1, 1] to [0, 1]; the S-Index is the
+    weighted mean of the component scores.
+
+    Args:
+        spec: Parsed stoken-metrics.json, defaults to load_sentiment_spec()
+    """
+
+    def __init__(self, spec: Optional[dict] = None):
+        spec = spec or load_sentiment_spec()
+        self.weights: Dict[str, float] = {name: c['weight'] for name, c in spec['components'].items()}
+        self.buckets = int(spec.get('windowBuckets', 24))
+        self.window_seconds = float(spec.get('windowSeconds', 86400))
+        self.bucket_seconds = self.window_seconds / self.buckets
+        self.half_life = float(spec.get('emaHalfLifeSeconds', 21600))
+        self.prior_weight = float(spec.get('priorWeight', 1.0))
+        self._state: Dict[str, Dict[str, _ComponentState]] = {}
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    @property
+    def tickers(self) -> List[str]:
+        return list(self._state)
+
+    def _advance(self, state: _ComponentState, bucket: int):
+        """
+        Move the window head forward to bucket, expiring at most every bucket once.
+        """
+        if state.head is None:
+            state.head = bucket
+            return
+        steps = min(bucket - state.head, self.buckets)
+        for offset in range(1, steps + 1):
+            slot = (state.head + offset) % self.buckets
+            state.window_weight -= state.bucket_weight[slot]
+            state.window_sum -= state.bucket_sum[slot]
+            state.bucket_weight[slot] = 0.0
+            state.bucket_sum[slot] = 0.0
+        state.head = max(state.head, bucket)
+
+    def _decay(self, state: _ComponentState, timestamp: float) -> float:
+        if state.last_ts is None or timestamp <= state.last_ts:
+            return 1.0
+        return 0.5 ** ((timestamp - state.last_ts) / self.half_life)
+
+    def update(self, event: SentimentEvent) -> SentimentIndex:
+        """
+        Fold one event into its ticker's aggregates and return the updated S-Index.
+
+        Raises:
+            ValueError: If the event names a component not in the spec
+        """
+        if event.component not in self.weights:
+            raise ValueError(f"Unknown sentiment component: {event.component}")
+        components = self._state.get(event.ticker)
+        if components is None:
+            components = {name: _ComponentState(self.buckets) for name in self.weights}
+            self._state[event.ticker] = components
+        state = components[event.component]
+
+        decay = self._decay(state, event.timestamp)
+        state.ema_sum = state.ema_sum * decay + event.weight * event.sentiment
+        state.ema_weight = state.ema_weight * decay + event.weight
+        state.last_ts = event.timestamp if state.last_ts is None else max(state.last_ts, event.timestamp)
+
+        bucket = int(event.timestamp // self.bucket_seconds)
+        if state.head is None or bucket >= state.head:
+            self._advance(state, bucket)
+        if bucket > state.head - self.buckets:  # late events older than the window only feed the EMA
+            slot = bucket % self.buckets
+            state.bucket_weight[slot] += event.weight
+            state.bucket_sum[slot] += event.weight * event.sentiment
+            state.window_weight += event.weight
+            state.window_sum += event.weight * event.sentiment
+
+        return self.index(event.ticker, event.timestamp)
+
+    def _component_score(self, state: _ComponentState, now: float) -> SentimentComponentScore:
+        if state.last_ts is None:
+            return SentimentComponentScore(score=0.5, emaSentiment=None, windowMentions=0.0, windowSentiment=None)
+        decay = self._decay(state, now)
+        sentiment = state.ema_sum * decay / (state.ema_weight * decay + self.prior_weight)
+        self._advance(state, int(now // self.bucket_seconds))
+        window_weight = max(state.window_weight, 0.0)  # float drift after expiry
+        return SentimentComponentScore(
+            score=(sentiment + 1.0) / 2.0,
+            emaSentiment=sentiment,
+            windowMentions=window_weight,
+            windowSentiment=state.window_sum / window_weight if window_weight > 1e-12 else None,
+        )
+
+    def index(self, ticker: str, now: float) -> SentimentIndex:
+        """
+        Current S-Index for a ticker as of now; unknown tickers score neutral (0.5).
+        """
+        components = self._state.get(ticker, {})
+        scores = {}
+        for name in self.weights:
+            state = components.get(name)
+            scores[name] = (self._component_score(state, now) if state is not None
+                            else SentimentComponentScore(score=0.5, emaSentiment=None,
+                                                         windowMentions=0.0, windowSentiment=None))
+        index_score = sum(self.weights[name] * scores[name].score for name in self.weights)
+        return SentimentIndex(ticker=ticker, timestamp=now, index_score=index_score, components=scores)
+
+    def snapshot(self, now: float) -> pd.DataFrame:
+        """
+        S-Index and component scores for every tracked ticker as of now.
+        """
+        rows = []
+        for ticker in self._state:
+            result = self.index(ticker, now)
+            row = {'ticker': ticker, 'index_score': result.index_score}
+            row.update({f"{name}_score": c.score for name, c in result.components.items()})
+            row.update({f"{name}_mentions": c.windowMentions for name, c in result.components.items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def stream_sentiment_indexes(source: SentimentSource, aggregator: Optional[SentimentAggregator] = None,
+                             min_change: float = 0.0,
+                             on_update: Optional[Callable[[SentimentIndex], None]] = None) -> Iterator[SentimentIndex]:
+    """
+    Consume a sentiment source and yield S-Index updates as events arrive.
+
+    An update is emitted when a ticker's S-Index moves by more than
+    min_change since the last update emitted for it (or on its first event).
+
+    Args:
+        source: Event source, e.g. JsonlReplaySource for local testing
+        aggregator: Aggregator holding state, a fresh one if omitted
+        min_change: Minimum absolute S-Index change worth emitting
+        on_update: Optional callback invoked with every emitted update
+    """
+    aggregator = SentimentAggregator() if aggregator is None else aggregator
+    last_emitted: Dict[str, float] = {}
+    for event in source.events():
+        result = aggregator.update(event)
+        previous = last_emitted.get(event.ticker)
+        if previous is None or abs(result.index_score - previous) > min_change:
+            last_emitted[event.ticker] = result.index_score
+            if on_update is not None:
+                on_update(result)
+            yield result
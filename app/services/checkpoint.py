@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app import instrumentation
+from app.clients.fmp import FMP_MAX_IN_FLIGHT, iter_combined_ttm
+from app.models.MetricsSchema import get_metrics_schema
+from app.models.RunReport import RunReport
+from app.services.universe import STATUS_EMPTY, STATUS_NOT_FOUND, UniverseRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class RunCheckpoint:
+    """
+    Durable append-only checkpoint of one run date's per-ticker results.
+
+    Each line of <directory>/run-YYYY-MM-DD[-<run_id>].jsonl records either a built
+    company ({"status": "ok", "metrics": {...}}) or a failure. Lines are
+    flushed and fsynced as they are written, so a crash loses at most the
+    ticker in flight. When a ticker appears more than once the last line wins.
+
+    Args:
+        run_date: Run date (YYYY-MM-DD), defaults to today (UTC)
+        directory: Directory holding checkpoint files
+        run_id: Optional scope within the date, so several runs on one day
+            (e.g. intraday refresh cycles) do not resume from each other
+    """
+
+    def __init__(self, run_date: Optional[str] = None, directory: str = "data/checkpoints",
+                 run_id: Optional[str] = None):
+        self.run_date = run_date or datetime.utcnow().strftime("%Y-%m-%d")
+        self.run_id = run_id
+        suffix = f"-{run_id}" if run_id else ""
+        self.path = Path(directory) / f"run-{self.run_date}{suffix}.jsonl"
+        self.completed: Dict[str, dict] = {}
+        self.failures: Dict[str, Tuple[int, str]] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from an interrupted write
+                ticker = record["ticker"]
+                if record["status"] == "ok":
+                    self.completed[ticker] = record
+                    self.failures.pop(ticker, None)
+                else:
+                    attempts = self.failures.get(ticker, (0, ""))[0] + 1
+                    self.failures[ticker] = (attempts, record["error"])
+
+    def _append(self, record: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_success(self, ticker: str, fiscal_year: str, metrics: Dict[str, Optional[float]]):
+        record = {"ticker": ticker, "status": "ok", "fiscalYear": fiscal_year, "metrics": metrics}
+        self._append(record)
+        self.completed[ticker] = record
+        self.failures.pop(ticker, None)
+
+    def record_failure(self, ticker: str, error: Exception):
+        self._append({"ticker": ticker, "status": "failed", "error": f"{type(error).__name__}: {error}"})
+        attempts = self.failures.get(ticker, (0, ""))[0] + 1
+        self.failures[ticker] = (attempts, f"{type(error).__name__}: {error}")
+
+    def completed_frame(self, tickers: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Completed companies in the extract_all_metrics_dataframe layout.
+        """
+        schema = get_metrics_schema()
+        selected = [t for t in (self.completed if tickers is None else tickers) if t in self.completed]
+        values = np.array(
+            [schema.build_row(self.completed[t]["metrics"]) for t in selected], dtype=float
+        ).reshape(len(selected), len(schema.metrics))
+        df = pd.DataFrame(values, index=pd.Index(selected, name='ticker'), columns=list(schema.metrics))
+        df.insert(0, 'fiscalYear', [self.completed[t]["fiscalYear"] for t in selected])
+        return df
+
+
+def run_universe(tickers: List[str], run_date: Optional[str] = None, max_retries: int = 2,
+                 max_in_flight: int = FMP_MAX_IN_FLIGHT, directory: str = "data/checkpoints",
+                 registry: Optional[UniverseRegistry] = None,
+                 run_id: Optional[str] = None) -> Tuple[pd.DataFrame, RunReport]:
+    """
+    Fetch a ticker universe with per-ticker checkpointing and retries.
+
+    Tickers already checkpointed for run_date are skipped. Every other ticker
+    is fetched concurrently and written to the checkpoint as soon as it
+    completes. Failed tickers go to a retry queue that is re-fetched up to
+    max_retries more times.
+
+    With a registry, negative-cached symbols and funds are not fetched, and
+    symbols returning an empty payload or 404 are negative-cached instead
+    of retried.
+
+    Args:
+        tickers: Ticker symbols in the universe
+        run_date: Run date (YYYY-MM-DD), defaults to today (UTC)
+        max_retries: Extra attempts for tickers that failed
+        max_in_flight: Maximum number of concurrent HTTP requests
+        directory: Directory holding checkpoint files
+        registry: Optional UniverseRegistry, updated and saved in place
+        run_id: Checkpoint scope within run_date; only a run with the same
+            run_id resumes from this run's checkpoint
+
+    Returns:
+        Tuple of (metrics DataFrame for every succeeded ticker, RunReport)
+    """
+    checkpoint = RunCheckpoint(run_date, directory, run_id)
+    schema = get_metrics_schema()
+    fiscal_year = str(datetime.utcnow().year)
+
+    universe = list(dict.fromkeys(tickers))
+    report = RunReport(runDate=checkpoint.run_date)
+    report.skipped = [t for t in universe if t in checkpoint.completed]
+    queue = [t for t in universe if t not in checkpoint.completed]
+    if registry is not None:
+        queue, report.excluded = registry.eligible(queue)
+
+    for attempt in range(max_retries + 1):
+        if not queue:
+            break
+        if attempt:
+            logger.info(f"Retrying {len(queue)} failed tickers (attempt {attempt + 1}/{max_retries + 1})")
+        retry_queue = []
+        for ticker, payload in iter_combined_ttm(queue, max_in_flight=max_in_flight):
+            if registry is not None:
+                status = registry.record_result(ticker, payload)
+                if status in (STATUS_EMPTY, STATUS_NOT_FOUND):
+                    report.excluded[ticker] = status
+                    continue
+            if isinstance(payload, Exception):
+                checkpoint.record_failure(ticker, payload)
+                retry_queue.append(ticker)
+                instrumentation.increment("ticker_attempts_total", result="failed")
+                continue
+            row = schema.build_row(payload)
+            metrics = {m: float(v) for m, v in zip(schema.metrics, row) if not np.isnan(v)}
+            checkpoint.record_success(ticker, fiscal_year, metrics)
+            report.succeeded.append(ticker)
+            instrumentation.increment("ticker_attempts_total", result="succeeded")
+        queue = retry_queue
+
+    if registry is not None:
+        registry.save()
+    report.failed = {t: checkpoint.failures[t][1] for t in queue}
+    return checkpoint.completed_frame([t for t in universe if t not in report.excluded]), report
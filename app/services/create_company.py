@@ -1,6 +1,7 @@
 from datetime import datetime
-from app.clients.fmp import fetch_and_build_ftoken, load_metrics_schema
+from app.clients.fmp import fetch_and_build_ftoken, fetchFMP_PROFILE
 from app.models.Company import Company
+from app.models.MetricsSchema import get_metrics_schema
 from app.models.FinancialModel import CompanyFinancialMetrics, ReturnOnCapital, CapexAndCostStructure, AssetAndCapitalQuality, CashCycle, Profitability, CashFlowStrength, Efficiency, Liquidity, Solvency, PerShareFundamentals, TaxAndEarningsStructure
 from typing import Dict, Optional
 from pprint import pprint
@@ -28,11 +29,19 @@ def createCompany(symbol) -> Company:
     """
     Create a Company object from the provided data.
     """
-    metrics = load_metrics_schema("app/specifications/ftoken-metrics.json")
+    metrics = get_metrics_schema().raw
     data = fetch_and_build_ftoken(symbol, metrics_schema=metrics)
+    return createCompanyFromFToken(data, fetchFMP_PROFILE(symbol))
+
+def createCompanyFromFToken(data, profile=None) -> Company:
+    """
+    Create a Company object from an already built FToken object and optional company profile.
+    """
+    profile = profile or {}
     return Company(
         ticker=data.get("symbol"),
-        industry=None, 
+        sector=profile.get("sector") or None,
+        industry=profile.get("industry") or None,
         fiscalYear=str(datetime.utcnow().year),
         financials=createFinancialMetricsObject(data)
     )
@@ -1,24 +1,135 @@
-import time
+import logging
+from datetime import datetime
 from typing import List
 import pandas as pd
+from app import instrumentation
+from app.clients.fmp import FMP_MAX_IN_FLIGHT, build_ftoken_object, fetch_and_build_ftokens, fetch_combined_ttm_many, fetch_profiles_many
+from app.clients.providers import fetch_consensus_many
 from app.models.Company import Company
-from app.services.create_company import createCompany
+from app.models.MetricBatch import MetricBatch
+from app.models.MetricsSchema import get_metrics_schema
+from app.services.create_company import createCompanyFromFToken, createFinancialMetricsObject
+from app.services.universe import STATUS_EMPTY, STATUS_NOT_FOUND, result_status
 
+logger = logging.getLogger(__name__)
 
-def fetch_and_create_companies(tickers) ->list[Company]:
+
+def fetch_and_create_companies(tickers, max_in_flight: int = FMP_MAX_IN_FLIGHT) ->list[Company]:
     """
     Fetch and create Company objects for the given tickers.
+
+    Requests for all tickers are issued concurrently over a pooled session,
+    with at most max_in_flight requests open at once. Companies are returned
+    in ticker order; tickers that fail are reported and skipped.
     """
+    metrics = get_metrics_schema().raw
+    with instrumentation.span("stage.fetch", tickers=len(tickers)):
+        ftokens = fetch_and_build_ftokens(tickers, metrics, max_in_flight=max_in_flight)
+        profiles = fetch_profiles_many(tickers, max_in_flight=max_in_flight)
+
     companies = []
-    for ticker in tickers:
-        try:
-            company = createCompany(ticker)
-            companies.append(company)
-            time.sleep(.5)
-        except Exception as e:
-            print(f"Error creating company for {ticker}: {e}")
+    with instrumentation.span("stage.construct", tickers=len(ftokens)):
+        for ticker, data in ftokens.items():
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                profile = profiles.get(ticker)
+                companies.append(createCompanyFromFToken(data, None if isinstance(profile, Exception) else profile))
+            except Exception as e:
+                logger.error(f"Error creating company for {ticker}: {e}")
     return companies
 
+def fetch_metric_batch(tickers, max_in_flight: int = FMP_MAX_IN_FLIGHT, strict: bool = False,
+                       providers=None, quorum=None, registry=None, statuses=None) -> MetricBatch:
+    """
+    Fetch metrics for the given tickers straight into a compact MetricBatch.
+
+    No per-company Pydantic objects are built unless strict is set, in which
+    case each payload is also validated through CompanyFinancialMetrics and
+    tickers that fail validation are reported and skipped.
+
+    Args:
+        tickers: Ticker symbols to fetch
+        max_in_flight: Maximum number of concurrent HTTP requests
+        strict: Validate every payload against the Pydantic models
+        providers: Optional list of providers; when given, each ticker's
+            payload is the consensus of the providers instead of FMP alone
+        quorum: Providers that must answer per ticker (defaults to a majority)
+        registry: Optional UniverseRegistry; negative-cached symbols and funds
+            are skipped, and empty/404 results are negative-cached
+        statuses: Optional dictionary filled with each fetched ticker's
+            result_status, for callers that update a registry elsewhere
+            (e.g. in another process); empty/404 tickers are skipped
+
+    Returns:
+        MetricBatch with one row per successfully fetched ticker, in ticker order
+    """
+    metrics = get_metrics_schema().raw
+    if registry is not None:
+        tickers, excluded = registry.eligible(tickers)
+        if excluded:
+            logger.info(f"Skipping {len(excluded)} symbols excluded by the universe registry")
+    with instrumentation.span("stage.fetch", tickers=len(tickers)):
+        if providers:
+            payloads = {
+                ticker: result if isinstance(result, Exception) else result.payload
+                for ticker, result in fetch_consensus_many(tickers, providers, quorum=quorum,
+                                                           max_symbols_in_flight=max_in_flight).items()
+            }
+        else:
+            payloads = fetch_combined_ttm_many(tickers, max_in_flight=max_in_flight)
+    fiscal_year = str(datetime.utcnow().year)
+
+    batch = MetricBatch(capacity=len(payloads))
+    with instrumentation.span("stage.build", tickers=len(payloads), strict=strict):
+        for ticker, payload in payloads.items():
+            try:
+                if registry is not None or statuses is not None:
+                    status = registry.record_result(ticker, payload) if registry is not None else result_status(payload)
+                    if statuses is not None:
+                        statuses[ticker] = status
+                    if status in (STATUS_EMPTY, STATUS_NOT_FOUND):
+                        continue
+                if isinstance(payload, Exception):
+                    raise payload
+                if strict:
+                    createFinancialMetricsObject(build_ftoken_object(payload, metrics))
+                batch.append(payload.get("symbol") or ticker, fiscal_year, payload)
+            except Exception as e:
+                logger.error(f"Error creating company for {ticker}: {e}")
+    if registry is not None:
+        registry.save()
+    return batch
+
+def fetch_metrics_dataframe(tickers, max_in_flight: int = FMP_MAX_IN_FLIGHT, strict: bool = False,
+                            providers=None, quorum=None, registry=None) -> pd.DataFrame:
+    """
+    Fetch metrics for the given tickers into the same DataFrame layout as extract_all_metrics_dataframe.
+    """
+    return fetch_metric_batch(tickers, max_in_flight=max_in_flight, strict=strict,
+                              providers=providers, quorum=quorum, registry=registry).to_dataframe()
+
+def fetch_company_profiles(tickers, max_in_flight: int = FMP_MAX_IN_FLIGHT) -> pd.DataFrame:
+    """
+    Fetch sector and industry metadata for the given tickers.
+
+    Profiles go through the same on-disk response cache as the TTM endpoints,
+    so repeated runs only revalidate them.
+
+    Returns:
+        DataFrame indexed by ticker with sector and industry columns (None when unknown)
+    """
+    rows = {}
+    for ticker, profile in fetch_profiles_many(tickers, max_in_flight=max_in_flight).items():
+        if isinstance(profile, Exception):
+            logger.error(f"Error fetching profile for {ticker}: {profile}")
+            profile = {}
+        rows[ticker] = {'sector': profile.get('sector') or None, 'industry': profile.get('industry') or None}
+    df = pd.DataFrame.from_dict(rows, orient='index', columns=['sector', 'industry'])
+    df.index.name = 'ticker'
+    return df
+
+@instrumentation.timed("stage.flatten")
 def extract_all_metrics_dataframe(companies: List[Company]) -> pd.DataFrame:
     """
     Extract all metrics from Company objects into a flat DataFrame.
@@ -0,0 +1,119 @@
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from app.services.calculate_index import ScoringEngine
+from app.services.snapshot_store import Snapshot
+
+
+class IncrementalResult(NamedTuple):
+    indexes: pd.DataFrame
+    delta: pd.DataFrame
+    full_rescore: bool
+    rescored: int
+
+
+def boundaries_equal(a: Dict, b: Dict) -> bool:
+    if a.keys() != b.keys():
+        return False
+    return all(np.allclose(a[k], b[k], rtol=0, atol=0, equal_nan=True) for k in a)
+
+
+def cohort_boundaries_equal(a: Optional[Dict], b: Optional[Dict]) -> bool:
+    if not a or not b:
+        return not a and not b
+    return a.keys() == b.keys() and all(boundaries_equal(a[k], b[k]) for k in a)
+
+
+def find_dirty_tickers(metrics_df: pd.DataFrame, previous: Optional[Snapshot],
+                       cohorts: Optional[pd.Series] = None) -> pd.Index:
+    """
+    Tickers whose metric rows (or cohort labels) are new or differ from the previous snapshot.
+    """
+    if previous is None:
+        return metrics_df.index
+    prev = previous.metrics.drop(columns=['fiscalYear'], errors='ignore')
+    current = metrics_df.drop(columns=['fiscalYear'], errors='ignore')
+    common = current.index.intersection(prev.index)
+
+    new = current.loc[common].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    old = prev.reindex(index=common, columns=current.columns).to_numpy(dtype=float)
+    same = (new == old) | (np.isnan(new) & np.isnan(old))
+    changed = ~same.all(axis=1)
+    if cohorts is not None and previous.cohorts is not None:
+        now_label = cohorts.reindex(common).astype(object).where(lambda x: x.notna(), None)
+        old_label = previous.cohorts.reindex(common).astype(object).where(lambda x: x.notna(), None)
+        changed |= (now_label.to_numpy() != old_label.to_numpy())
+    changed = common[changed]
+    return current.index.difference(common).append(changed)
+
+
+def incremental_rescore(metrics_df: pd.DataFrame, boundaries, previous: Optional[Snapshot],
+                        threshold: float = 0.0, scoring_df: Optional[pd.DataFrame] = None,
+                        cohorts: Optional[pd.Series] = None, cohort_boundaries: Optional[Dict] = None) -> IncrementalResult:
+    """
+    Rescore only companies whose inputs changed since the previous snapshot.
+
+    Unchanged companies keep their previous scores. If the boundaries (or
+    the cohort boundaries, including switching between global and
+    cohort-relative scoring) differ from the ones stored in the previous
+    snapshot, every company is rescored.
+
+    Args:
+        metrics_df: Freshly fetched metrics (ticker index)
+        boundaries: Dictionary of metric boundaries to score with
+        previous: Last stored Snapshot, or None for a first run
+        threshold: Minimum absolute index_score change reported in the delta
+        scoring_df: Values to score with, e.g. validate_metrics' cleaned frame
+            (same index as metrics_df); dirty tickers are still found by
+            comparing the raw metrics_df with the snapshot
+        cohorts: Ticker -> cohort label for cohort-relative scoring; a ticker
+            whose label changed is rescored
+        cohort_boundaries: Cohort -> metric boundaries used with cohorts
+
+    Returns:
+        IncrementalResult with the full index DataFrame, the delta of changed
+        scores (ticker, status, old_score, new_score, change), whether a full
+        rescore happened, and how many companies were rescored
+    """
+    engine = ScoringEngine(boundaries)
+    if cohorts is None:
+        cohort_boundaries = None
+    full_rescore = (previous is None or not boundaries_equal(previous.boundaries, boundaries)
+                    or not cohort_boundaries_equal(previous.cohort_boundaries, cohort_boundaries))
+    dirty = metrics_df.index if full_rescore else find_dirty_tickers(metrics_df, previous, cohorts)
+
+    scoring_df = metrics_df if scoring_df is None else scoring_df
+    rescored = engine.score_frame(scoring_df.loc[dirty], cohorts, cohort_boundaries).set_index('ticker')
+    if full_rescore:
+        indexes = rescored
+    else:
+        kept = previous.scores.reindex(metrics_df.index.difference(dirty))
+        indexes = pd.concat([kept, rescored]).reindex(metrics_df.index)
+    indexes.index.name = 'ticker'
+
+    old_scores = previous.scores['index_score'] if previous is not None else pd.Series(dtype=float)
+    new_scores = indexes['index_score']
+    all_tickers = new_scores.index.union(old_scores.index, sort=False)
+    old = old_scores.reindex(all_tickers)
+    new = new_scores.reindex(all_tickers)
+
+    status = pd.Series('changed', index=all_tickers)
+    status[old.isna() & new.notna()] = 'new'
+    status[new.isna() & old.notna()] = 'removed'
+    change = new - old
+    moved = (status != 'changed') | (change.abs() > threshold)
+
+    delta = pd.DataFrame({
+        'ticker': all_tickers,
+        'status': status.to_numpy(),
+        'old_score': old.to_numpy(),
+        'new_score': new.to_numpy(),
+        'change': change.to_numpy(),
+    })[moved.to_numpy()].reset_index(drop=True)
+
+    return IncrementalResult(
+        indexes=indexes.reset_index(),
+        delta=delta,
+        full_rescore=full_rescore,
+        rescored=len(dirty),
+    )
@@ -0,0 +1,277 @@
+import argparse
+import json
+import logging
+import math
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+from app.instrumentation import configure_logging
+from app.services.calculate_index import ScoringEngine
+from app.services.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+class OracleState(NamedTuple):
+    date: str
+    run: str
+    scores: Dict[str, dict]
+    encoded: Dict[str, bytes]
+    ranked: List[str]
+    boundaries: dict
+    engine: ScoringEngine
+
+
+def _clean(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def build_state(snapshot) -> OracleState:
+    """
+    Precompute everything a query needs from one snapshot.
+    """
+    scores = {
+        ticker: {'ticker': ticker, **{k: _clean(float(v)) for k, v in row.items()}}
+        for ticker, row in snapshot.scores.to_dict(orient='index').items()
+    }
+    ranked = sorted(
+        (t for t, s in scores.items() if s.get('index_score') is not None),
+        key=lambda t: scores[t]['index_score'],
+        reverse=True,
+    )
+    for rank, ticker in enumerate(ranked, start=1):
+        scores[ticker]['rank'] = rank
+    return OracleState(
+        date=snapshot.date,
+        run=snapshot.run,
+        scores=scores,
+        encoded={t: json.dumps({'date': snapshot.date, **s}).encode() for t, s in scores.items()},
+        ranked=ranked,
+        boundaries=snapshot.boundaries,
+        engine=ScoringEngine(snapshot.boundaries),
+    )
+
+
+class OracleService:
+    """
+    In-memory view of the latest scored snapshot.
+
+    All queries read one immutable OracleState; reload() builds a new state
+    off to the side and swaps it in with a single reference assignment, so
+    readers never see a half-loaded snapshot and never wait on FMP.
+
+    Args:
+        store: SnapshotStore written by the scoring runs
+    """
+
+    def __init__(self, store: Optional[SnapshotStore] = None):
+        self.store = store or SnapshotStore()
+        self._state: Optional[OracleState] = None
+        self._reload_lock = threading.Lock()
+
+    @property
+    def state(self) -> Optional[OracleState]:
+        return self._state
+
+    def reload(self) -> bool:
+        """
+        Swap to the latest snapshot if it differs from the one being served.
+        """
+        with self._reload_lock:
+            dates = self.store.dates()
+            if not dates:
+                return False
+            runs = self.store.runs(dates[-1])
+            if not runs:
+                return False
+            current = self._state
+            if current is not None and (current.date, current.run) == (dates[-1], runs[-1]):
+                return False
+            snapshot = self.store.load(dates[-1], runs[-1])
+            self._state = build_state(snapshot)
+            logger.info(f"Oracle serving snapshot {snapshot.date} run {snapshot.run} ({len(self._state.scores)} tickers)")
+            return True
+
+    def watch(self, interval: float) -> threading.Event:
+        """
+        Poll the snapshot store in the background and hot-swap new runs.
+
+        Returns:
+            Event that stops the watcher when set
+        """
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"Error reloading snapshot: {e}")
+
+        threading.Thread(target=loop, daemon=True).start()
+        return stop
+
+    def score(self, ticker: str) -> Optional[dict]:
+        state = self._state
+        return state.scores.get(ticker) if state else None
+
+    def top(self, k: int = 10) -> List[dict]:
+        state = self._state
+        return [state.scores[t] for t in state.ranked[:max(k, 0)]] if state else []
+
+    def bulk(self, tickers: List[str]) -> Dict[str, Optional[dict]]:
+        state = self._state
+        return {t: state.scores.get(t) if state else None for t in tickers}
+
+    def evaluate(self, companies: Dict[str, Dict[str, float]]) -> List[dict]:
+        """
+        Score caller-supplied metrics with the resident boundaries and weights.
+
+        Raises:
+            ValueError: If companies is not {ticker: {metric: number or null}}
+                or a company has none of the scored metrics
+        """
+        if not isinstance(companies, dict):
+            raise ValueError("body must be a JSON object of {ticker: {metric: value}}")
+        for ticker, metrics in companies.items():
+            if not isinstance(metrics, dict):
+                raise ValueError(f"{ticker}: metrics must be a JSON object of {{metric: value}}")
+            for metric, value in metrics.items():
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                    raise ValueError(f"{ticker}.{metric}: value must be a number or null")
+        state = self._state
+        if state is None:
+            return []
+        known = set(state.engine.metrics)
+        for ticker, metrics in companies.items():
+            if not known.intersection(metrics):
+                raise ValueError(f"{ticker}: none of the scored metrics are present")
+        result = state.engine.score_frame(pd.DataFrame.from_dict(companies, orient='index'))
+        return [{k: _clean(v) for k, v in row.items()} for row in result.to_dict(orient='records')]
+
+
+class OracleRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health                 snapshot date, run and ticker count
+    GET  /score/<ticker>         one ticker's index and pillar scores
+    GET  /scores?tickers=A,B,C   several tickers at once
+    GET  /top?k=10               highest index scores
+    POST /reload                 swap to the latest snapshot now
+    POST /evaluate               score {ticker: {metric: value}} with resident boundaries
+    """
+
+    protocol_version = 'HTTP/1.1'
+    service: OracleService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        state = self.service.state
+
+        if url.path == '/health':
+            self._send(200, {
+                'date': state.date if state else None,
+                'run': state.run if state else None,
+                'tickers': len(state.scores) if state else 0,
+            })
+        elif state is None:
+            self._send(503, {'error': 'no snapshot loaded'})
+        elif url.path.startswith('/score/'):
+            encoded = state.encoded.get(url.path[len('/score/'):].upper())
+            if encoded is None:
+                self._send(404, {'error': 'unknown ticker'})
+            else:
+                self._send(200, encoded)
+        elif url.path == '/scores':
+            tickers = [t.strip().upper() for t in ','.join(query.get('tickers', [])).split(',') if t.strip()]
+            self._send(200, {'date': state.date, 'scores': self.service.bulk(tickers)})
+        elif url.path == '/top':
+            try:
+                k = int(query.get('k', ['10'])[0])
+            except ValueError:
+                self._send(400, {'error': 'k must be an integer'})
+                return
+            if k < 0:
+                self._send(400, {'error': 'k must not be negative'})
+                return
+            self._send(200, {'date': state.date, 'top': self.service.top(k)})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/reload':
+            swapped = self.service.reload()
+            state = self.service.state
+            self._send(200, {'swapped': swapped, 'date': state.date if state else None,
+                             'run': state.run if state else None})
+        elif url.path == '/evaluate':
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                companies = json.loads(self.rfile.read(length) or b'{}')
+                self._send(200, {'scores': self.service.evaluate(companies)})
+            except (ValueError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+        else:
+            self._send(404, {'error': 'not found'})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: OracleService, host: str = '127.0.0.1', port: int = 8080,
+                socket_path: Optional[str] = None):
+    """
+    Create a threaded HTTP server (TCP, or a Unix socket when socket_path is given).
+    """
+    handler = type('BoundOracleRequestHandler', (OracleRequestHandler,), {'service': service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve precomputed F-Index scores from the snapshot store")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--socket', dest='socket_path', default=None, help="serve on a Unix socket instead of TCP")
+    parser.add_argument('--snapshots', default='data/snapshots')
+    parser.add_argument('--watch', type=float, default=60.0, help="seconds between snapshot checks, 0 to disable")
+    args = parser.parse_args()
+    configure_logging()
+
+    service = OracleService(SnapshotStore(args.snapshots))
+    service.reload()
+    if args.watch > 0:
+        service.watch(args.watch)
+
+    server = make_server(service, args.host, args.port, args.socket_path)
+    logger.info(f"Oracle listening on {args.socket_path or f'{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+PAYLOAD_MAGIC = b"FSP1"
+HEADER = struct.Struct(">4sIIH32s")
+DEFAULT_SCALE = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+class PublishedState:
+    """
+    Last published on-chain state: quantized scores and stable ticker ids.
+
+    Ticker symbols are sent once, when a ticker is first published, and
+    referenced by a compact numeric id afterwards.
+
+    Args:
+        path: JSON file the state is persisted to
+    """
+
+    def __init__(self, path: str = "data/published_state.json"):
+        self.path = path
+        self.sequence = 0
+        self.scale = DEFAULT_SCALE
+        self.ticker_ids: Dict[str, int] = {}
+        self.scores: Dict[str, int] = {}
+
+    @property
+    def pending_path(self) -> str:
+        return f"{self.path}.pending"
+
+    @classmethod
+    def from_dict(cls, data: dict, path: str = "data/published_state.json") -> "PublishedState":
+        state = cls(path)
+        state.sequence = data["sequence"]
+        state.scale = data["scale"]
+        state.ticker_ids = data["ticker_ids"]
+        state.scores = data["scores"]
+        return state
+
+    def to_dict(self) -> dict:
+        return {"sequence": self.sequence, "scale": self.scale,
+                "ticker_ids": self.ticker_ids, "scores": self.scores}
+
+    @classmethod
+    def load(cls, path: str = "data/published_state.json") -> "PublishedState":
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        return cls.from_dict(data, path)
+
+    def save(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.path)
+
+    def copy(self) -> "PublishedState":
+        state = PublishedState(self.path)
+        state.sequence = self.sequence
+        state.scale = self.scale
+        state.ticker_ids = dict(self.ticker_ids)
+        state.scores = dict(self.scores)
+        return state
+
+    def save_pending(self, batches: List["PublicationBatch"]):
+        """
+        Record batches as awaiting on-chain confirmation.
+
+        Call on the state returned by build_publication_batches. The saved
+        (confirmed) state file is left untouched until confirm_publication;
+        building again before then supersedes the pending batches.
+        """
+        Path(self.pending_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.pending_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"base_sequence": batches[0].sequence - 1 if batches else self.sequence,
+                       "batches": [{"sequence": b.sequence, "tickers": b.tickers, "scores": b.scores,
+                                    "ids": [self.ticker_ids[t] for t in b.tickers]} for b in batches]}, f)
+        os.replace(tmp, self.pending_path)
+
+
+class PublicationBatch(NamedTuple):
+    sequence: int
+    payload: bytes
+    merkle_root: bytes
+    tickers: List[str]
+    scores: List[int]
+
+
+def quantize_scores(scores, scale: int = DEFAULT_SCALE) -> np.ndarray:
+    """
+    Convert [0, 1] scores to fixed-point integers (scale 10_000 = basis points).
+
+    Raises:
+        ValueError: If scale does not fit in 16 bits or a score is NaN
+    """
+    if scale > 0xFFFF:
+        raise ValueError("scale must fit in an unsigned 16-bit integer")
+    scores = np.asarray(scores, dtype=float)
+    if np.isnan(scores).any():
+        raise ValueError(f"cannot quantize {int(np.isnan(scores).sum())} NaN scores")
+    return np.rint(np.clip(scores, 0.0, 1.0) * scale).astype(np.int64)
+
+
+def _write_varint(buf: bytearray, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            buf.append(byte | 0x80)
+        else:
+            buf.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def merkle_leaf(ticker: str, score: int) -> bytes:
+    return hashlib.sha256(b"\x00" + ticker.encode() + b":" + score.to_bytes(2, 'big')).digest()
+
+
+def _merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    levels = [leaves or [hashlib.sha256(b"").digest()]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])  # odd node is promoted unchanged
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(leaves: List[bytes]) -> bytes:
+    return _merkle_levels(leaves)[-1][0]
+
+
+def merkle_proof(leaves: List[bytes], index: int) -> List[Tuple[bytes, bool]]:
+    """
+    Sibling hashes from leaf to root; the flag is True when the sibling is on the left.
+    """
+    proof = []
+    for level in _merkle_levels(leaves)[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append((level[sibling], sibling < index))
+        index //= 2
+    return proof
+
+
+def verify_proof(ticker: str, score: int, proof: List[Tuple[bytes, bool]], root: bytes) -> bool:
+    node = merkle_leaf(ticker, score)
+    for sibling, is_left in proof:
+        node = hashlib.sha256(b"\x01" + (sibling + node if is_left else node + sibling)).digest()
+    return node == root
+
+
+def encode_batch(sequence: int, timestamp: int, scale: int, registrations: List[Tuple[int, str]],
+                 updates: List[Tuple[int, int]], root: bytes) -> bytes:
+    """
+    Pack one batch into its binary payload.
+
+    Layout: fixed header (magic, sequence, timestamp, scale, Merkle root),
+    then varint counts, then registrations (id, symbol length, symbol) and
+    updates sorted by ticker id as (id gap, zigzag score delta) varints.
+    """
+    buf = bytearray(HEADER.pack(PAYLOAD_MAGIC, sequence, timestamp, scale, root))
+    _write_varint(buf, len(registrations))
+    _write_varint(buf, len(updates))
+    for ticker_id, symbol in registrations:
+        encoded = symbol.encode()
+        _write_varint(buf, ticker_id)
+        buf.append(len(encoded))
+        buf.extend(encoded)
+    previous_id = -1
+    for ticker_id, score_delta in updates:
+        _write_varint(buf, ticker_id - previous_id - 1)
+        _write_varint(buf, _zigzag(score_delta))
+        previous_id = ticker_id
+    return bytes(buf)
+
+
+def decode_batch(payload: bytes, state: PublishedState) -> dict:
+    """
+    Decode a batch against the published state it was built from.
+
+    Returns:
+        Dictionary with sequence, timestamp, scale, merkle_root, registrations
+        ({ticker: id}) and scores ({ticker: absolute quantized score})
+    """
+    magic, sequence, timestamp, scale, root = HEADER.unpack_from(payload, 0)
+    if magic != PAYLOAD_MAGIC:
+        raise ValueError("Not a publication payload")
+    pos = HEADER.size
+    n_registrations, pos = _read_varint(payload, pos)
+    n_updates, pos = _read_varint(payload, pos)
+
+    symbols = {ticker_id: ticker for ticker, ticker_id in state.ticker_ids.items()}
+    registrations = {}
+    for _ in range(n_registrations):
+        ticker_id, pos = _read_varint(payload, pos)
+        length = payload[pos]
+        symbol = payload[pos + 1:pos + 1 + length].decode()
+        pos += 1 + length
+        registrations[symbol] = ticker_id
+        symbols[ticker_id] = symbol
+
+    scores = {}
+    ticker_id = -1
+    for _ in range(n_updates):
+        gap, pos = _read_varint(payload, pos)
+        delta, pos = _read_varint(payload, pos)
+        ticker_id += gap + 1
+        symbol = symbols[ticker_id]
+        scores[symbol] = state.scores.get(symbol, 0) + _unzigzag(delta)
+
+    return {'sequence': sequence, 'timestamp': timestamp, 'scale': scale, 'merkle_root': root,
+            'registrations': registrations, 'scores': scores}
+
+
+def build_publication_batches(indexes_df: pd.DataFrame, state: PublishedState, threshold: float = 0.0,
+                              max_batch_entries: int = 256, timestamp: Optional[int] = None,
+                              score_column: str = 'index_score') -> Tuple[List[PublicationBatch], PublishedState]:
+    """
+    Turn a scored snapshot into compact, Merkle-committed submission batches.
+
+    Scores are quantized to fixed point and compared with the last published
+    state; only new tickers and changes of at least threshold (in score
+    units, minimum one quantum) are included. Tickers without a score (NaN)
+    are left out and keep their last published value. Each batch is
+    delta-encoded against the state left by the previous batch.
+
+    Args:
+        indexes_df: DataFrame from calculate_all_companies_indexes
+        state: Last published state (not modified)
+        threshold: Minimum absolute score change worth publishing
+        max_batch_entries: Maximum ticker updates per batch
+        timestamp: Unix time stored in the batch headers, defaults to now
+        score_column: Column of indexes_df to publish, e.g. smoothed_index_score
+
+    Returns:
+        Tuple of (batches in submission order, state after all batches); record
+        the batches with new_state.save_pending(batches) and advance the saved
+        state only through confirm_publication once they land on-chain
+    """
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    new_state = state.copy()
+    scale = new_state.scale
+    min_change = max(1, int(round(threshold * scale)))
+
+    scores = indexes_df[score_column].to_numpy(dtype=float)
+    scored = ~np.isnan(scores)
+    if not scored.all():
+        logger.warning(f"Leaving {int((~scored).sum())} tickers without a {score_column} out of the publication")
+    tickers = indexes_df['ticker'].astype(str).to_numpy()[scored]
+    quantized = quantize_scores(scores[scored], scale)
+    previous = np.array([state.scores.get(t, -1) for t in tickers], dtype=np.int64)
+    changed = (previous < 0) | (np.abs(quantized - previous) >= min_change)
+
+    for ticker in tickers[changed]:
+        if ticker not in new_state.ticker_ids:
+            new_state.ticker_ids[ticker] = len(new_state.ticker_ids)
+    pending = sorted(zip(tickers[changed], quantized[changed]), key=lambda item: new_state.ticker_ids[item[0]])
+
+    batches = []
+    for start in range(0, len(pending), max_batch_entries):
+        chunk = pending[start:start + max_batch_entries]
+        registrations = [(new_state.ticker_ids[t], t) for t, _ in chunk if t not in new_state.scores]
+        updates = [(new_state.ticker_ids[t], int(q) - new_state.scores.get(t, 0)) for t, q in chunk]
+        root = merkle_root([merkle_leaf(t, int(q)) for t, q in chunk])
+
+        new_state.sequence += 1
+        payload = encode_batch(new_state.sequence, timestamp, scale, registrations, updates, root)
+        for t, q in chunk:
+            new_state.scores[t] = int(q)
+        batches.append(PublicationBatch(
+            sequence=new_state.sequence,
+            payload=payload,
+            merkle_root=root,
+            tickers=[t for t, _ in chunk],
+            scores=[int(q) for _, q in chunk],
+        ))
+    return batches, new_state
+
+
+def confirm_publication(sequence: int, path: str = "data/published_state.json") -> PublishedState:
+    """
+    Advance the published state through pending batch sequence, once it is confirmed on-chain.
+
+    Batches are delta-encoded against each other, so confirming a sequence
+    also confirms every pending batch before it. Later pending batches stay
+    pending and remain valid against the advanced state.
+
+    Args:
+        sequence: Sequence number of the last batch confirmed on-chain
+        path: JSON file the published state is persisted to
+
+    Returns:
+        The saved, advanced PublishedState
+
+    Raises:
+        ValueError: If no pending batches cover sequence
+    """
+    state = PublishedState.load(path)
+    try:
+        with open(state.pending_path) as f:
+            pending = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"No pending publication to confirm in {state.pending_path}")
+    if pending["base_sequence"] != state.sequence:
+        raise ValueError(f"Pending batches were built from sequence {pending['base_sequence']}, "
+                         f"but the published state is at {state.sequence}")
+    batches = pending["batches"]
+    if not any(b["sequence"] == sequence for b in batches):
+        raise ValueError(f"Sequence {sequence} is not pending (published state is at {state.sequence})")
+
+    for batch in batches:
+        if batch["sequence"] > sequence:
+            break
+        for ticker, score, ticker_id in zip(batch["tickers"], batch["scores"], batch["ids"]):
+            state.ticker_ids[ticker] = ticker_id
+            state.scores[ticker] = score
+        state.sequence = batch["sequence"]
+    state.save()
+
+    remaining = [b for b in batches if b["sequence"] > sequence]
+    if remaining:
+        tmp = f"{state.pending_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"base_sequence": state.sequence, "batches": remaining}, f)
+        os.replace(tmp, state.pending_path)
+    else:
+        os.remove(state.pending_path)
+    logger.info(f"Published state confirmed through sequence {sequence}"
+                f"{f', {len(remaining)} batches still pending' if remaining else ''}")
+    return state
@@ -0,0 +1,122 @@
+import math
+import random
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable KLL-style quantile sketch.
+
+    Values are kept in a stack of compactors; items at level h stand for 2**h
+    original values. When a level overflows it is sorted and every other item
+    (with a random offset) is promoted to the next level, so memory stays
+    O(k log(n / k)) while rank error stays around 1/k.
+
+    Until the first compaction the sketch holds every value and quantiles are
+    exact, using the same linear interpolation as pandas.Series.quantile.
+    Passing k=None disables compaction and keeps the sketch exact forever.
+
+    Args:
+        k: Size of the top compactor; larger is more accurate, None is exact
+        seed: Seed for the compaction offsets
+    """
+
+    CAPACITY_DECAY = 2.0 / 3.0
+
+    def __init__(self, k: Optional[int] = 200, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * self.CAPACITY_DECAY ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(c) for c in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        if self.k is None:
+            return
+        while self._size() > self._max_size():
+            for h in range(len(self.compactors)):
+                if len(self.compactors[h]) >= self._capacity(h):
+                    if h + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    items = sorted(self.compactors[h])
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    offset = self._rng.randint(0, 1)
+                    self.compactors[h + 1].extend(items[offset::2])
+                    self.compactors[h] = leftover
+                    break
+
+    @property
+    def is_exact(self) -> bool:
+        return len(self.compactors) == 1
+
+    def update(self, value):
+        """
+        Add one value; None and NaN are ignored.
+        """
+        if value is None:
+            return
+        value = float(value)
+        if math.isnan(value):
+            return
+        self.compactors[0].append(value)
+        self.n += 1
+        if self.k is not None and len(self.compactors[0]) >= self._capacity(0):
+            self._compress()
+
+    def update_many(self, values: Iterable):
+        for value in values:
+            self.update(value)
+
+    def merge(self, other: "QuantileSketch"):
+        """
+        Merge another sketch into this one in place.
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        if self.k is None or other.k is None:
+            self.k = None
+        else:
+            self.k = max(self.k, other.k)
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-th quantile (exact while the sketch has not compacted).
+        """
+        if self.n == 0:
+            return float('nan')
+        if self.is_exact:
+            return float(np.quantile(np.asarray(self.compactors[0]), q))
+
+        items = np.concatenate([np.asarray(c, dtype=float) for c in self.compactors])
+        weights = np.concatenate([np.full(len(c), 2.0 ** h) for h, c in enumerate(self.compactors)])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+        cumulative = np.cumsum(weights)
+        # midpoint CDF interpolation approximates pandas' linear interpolation
+        positions = (cumulative - weights / 2.0) / cumulative[-1]
+        return float(np.interp(q, positions, items))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'k': self.k, 'n': self.n, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.compactors = [list(c) for c in data['compactors']] or [[]]
+        return sketch
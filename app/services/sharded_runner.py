@@ -0,0 +1,181 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app import instrumentation
+from app.clients import fmp
+from app.clients.rate_limiter import RateLimiter
+from app.models.MetricsSchema import get_metrics_schema
+from app.services.calculate_index import calculate_all_companies_indexes
+from app.services.calculate_min_max import BoundaryStore, calculate_metric_boundaries
+from app.services.data_collection import fetch_metric_batch
+from app.services.universe import STATUS_EMPTY, STATUS_NOT_FOUND
+
+logger = logging.getLogger(__name__)
+
+
+class ShardResult(NamedTuple):
+    offset: int
+    tickers: List[str]
+    fiscal_years: List[Optional[str]]
+    sketches: dict
+    statuses: Dict[str, str]
+
+
+class ShardedRun(NamedTuple):
+    metrics: pd.DataFrame
+    boundaries: Dict[str, Tuple[float, float]]
+    indexes: Optional[pd.DataFrame]
+    store: BoundaryStore
+    failed: List[str]
+    excluded: Dict[str, str]
+
+
+def shard_universe(tickers: List[str], shards: int) -> List[Tuple[int, List[str]]]:
+    """
+    Split tickers into contiguous shards.
+
+    Returns:
+        List of (row offset in the universe matrix, shard tickers)
+    """
+    size = -(-len(tickers) // max(1, shards))
+    return [(start, tickers[start:start + size]) for start in range(0, len(tickers), max(1, size))]
+
+
+def _init_worker(processes: int):
+    """
+    Give each worker process an equal slice of the API plan's request budget.
+    """
+    fmp.rate_limiter = RateLimiter(
+        requests_per_minute=fmp.FMP_REQUESTS_PER_MINUTE / processes,
+        burst=max(1, fmp.FMP_BURST // processes),
+        max_retries=fmp.FMP_MAX_RETRIES,
+    )
+
+
+def _run_shard(shm_name: str, shape: Tuple[int, int], offset: int, tickers: List[str], max_in_flight: int,
+               sketch_k: Optional[int], min_coverage: float) -> ShardResult:
+    """
+    Fetch and build one shard, write its rows into the shared universe matrix
+    starting at offset, and return its tickers, boundary sketches and each
+    ticker's fetch status for the coordinator's universe registry.
+    """
+    statuses: Dict[str, str] = {}
+    batch = fetch_metric_batch(tickers, max_in_flight=max_in_flight, statuses=statuses)
+    shm = SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        matrix[offset:offset + len(batch)] = batch.to_numpy()
+        del matrix  # release the buffer export before closing
+    finally:
+        shm.close()
+
+    store = BoundaryStore(k=sketch_k)
+    store.update_frame(batch.to_dataframe(), min_coverage=min_coverage)
+    return ShardResult(offset=offset, tickers=batch.tickers, fiscal_years=batch.fiscal_years,
+                       sketches=store.to_dict(), statuses=statuses)
+
+
+def run_sharded(tickers: List[str], processes: Optional[int] = None, shards: Optional[int] = None,
+                max_in_flight: Optional[int] = None, sketch_k: Optional[int] = 200, exact_boundaries: bool = False,
+                min_coverage: float = 0.0, boundaries: Optional[Dict[str, Tuple[float, float]]] = None,
+                registry=None, score: bool = True) -> ShardedRun:
+    """
+    Fetch, build and score a ticker universe across a pool of processes.
+
+    The universe is split into shards. Each worker fetches its shard, builds
+    the metric rows and writes them straight into one shared-memory matrix
+    allocated by the coordinator, returning only its tickers, mergeable
+    boundary sketches and per-ticker fetch statuses. The coordinator records
+    the statuses in the registry, merges the sketches into global boundaries
+    and scores the whole matrix in one vectorized pass.
+
+    Workers are spawned (not forked) so each gets its own HTTP session and
+    cache connection, and each gets 1/processes of the request budget.
+    Callers must run under an ``if __name__ == "__main__":`` guard.
+
+    Args:
+        tickers: Ticker symbols in the universe
+        processes: Worker processes, defaults to the CPU count
+        shards: Number of shards, defaults to 4 per process for load balancing
+        max_in_flight: Concurrent HTTP requests per worker, defaults to an
+            equal split of FMP_MAX_IN_FLIGHT
+        sketch_k: Sketch size per metric; None keeps shard sketches exact
+        exact_boundaries: Compute boundaries from the merged matrix instead of the sketches
+        min_coverage: Minimum fraction of present metrics for a company to count towards boundaries
+        boundaries: Score against these boundaries instead of the merged ones
+        registry: Optional UniverseRegistry; negative-cached symbols and funds
+            are dropped, and empty/404 results are negative-cached and saved
+        score: Score the merged matrix; False leaves indexes as None for
+            callers that validate before scoring
+
+    Returns:
+        ShardedRun with the metrics DataFrame, the boundaries used, the index
+        DataFrame, the merged BoundaryStore, tickers of shards that failed and
+        the symbols excluded by the registry or found empty/not found
+    """
+    universe = list(dict.fromkeys(tickers))
+    excluded: Dict[str, str] = {}
+    if registry is not None:
+        universe, excluded = registry.eligible(universe)
+    processes = max(1, processes or os.cpu_count() or 1)
+    max_in_flight = max_in_flight or max(1, fmp.FMP_MAX_IN_FLIGHT // processes)
+    metrics = list(get_metrics_schema().metrics)
+    shape = (len(universe), len(metrics))
+
+    shm = SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+    try:
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        matrix.fill(np.nan)
+        results: List[ShardResult] = []
+        failed: List[str] = []
+        with instrumentation.span("stage.sharded_fetch", tickers=len(universe), processes=processes):
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(processes,)) as executor:
+                futures = {
+                    executor.submit(_run_shard, shm.name, shape, offset, shard, max_in_flight, sketch_k, min_coverage): shard
+                    for offset, shard in shard_universe(universe, shards or processes * 4)
+                }
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Shard of {len(futures[future])} tickers failed: {e}")
+                        failed.extend(futures[future])
+
+        results.sort(key=lambda r: r.offset)
+        rows = np.concatenate([np.arange(r.offset, r.offset + len(r.tickers)) for r in results]).astype(int) \
+            if results else np.array([], dtype=int)
+        values = matrix[rows]  # fancy indexing copies out of shared memory
+        del matrix
+    finally:
+        shm.close()
+        shm.unlink()
+
+    df = pd.DataFrame(values, index=pd.Index([t for r in results for t in r.tickers], name='ticker'), columns=metrics)
+    df.insert(0, 'fiscalYear', [y for r in results for y in r.fiscal_years])
+
+    for result in results:
+        for ticker, status in result.statuses.items():
+            if registry is not None:
+                registry.record_status(ticker, status)
+            if status in (STATUS_EMPTY, STATUS_NOT_FOUND):
+                excluded[ticker] = status
+    if registry is not None:
+        registry.save()
+
+    store = BoundaryStore(k=sketch_k)
+    for result in results:
+        store.merge(BoundaryStore.from_dict(result.sketches))
+    if boundaries is None:
+        boundaries = calculate_metric_boundaries(df, min_coverage=min_coverage) if exact_boundaries else store.boundaries()
+
+    indexes = calculate_all_companies_indexes(df, boundaries) if score else None
+    logger.info(f"Sharded run: {len(df)} companies from {len(results)} shards on {processes} processes"
+                f"{f', {len(failed)} tickers in failed shards' if failed else ''}")
+    return ShardedRun(metrics=df, boundaries=boundaries, indexes=indexes, store=store, failed=failed,
+                      excluded=excluded)
@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from app.services.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+# Smallest gap an update is weighted by, so two runs with the same timestamp both count
+MIN_GAP_SECONDS = 60.0
+SMOOTHED_COLUMN = 'smoothed_index_score'
+STD_COLUMN = 'smoothed_index_std'
+
+
+def ema_step(ema: np.ndarray, variance: np.ndarray, last_ts: np.ndarray, count: np.ndarray,
+             values: np.ndarray, timestamps, half_life: float):
+    """
+    Apply one observation per row to time-aware EMA state, in place.
+
+    The weight of the new value is 1 - 0.5 ** (elapsed / half_life), so
+    irregular gaps decay the old state by the time that actually passed.
+    Gaps shorter than MIN_GAP_SECONDS (including repeated timestamps) are
+    weighted as MIN_GAP_SECONDS, so a second update at the same time still
+    counts a little instead of being ignored. The variance is the matching
+    exponentially weighted variance. A row's first observation initializes
+    the EMA to the value with zero variance; NaN values leave the row untouched.
+
+    Args:
+        ema, variance, last_ts, count: State arrays, one row per ticker
+        values: New observations, NaN where a ticker has none
+        timestamps: Observation time (Unix seconds), scalar or per row
+        half_life: EMA half-life in seconds
+    """
+    observed = ~np.isnan(values)
+    first = observed & (count == 0)
+    later = observed & ~first
+
+    elapsed = np.maximum(np.asarray(timestamps, dtype=float) - last_ts, MIN_GAP_SECONDS)
+    alpha = 1.0 - 0.5 ** (elapsed / half_life)
+    delta = values - ema
+    ema[later] += (alpha * delta)[later]
+    variance[later] = ((1.0 - alpha) * (variance + alpha * delta * delta))[later]
+
+    ema[first] = values[first]
+    variance[first] = 0.0
+    last_ts[observed] = np.broadcast_to(timestamps, values.shape)[observed]
+    count[observed] += 1
+
+
+class ScoreSmoother:
+    """
+    Persistent per-ticker EMA of index scores (oracle-spec §4.3).
+
+    State is four compact arrays (EMA value, variance, last update time and
+    observation count) indexed by ticker, so each new run costs O(1) per
+    ticker and never reloads history. rebuild() replays the snapshot history
+    through the same update.
+
+    Args:
+        path: JSON file the state is persisted to
+        half_life_days: Time for an observation's weight to halve
+    """
+
+    def __init__(self, path: str = "data/smoothing_state.json", half_life_days: float = 7.0):
+        self.path = path
+        self.half_life = half_life_days * DAY
+        self.tickers: Dict[str, int] = {}
+        self.ema = np.empty(0)
+        self.variance = np.empty(0)
+        self.last_ts = np.empty(0)
+        self.count = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @classmethod
+    def load(cls, path: str = "data/smoothing_state.json", **kwargs) -> "ScoreSmoother":
+        smoother = cls(path, **kwargs)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return smoother
+        if data["half_life"] != smoother.half_life:
+            logger.warning(f"Smoothing state in {path} used a {data['half_life'] / DAY:g} day half-life; "
+                           f"continuing with {smoother.half_life / DAY:g} days")
+        smoother.tickers = {ticker: i for i, ticker in enumerate(data["tickers"])}
+        smoother.ema = np.array(data["ema"], dtype=float)
+        smoother.variance = np.array(data["variance"], dtype=float)
+        smoother.last_ts = np.array(data["last_ts"], dtype=float)
+        smoother.count = np.array(data["count"], dtype=np.int64)
+        return smoother
+
+    def save(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"half_life": self.half_life, "tickers": list(self.tickers), "ema": self.ema.tolist(),
+                       "variance": self.variance.tolist(), "last_ts": self.last_ts.tolist(),
+                       "count": self.count.tolist()}, f)
+        os.replace(tmp, self.path)
+
+    def _rows(self, tickers) -> np.ndarray:
+        """
+        Row of each ticker in the state arrays, adding rows for new tickers.
+        """
+        new = [t for t in dict.fromkeys(tickers) if t not in self.tickers]
+        if new:
+            for ticker in new:
+                self.tickers[ticker] = len(self.tickers)
+            grow = len(new)
+            self.ema = np.concatenate([self.ema, np.zeros(grow)])
+            self.variance = np.concatenate([self.variance, np.zeros(grow)])
+            self.last_ts = np.concatenate([self.last_ts, np.zeros(grow)])
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+        return np.fromiter((self.tickers[t] for t in tickers), dtype=np.int64, count=len(tickers))
+
+    def update(self, scores: pd.Series, timestamp: Optional[float] = None) -> pd.DataFrame:
+        """
+        Fold one run's scores into the state.
+
+        Args:
+            scores: Raw index scores indexed by ticker (NaN scores are ignored)
+            timestamp: Observation time in Unix seconds, defaults to now
+
+        Returns:
+            DataFrame indexed by ticker with smoothed_index_score and smoothed_index_std
+        """
+        timestamp = datetime.now(timezone.utc).timestamp() if timestamp is None else timestamp
+        tickers = [str(t) for t in scores.index]
+        rows = self._rows(tickers)
+        ema, variance, last_ts, count = self.ema[rows], self.variance[rows], self.last_ts[rows], self.count[rows]
+        ema_step(ema, variance, last_ts, count, scores.to_numpy(dtype=float), timestamp, self.half_life)
+        self.ema[rows], self.variance[rows], self.last_ts[rows], self.count[rows] = ema, variance, last_ts, count
+        return self.frame(tickers)
+
+    def frame(self, tickers=None) -> pd.DataFrame:
+        """
+        Current smoothed scores for the given tickers (all tracked tickers by default).
+        """
+        tickers = list(self.tickers) if tickers is None else [str(t) for t in tickers]
+        rows = np.array([self.tickers.get(t, -1) for t in tickers], dtype=np.int64)
+        known = (rows >= 0) & (self.count[rows] > 0) if len(self.tickers) else np.zeros(len(rows), dtype=bool)
+        df = pd.DataFrame({
+            SMOOTHED_COLUMN: np.where(known, self.ema[rows], np.nan),
+            STD_COLUMN: np.where(known, np.sqrt(self.variance[rows]), np.nan),
+        }, index=pd.Index(tickers, name='ticker'))
+        return df
+
+    def rebuild(self, store: Optional[SnapshotStore] = None, column: str = 'index_score',
+                start: Optional[str] = None, end: Optional[str] = None) -> "ScoreSmoother":
+        """
+        Replace the state by replaying the snapshot history.
+
+        Every run of every date is replayed in time order, including the
+        intraday refreshes that live runs applied, so the rebuilt state
+        matches the one built live. The score column of each run is read
+        into one runs x tickers matrix and applied to all tickers at once
+        with the same update as live runs, timed by the run's creation time.
+
+        Returns:
+            self
+        """
+        store = store or SnapshotStore()
+        dates = [d for d in store.dates() if (start is None or d >= start) and (end is None or d <= end)]
+        runs = ((d, r) for d in dates for r in store.runs(d))
+        snapshots = [s for s in (store.load(d, r, columns=[column]) for d, r in runs) if s is not None]
+        tickers = list(dict.fromkeys(str(t) for s in snapshots for t in s.scores.index))
+        history = np.full((len(snapshots), len(tickers)), np.nan)
+        positions = {t: i for i, t in enumerate(tickers)}
+        for i, snapshot in enumerate(snapshots):
+            if column in snapshot.scores.columns:
+                cols = [positions[str(t)] for t in snapshot.scores.index]
+                history[i, cols] = snapshot.scores[column].to_numpy(dtype=float)
+
+        self.tickers = positions
+        self.ema = np.zeros(len(tickers))
+        self.variance = np.zeros(len(tickers))
+        self.last_ts = np.zeros(len(tickers))
+        self.count = np.zeros(len(tickers), dtype=np.int64)
+        for snapshot, values in zip(snapshots, history):
+            ema_step(self.ema, self.variance, self.last_ts, self.count, values,
+                     _snapshot_timestamp(snapshot), self.half_life)
+        logger.info(f"Rebuilt smoothing state for {len(tickers)} tickers from {len(snapshots)} snapshot runs "
+                    f"over {len(dates)} dates")
+        return self
+
+
+def _snapshot_timestamp(snapshot) -> float:
+    """
+    When a snapshot's run happened: its creation time, or the partition date
+    for backfilled runs created on another day.
+    """
+    created_at = snapshot.created_at
+    if not created_at or not created_at.startswith(snapshot.date):
+        created_at = f"{snapshot.date}T00:00:00"
+    return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+
+
+def smooth_index_scores(indexes_df: pd.DataFrame, smoother: ScoreSmoother,
+                        timestamp: Optional[float] = None) -> pd.DataFrame:
+    """
+    Smoothing stage run after calculate_all_companies_indexes.
+
+    Args:
+        indexes_df: DataFrame from calculate_all_companies_indexes
+        smoother: Smoother state, updated in place (call save() to persist it)
+        timestamp: Observation time in Unix seconds, defaults to now
+
+    Returns:
+        indexes_df with smoothed_index_score and smoothed_index_std columns
+    """
+    smoothed = smoother.update(indexes_df.set_index('ticker')['index_score'], timestamp)
+    result = indexes_df.drop(columns=[SMOOTHED_COLUMN, STD_COLUMN], errors='ignore')
+    result[SMOOTHED_COLUMN] = smoothed[SMOOTHED_COLUMN].to_numpy()
+    result[STD_COLUMN] = smoothed[STD_COLUMN].to_numpy()
+    return result
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    date: str
+    run: str
+    metrics: pd.DataFrame
+    scores: pd.DataFrame
+    boundaries: Dict[str, Tuple[float, float]]
+    created_at: Optional[str] = None
+    cohorts: Optional[pd.Series] = None
+    cohort_boundaries: Optional[Dict[str, Dict[str, Tuple[float, float]]]] = None
+
+
+@lru_cache(maxsize=4096)
+def _read_meta(run_dir: str) -> dict:
+    with open(os.path.join(run_dir, "meta.json")) as f:
+        meta = json.load(f)
+    meta["ticker_index"] = {ticker: i for i, ticker in enumerate(meta["tickers"])}
+    return meta
+
+
+class SnapshotStore:
+    """
+    Append-only, date-partitioned store of run snapshots.
+
+    Each run is written to <root>/date=YYYY-MM-DD/run=HHMMSSffffff/ as:
+        metrics.npy  float64 array, metrics x tickers (one contiguous column per metric)
+        scores.npy   float64 array, score columns x tickers
+        meta.json    tickers, column names, fiscal years and the boundaries used
+                     (plus cohort labels and cohort boundaries for cohort-relative runs)
+
+    Arrays are stored column-major so reads can memory-map the files and touch
+    only the requested columns. Runs are never rewritten; a run directory is
+    built under a temporary name and renamed into place when complete.
+
+    Args:
+        root: Directory that holds the date partitions
+    """
+
+    def __init__(self, root: str = "data/snapshots"):
+        self.root = Path(root)
+
+    def append(self, metrics_df: pd.DataFrame, boundaries, indexes_df: pd.DataFrame,
+               run_date: Optional[str] = None, cohorts: Optional[pd.Series] = None,
+               cohort_boundaries: Optional[Dict[str, Dict[str, Tuple[float, float]]]] = None) -> Path:
+        """
+        Record one run's raw metrics, boundaries and index scores.
+
+        Args:
+            metrics_df: DataFrame from extract_all_metrics_dataframe (ticker index)
+            boundaries: Dictionary of metric boundaries used for scoring
+            indexes_df: DataFrame from calculate_all_companies_indexes
+            run_date: Partition date (YYYY-MM-DD), defaults to today (UTC)
+            cohorts: Ticker -> cohort label the run was scored with, if cohort-relative
+            cohort_boundaries: Cohort -> metric boundaries the run was scored with
+
+        Returns:
+            Path of the written run directory
+        """
+        now = datetime.utcnow()
+        run_date = run_date or now.strftime("%Y-%m-%d")
+        run_dir = self.root / f"date={run_date}" / f"run={now.strftime('%H%M%S%f')}"
+        tmp_dir = run_dir.with_name(f".tmp-{run_dir.name}")
+        tmp_dir.mkdir(parents=True, exist_ok=False)
+
+        tickers = [str(t) for t in metrics_df.index]
+        metric_columns = [c for c in metrics_df.columns if c != 'fiscalYear']
+        metrics = metrics_df[metric_columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+        scores_by_ticker = indexes_df.set_index('ticker').reindex(tickers)
+        score_columns = list(scores_by_ticker.columns)
+        scores = scores_by_ticker.to_numpy(dtype=float)
+
+        np.save(tmp_dir / "metrics.npy", np.ascontiguousarray(metrics.T))
+        np.save(tmp_dir / "scores.npy", np.ascontiguousarray(scores.T))
+        meta = {
+            "date": run_date,
+            "created_at": now.isoformat(),
+            "tickers": tickers,
+            "metric_columns": metric_columns,
+            "score_columns": score_columns,
+            "fiscal_years": metrics_df['fiscalYear'].tolist() if 'fiscalYear' in metrics_df.columns else None,
+            "boundaries": {k: [float(v[0]), float(v[1])] for k, v in boundaries.items()},
+        }
+        if cohorts is not None and cohort_boundaries:
+            labels = cohorts.reindex(tickers)
+            meta["cohorts"] = [None if pd.isna(label) else str(label) for label in labels]
+            meta["cohort_boundaries"] = {
+                cohort: {k: [float(v[0]), float(v[1])] for k, v in bounds.items()}
+                for cohort, bounds in cohort_boundaries.items()
+            }
+        with open(tmp_dir / "meta.json", 'w') as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(tmp_dir, run_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        logger.info(f"Snapshot saved to {run_dir}")
+        return run_dir
+
+    def dates(self) -> List[str]:
+        """
+        All partition dates, oldest first.
+        """
+        if not self.root.exists():
+            return []
+        return sorted(p.name[len("date="):] for p in self.root.glob("date=*") if p.is_dir())
+
+    def runs(self, run_date: str) -> List[str]:
+        """
+        All completed runs for a date, oldest first.
+        """
+        partition = self.root / f"date={run_date}"
+        if not partition.exists():
+            return []
+        return sorted(p.name[len("run="):] for p in partition.glob("run=*") if p.is_dir())
+
+    def _run_dir(self, run_date: str, run: Optional[str] = None) -> Optional[Path]:
+        runs = self.runs(run_date)
+        if not runs:
+            return None
+        run = run or runs[-1]
+        return self.root / f"date={run_date}" / f"run={run}"
+
+    def _columns(self, run_dir: Path, name: str, meta_key: str, columns: Optional[List[str]]):
+        meta = _read_meta(str(run_dir))
+        available = meta[meta_key]
+        selected = available if columns is None else [c for c in columns if c in available]
+        array = np.load(run_dir / name, mmap_mode='r')
+        positions = [available.index(c) for c in selected]
+        return selected, array, positions
+
+    def load(self, run_date: Optional[str] = None, run: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> Optional[Snapshot]:
+        """
+        Load one run, by default the latest run of the latest date.
+
+        Args:
+            run_date: Partition date, defaults to the most recent one
+            run: Run id within the date, defaults to the latest run
+            columns: Metric and/or score columns to read; None reads all
+        """
+        dates = self.dates()
+        if not dates:
+            return None
+        run_date = run_date or dates[-1]
+        run_dir = self._run_dir(run_date, run)
+        if run_dir is None:
+            return None
+        meta = _read_meta(str(run_dir))
+        tickers = pd.Index(meta["tickers"], name='ticker')
+
+        metric_names, metrics, metric_pos = self._columns(run_dir, "metrics.npy", "metric_columns", columns)
+        score_names, scores, score_pos = self._columns(run_dir, "scores.npy", "score_columns", columns)
+        metrics_df = pd.DataFrame({c: metrics[i] for c, i in zip(metric_names, metric_pos)}, index=tickers)
+        if meta.get("fiscal_years") is not None and columns is None:
+            metrics_df.insert(0, 'fiscalYear', meta["fiscal_years"])
+        scores_df = pd.DataFrame({c: scores[i] for c, i in zip(score_names, score_pos)}, index=tickers)
+
+        return Snapshot(
+            date=meta["date"],
+            run=run_dir.name[len("run="):],
+            metrics=metrics_df,
+            scores=scores_df,
+            boundaries={k: tuple(v) for k, v in meta["boundaries"].items()},
+            created_at=meta.get("created_at"),
+            cohorts=pd.Series(meta["cohorts"], index=tickers, dtype=object) if meta.get("cohorts") else None,
+            cohort_boundaries={c: {k: tuple(v) for k, v in b.items()} for c, b in meta["cohort_boundaries"].items()}
+            if meta.get("cohort_boundaries") else None,
+        )
+
+    def as_of(self, run_date: str, columns: Optional[List[str]] = None) -> Optional[Snapshot]:
+        """
+        Universe as of a date: the latest run on or before run_date.
+        """
+        eligible = [d for d in self.dates() if d <= run_date]
+        return self.load(eligible[-1], columns=columns) if eligible else None
+
+    def ticker_history(self, ticker: str, columns: Optional[List[str]] = None,
+                       start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        One ticker over time, using the latest run of each date.
+
+        Only the ticker's cell of each requested column is read from the
+        memory-mapped arrays.
+
+        Returns:
+            DataFrame indexed by date with the requested metric and score columns
+        """
+        rows = {}
+        for run_date in self.dates():
+            if (start and run_date < start) or (end and run_date > end):
+                continue
+            run_dir = self._run_dir(run_date)
+            if run_dir is None:
+                continue
+            meta = _read_meta(str(run_dir))
+            row = meta["ticker_index"].get(ticker)
+            if row is None:
+                continue
+            values = {}
+            for name, key in (("metrics.npy", "metric_columns"), ("scores.npy", "score_columns")):
+                selected, array, positions = self._columns(run_dir, name, key, columns)
+                for c, i in zip(selected, positions):
+                    values[c] = float(array[i, row])
+            rows[run_date] = values
+        history = pd.DataFrame.from_dict(rows, orient='index')
+        history.index.name = 'date'
+        return history
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from app import instrumentation
+from app.clients.fmp import FMP_MAX_IN_FLIGHT, fetch_profiles_many
+from app.models.MetricsSchema import get_metrics_schema
+from app.models.UniverseEntry import UniverseEntry
+
+logger = logging.getLogger(__name__)
+
+ASSET_STOCK = "stock"
+ASSET_ETF = "etf"
+ASSET_FUND = "fund"
+FUND_ASSET_TYPES = {ASSET_ETF, ASSET_FUND}
+
+STATUS_ACTIVE = "active"
+STATUS_EMPTY = "empty"
+STATUS_NOT_FOUND = "not_found"
+STATUS_INACTIVE = "inactive"
+STATUS_ERROR = "error"
+
+DAY = 86400.0
+
+
+def classify_asset_type(profile: Dict[str, Any]) -> Optional[str]:
+    """
+    Asset type from an FMP profile's isEtf / isFund flags; None for an empty profile.
+    """
+    if not profile:
+        return None
+    if profile.get("isEtf"):
+        return ASSET_ETF
+    if profile.get("isFund"):
+        return ASSET_FUND
+    return ASSET_STOCK
+
+
+def is_empty_payload(payload: Dict[str, Any]) -> bool:
+    """
+    True when a combined TTM payload has no value for any schema metric.
+    """
+    return all(payload.get(metric) is None for metric in get_metrics_schema().metrics)
+
+
+def _is_not_found(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.HTTPError) and response is not None and response.status_code == 404
+
+
+def result_status(result) -> str:
+    """
+    Status a combined TTM payload (or the exception raised for it) maps to:
+    active, empty, not_found, or error for transient failures.
+    """
+    if isinstance(result, Exception):
+        return STATUS_NOT_FOUND if _is_not_found(result) else STATUS_ERROR
+    return STATUS_EMPTY if is_empty_payload(result) else STATUS_ACTIVE
+
+
+class UniverseRegistry:
+    """
+    Persistent per-symbol registry: asset type and a negative cache with expiry.
+
+    Symbols that return an empty payload or 404 are skipped until their
+    retryAfter time. The expiry starts at negative_ttl_days and doubles with
+    each consecutive empty result, up to max_negative_ttl_days, so renamed
+    or delisted symbols stop costing requests while a symbol that comes back
+    is picked up again. Asset types come from the (cached) profile endpoint
+    and are refreshed every asset_type_ttl_days; ETFs and funds are kept out
+    of the F-Index.
+
+    Args:
+        path: JSON file the registry is persisted to
+        negative_ttl_days: Expiry after the first empty/404 result
+        max_negative_ttl_days: Upper bound on the expiry
+        asset_type_ttl_days: Age after which a classification is refreshed
+    """
+
+    def __init__(self, path: str = "data/universe_registry.json", negative_ttl_days: float = 7.0,
+                 max_negative_ttl_days: float = 90.0, asset_type_ttl_days: float = 30.0):
+        self.path = path
+        self.negative_ttl_days = negative_ttl_days
+        self.max_negative_ttl_days = max_negative_ttl_days
+        self.asset_type_ttl_days = asset_type_ttl_days
+        self.entries: Dict[str, UniverseEntry] = {}
+
+    @classmethod
+    def load(cls, path: str = "data/universe_registry.json", **kwargs) -> "UniverseRegistry":
+        registry = cls(path, **kwargs)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return registry
+        registry.entries = {symbol: UniverseEntry(**entry) for symbol, entry in data.items()}
+        return registry
+
+    def save(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({symbol: entry.model_dump() for symbol, entry in self.entries.items()}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def entry(self, symbol: str) -> UniverseEntry:
+        if symbol not in self.entries:
+            self.entries[symbol] = UniverseEntry(symbol=symbol)
+        return self.entries[symbol]
+
+    def is_negative(self, symbol: str, now: Optional[float] = None) -> bool:
+        entry = self.entries.get(symbol)
+        now = time.time() if now is None else now
+        return entry is not None and entry.retryAfter is not None and now < entry.retryAfter
+
+    def is_fund(self, symbol: str) -> bool:
+        entry = self.entries.get(symbol)
+        return entry is not None and entry.assetType in FUND_ASSET_TYPES
+
+    def needs_classification(self, symbol: str, now: Optional[float] = None) -> bool:
+        entry = self.entries.get(symbol)
+        now = time.time() if now is None else now
+        return (entry is None or entry.classifiedAt is None
+                or now - entry.classifiedAt > self.asset_type_ttl_days * DAY)
+
+    def _mark_negative(self, entry: UniverseEntry, status: str, now: float):
+        entry.failures += 1
+        ttl = min(self.negative_ttl_days * 2 ** (entry.failures - 1), self.max_negative_ttl_days)
+        entry.status = status
+        entry.retryAfter = now + ttl * DAY
+        instrumentation.increment("universe_negative_total", status=status)
+
+    def record_result(self, symbol: str, result, now: Optional[float] = None) -> str:
+        """
+        Update a symbol from a fetched combined TTM payload or the exception raised for it.
+
+        Returns:
+            The resulting status: active, empty, not_found, or error for
+            transient failures, which are not negative-cached
+        """
+        return self.record_status(symbol, result_status(result), now)
+
+    def record_status(self, symbol: str, status: str, now: Optional[float] = None) -> str:
+        """
+        Update a symbol from a fetch outcome already mapped by result_status,
+        e.g. one reported back by a worker process.
+
+        Returns:
+            The resulting status, as for record_result
+        """
+        now = time.time() if now is None else now
+        entry = self.entry(symbol)
+        entry.lastCheckedAt = now
+        if status == STATUS_ERROR:
+            return STATUS_ERROR
+        if status in (STATUS_EMPTY, STATUS_NOT_FOUND):
+            self._mark_negative(entry, status, now)
+        else:
+            entry.status = STATUS_ACTIVE
+            entry.failures = 0
+            entry.retryAfter = None
+        return entry.status
+
+    def record_profile(self, symbol: str, profile, now: Optional[float] = None):
+        """
+        Classify a symbol from its profile; an empty or inactive profile is negative-cached.
+        """
+        now = time.time() if now is None else now
+        entry = self.entry(symbol)
+        if isinstance(profile, Exception):
+            if _is_not_found(profile):
+                self._mark_negative(entry, STATUS_NOT_FOUND, now)
+            return
+        entry.classifiedAt = now
+        entry.assetType = classify_asset_type(profile)
+        if not profile:
+            self._mark_negative(entry, STATUS_EMPTY, now)
+        elif profile.get("isActivelyTrading") is False:
+            self._mark_negative(entry, STATUS_INACTIVE, now)
+
+    def classify(self, symbols: List[str], max_in_flight: int = FMP_MAX_IN_FLIGHT, now: Optional[float] = None):
+        """
+        Fetch profiles for symbols that are unclassified or whose classification is stale.
+        """
+        now = time.time() if now is None else now
+        pending = [s for s in dict.fromkeys(symbols) if not self.is_negative(s, now) and self.needs_classification(s, now)]
+        if not pending:
+            return
+        for symbol, profile in fetch_profiles_many(pending, max_in_flight=max_in_flight).items():
+            self.record_profile(symbol, profile, now)
+        logger.info(f"Classified {len(pending)} symbols")
+
+    def eligible(self, symbols: List[str], now: Optional[float] = None) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Split symbols into those worth fetching for the F-Index and excluded ones.
+
+        Returns:
+            Tuple of (eligible symbols in input order, {excluded symbol: reason})
+        """
+        now = time.time() if now is None else now
+        eligible, excluded = [], {}
+        for symbol in dict.fromkeys(symbols):
+            entry = self.entries.get(symbol)
+            if self.is_negative(symbol, now):
+                excluded[symbol] = entry.status
+            elif self.is_fund(symbol):
+                excluded[symbol] = entry.assetType
+            else:
+                eligible.append(symbol)
+        if excluded:
+            instrumentation.increment("universe_excluded_total", len(excluded))
+        return eligible, excluded
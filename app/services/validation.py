@@ -0,0 +1,187 @@
+import warnings
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+OUTLIER = 1
+JUMP = 2
+INCONSISTENT = 4
+OUT_OF_RANGE = 8
+
+# (metric that must be <= other metric, other metric)
+CONSISTENCY_RULES: List[Tuple[str, str]] = [
+    ('quickRatioTTM', 'currentRatioTTM'),
+    ('cashRatioTTM', 'quickRatioTTM'),
+    ('operatingProfitMarginTTM', 'grossProfitMarginTTM'),
+]
+
+# Plausible (min, max) per metric; None leaves that side open
+RANGE_RULES: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    'debtToAssetsRatioTTM': (0.0, 1.5),
+    'debtToCapitalRatioTTM': (0.0, 1.5),
+    'longTermDebtToCapitalRatioTTM': (0.0, 1.5),
+    'intangiblesToTotalAssetsTTM': (0.0, 1.0),
+    'currentRatioTTM': (0.0, None),
+    'quickRatioTTM': (0.0, None),
+    'cashRatioTTM': (0.0, None),
+    'grossProfitMarginTTM': (None, 1.0),
+    'daysOfSalesOutstandingTTM': (0.0, None),
+    'daysOfInventoryOutstandingTTM': (0.0, None),
+    'daysOfPayablesOutstandingTTM': (0.0, None),
+}
+
+
+class ValidationResult(NamedTuple):
+    cleaned: pd.DataFrame
+    flags: pd.DataFrame
+    replaced: pd.DataFrame
+    quarantined_tickers: List[str]
+    flagged_fraction: float
+    tripped: bool
+
+
+def robust_stats(history: Optional[pd.DataFrame], columns: List[str], tickers: pd.Index,
+                 min_history: int = 3, relative_floor: float = 0.05) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-ticker median and robust scale of each metric over that ticker's own history.
+
+    The scale is 1.4826 * MAD, floored at relative_floor * |median| so that
+    metrics which rarely move (TTM values change quarterly) still tolerate
+    ordinary changes. Cells with fewer than min_history observations get NaN
+    stats and are not outlier- or jump-checked.
+
+    Args:
+        history: Stacked historical metric rows indexed by ticker
+        columns: Metrics to compute stats for
+        tickers: Tickers to return stats for, in row order
+
+    Returns:
+        Tuple of (N x M median, N x M scale) aligned with tickers and columns
+    """
+    if history is None or history.empty:
+        empty = np.full((len(tickers), len(columns)), np.nan)
+        return empty, empty.copy()
+    values = history.reindex(columns=columns).apply(pd.to_numeric, errors='coerce')
+    grouped = values.groupby(level=0)
+    median = grouped.median()
+    deviation = pd.DataFrame(np.abs(values.to_numpy(dtype=float) - median.reindex(values.index).to_numpy(dtype=float)),
+                             index=values.index, columns=columns)
+    mad = deviation.groupby(level=0).median()
+    enough = grouped.count() >= min_history
+
+    median = median.where(enough).reindex(tickers).to_numpy(dtype=float)
+    scale = 1.4826 * mad.where(enough).reindex(tickers).to_numpy(dtype=float)
+    return median, np.fmax(scale, relative_floor * np.abs(median))
+
+
+def _rule_flags(values: np.ndarray, columns: List[str]) -> np.ndarray:
+    """
+    Flags for consistency and range rules on a company x metric matrix.
+    """
+    position = {c: i for i, c in enumerate(columns)}
+    flags = np.zeros(values.shape, dtype=np.int64)
+    for left, right in CONSISTENCY_RULES:
+        if left in position and right in position:
+            i, j = position[left], position[right]
+            violated = values[:, i] > values[:, j]  # NaN compares False
+            flags[violated, i] |= INCONSISTENT
+    for metric, (low, high) in RANGE_RULES.items():
+        if metric in position:
+            i = position[metric]
+            outside = np.zeros(len(values), dtype=bool)
+            if low is not None:
+                outside |= values[:, i] < low
+            if high is not None:
+                outside |= values[:, i] > high
+            flags[outside, i] |= OUT_OF_RANGE
+    return flags
+
+
+def _outlier_flags(values: np.ndarray, median: np.ndarray, scale: np.ndarray, z_threshold: float) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.abs(values - median) / scale
+    return np.where((scale > 0) & (z > z_threshold), OUTLIER, 0)
+
+
+def validate_metrics(metrics_df: pd.DataFrame, history: Optional[pd.DataFrame] = None,
+                     previous: Optional[pd.DataFrame] = None, previous_age_days: float = 1.0,
+                     z_threshold: float = 10.0, jump_threshold: float = 5.0, half_life_days: float = 30.0,
+                     ticker_breaker_fraction: float = 0.5, circuit_breaker_fraction: float = 0.25,
+                     min_history: int = 3) -> ValidationResult:
+    """
+    Validate a whole company x metric matrix in one vectorized pass.
+
+    Each cell is checked for:
+        OUTLIER       robust z-score against the ticker's own history above z_threshold
+        JUMP          change from the previous snapshot above jump_threshold robust scales
+        INCONSISTENT  a CONSISTENCY_RULES violation (e.g. quick ratio above current ratio)
+        OUT_OF_RANGE  outside the RANGE_RULES bounds
+
+    Outliers and jumps are measured against each ticker's own history (see
+    robust_stats), so a company that is consistently extreme compared to its
+    peers is not flagged; normalization already clips it to the boundaries.
+    Flagged cells fall back to the previous snapshot's value decayed toward
+    the ticker's historical median, 0.5 ** (previous_age_days / half_life_days),
+    when that value passes the same checks; otherwise to the ticker's
+    historical median, and with no history the raw value is kept. Validation
+    never blanks a present value, since a missing value scores worse than
+    any clipped one. A ticker with more than ticker_breaker_fraction of its
+    metrics flagged is quarantined: all of its present cells fall back. If
+    more than circuit_breaker_fraction of all non-missing cells are flagged,
+    the result is marked tripped and should not be published.
+
+    Args:
+        metrics_df: DataFrame where rows are companies and columns are metrics
+        history: Stacked historical metric rows (ticker index) for per-ticker
+            robust statistics; without it only the rule checks apply
+        previous: Previous snapshot's metrics (ticker index) for jump checks and fallback
+        previous_age_days: Age of the previous snapshot in days
+        min_history: Observations of a ticker's metric needed before it is
+            outlier- or jump-checked
+
+    Returns:
+        ValidationResult with the cleaned frame, per-cell flag bitmask, mask of
+        replaced cells, quarantined tickers, flagged fraction and the
+        circuit-breaker state
+    """
+    columns = [c for c in metrics_df.columns if c != 'fiscalYear']
+    values = metrics_df[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    median, scale = robust_stats(history, columns, metrics_df.index, min_history)
+
+    flags = _rule_flags(values, columns) | _outlier_flags(values, median, scale, z_threshold)
+
+    if previous is not None and not previous.empty:
+        prev = previous.reindex(index=metrics_df.index, columns=columns).apply(pd.to_numeric, errors='coerce')
+        prev = prev.to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            jump = np.abs(values - prev) / scale
+        flags |= np.where((scale > 0) & (jump > jump_threshold), JUMP, 0)
+        prev_ok = ~np.isnan(prev) & ((_rule_flags(prev, columns) | _outlier_flags(prev, median, scale, z_threshold)) == 0)
+    else:
+        prev = np.full(values.shape, np.nan)
+        prev_ok = np.zeros(values.shape, dtype=bool)
+
+    present = ~np.isnan(values)
+    flagged = flags != 0
+    row_fraction = flagged.sum(axis=1) / np.maximum(present.sum(axis=1), 1)
+    quarantined_rows = row_fraction > ticker_breaker_fraction
+    replace = flagged | (quarantined_rows[:, None] & present)
+
+    decay = 0.5 ** (previous_age_days / half_life_days)
+    has_median = ~np.isnan(median)
+    decayed = np.where(has_median, median + (prev - median) * decay, prev)
+    fallback = np.where(prev_ok, decayed, np.where(has_median, median, values))
+    cleaned_values = np.where(replace, fallback, values)
+
+    cleaned = metrics_df.copy()
+    cleaned[columns] = cleaned_values
+    flagged_fraction = float(flagged.sum() / max(present.sum(), 1))
+
+    return ValidationResult(
+        cleaned=cleaned,
+        flags=pd.DataFrame(flags, index=metrics_df.index, columns=columns),
+        replaced=pd.DataFrame(replace, index=metrics_df.index, columns=columns),
+        quarantined_tickers=metrics_df.index[quarantined_rows].tolist(),
+        flagged_fraction=flagged_fraction,
+        tripped=flagged_fraction > circuit_breaker_fraction,
+    )
@@ -0,0 +1,127 @@
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+from app.services.calculate_index import METRIC_WEIGHTS, PILLAR_WEIGHTS, ScoringEngine
+
+
+def dirichlet_pillar_scenarios(n: int, alpha: float = 1.0, pillars: Optional[List[str]] = None,
+                               seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Sample random pillar weight configurations from a symmetric Dirichlet distribution.
+
+    Args:
+        n: Number of scenarios
+        alpha: Concentration parameter (1.0 samples uniformly over the simplex)
+        pillars: Pillar names, defaults to the keys of PILLAR_WEIGHTS
+        seed: Random seed for reproducible sweeps
+
+    Returns:
+        DataFrame with one row per scenario and one column per pillar
+    """
+    pillars = list(PILLAR_WEIGHTS) if pillars is None else pillars
+    rng = np.random.default_rng(seed)
+    weights = rng.dirichlet(np.full(len(pillars), alpha), size=n)
+    return pd.DataFrame(weights, columns=pillars)
+
+
+def grid_pillar_scenarios(step: float = 0.1, pillars: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Enumerate every pillar weight configuration on a grid that sums to 1.
+
+    Args:
+        step: Grid spacing, e.g. 0.1 gives weights in multiples of 10%
+        pillars: Pillar names, defaults to the keys of PILLAR_WEIGHTS
+
+    Returns:
+        DataFrame with one row per scenario and one column per pillar
+    """
+    pillars = list(PILLAR_WEIGHTS) if pillars is None else pillars
+    units = int(round(1.0 / step))
+    k = len(pillars)
+
+    # stars and bars: choose k - 1 divider positions among units + k - 1 slots
+    rows = []
+    for dividers in combinations(range(units + k - 1), k - 1):
+        bounds = (-1,) + dividers + (units + k - 1,)
+        rows.append([bounds[i + 1] - bounds[i] - 1 for i in range(k)])
+    return pd.DataFrame(np.array(rows, dtype=float) / units, columns=pillars)
+
+
+def _scenario_matrix(scenarios: Union[pd.DataFrame, List[Dict[str, float]]], pillars: List[str]) -> pd.DataFrame:
+    if not isinstance(scenarios, pd.DataFrame):
+        scenarios = pd.DataFrame(list(scenarios))
+    unknown = set(scenarios.columns) - set(pillars)
+    if unknown:
+        raise ValueError(f"Unknown pillars in scenarios: {sorted(unknown)}")
+    return scenarios.reindex(columns=pillars).fillna(0.0).astype(float)
+
+
+def _rank_columns(scores: np.ndarray) -> np.ndarray:
+    """
+    Rank each column independently, 1 being the highest score.
+    """
+    order = np.argsort(-scores, axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    positions = np.broadcast_to(np.arange(1, scores.shape[0] + 1)[:, None], order.shape)
+    np.put_along_axis(ranks, order, positions, axis=0)
+    return ranks
+
+
+def evaluate_weight_scenarios(companies_data: pd.DataFrame, boundaries,
+                              scenarios: Union[pd.DataFrame, List[Dict[str, float]]],
+                              baseline_weights: Dict[str, float] = PILLAR_WEIGHTS,
+                              metric_weights=METRIC_WEIGHTS) -> Dict[str, Any]:
+    """
+    Score the universe under many candidate pillar weight configurations at once.
+
+    Normalized metrics and pillar scores are computed once; each scenario is
+    then a column of a single pillar_scores @ weights product.
+
+    Args:
+        companies_data: DataFrame where rows are companies and columns are metrics
+        boundaries: Dictionary of metric boundaries
+        scenarios: DataFrame (scenarios x pillars) or list of pillar weight dictionaries;
+            weights are rescaled to sum to 1 and missing pillars count as 0
+        baseline_weights: Pillar weights that rank changes are measured against
+        metric_weights: Dictionary of metric weights within each pillar
+
+    Returns:
+        Dictionary with:
+            'scores': DataFrame of index scores, tickers x scenarios
+            'ranks': DataFrame of ranks (1 = best), tickers x scenarios
+            'rank_changes': DataFrame of baseline rank minus scenario rank (positive = moved up)
+            'baseline': DataFrame with baseline index_score and rank per ticker
+            'summary': DataFrame with per-scenario rank movement statistics
+    """
+    engine = ScoringEngine(boundaries, baseline_weights, metric_weights)
+    weights = _scenario_matrix(scenarios, engine.pillars)
+
+    values, available = engine.matrix_from_frame(companies_data)
+    pillar_scores = engine.pillar_scores(engine.normalize(values), available)
+
+    totals = weights.to_numpy().sum(axis=1)
+    if np.any(totals <= 0):
+        raise ValueError("Every scenario needs at least one positive pillar weight")
+    scores = pillar_scores @ (weights.to_numpy() / totals[:, None]).T
+    baseline_scores = engine.index_scores(pillar_scores)
+
+    ranks = _rank_columns(scores)
+    baseline_ranks = _rank_columns(baseline_scores[:, None])[:, 0]
+    rank_changes = baseline_ranks[:, None] - ranks
+
+    tickers = companies_data.index
+    abs_changes = np.abs(rank_changes)
+    summary = pd.DataFrame({
+        'mean_abs_rank_change': abs_changes.mean(axis=0) if len(tickers) else np.zeros(len(weights)),
+        'max_abs_rank_change': abs_changes.max(axis=0) if len(tickers) else np.zeros(len(weights)),
+        'top_ticker': tickers.to_numpy()[np.argmax(scores, axis=0)] if len(tickers) else None,
+    }, index=weights.index)
+
+    return {
+        'scores': pd.DataFrame(scores, index=tickers, columns=weights.index),
+        'ranks': pd.DataFrame(ranks, index=tickers, columns=weights.index),
+        'rank_changes': pd.DataFrame(rank_changes, index=tickers, columns=weights.index),
+        'baseline': pd.DataFrame({'index_score': baseline_scores, 'rank': baseline_ranks}, index=tickers),
+        'summary': summary,
+    }
@@ -0,0 +1,288 @@
+"""
+Stage-by-stage benchmark of the F-Index pipeline on replayed FMP payloads, no network.
+
+Each stage (fetch, build_ftoken_object, createFinancialMetricsObject,
+extract_all_metrics_dataframe, calculate_metric_boundaries,
+calculate_all_companies_indexes) is timed separately with wall time, CPU
+time and tracemalloc peak memory. Payloads are synthetic, or recorded
+<SYMBOL>.json files from --payloads cycled to the requested universe size.
+
+Fetch modes:
+    replay  payloads are decoded from JSON in memory (no HTTP layer)
+    http    payloads are served by a local HTTP server with simulated latency
+            and fetched through app.clients.fmp; sweep --max-in-flight to
+            compare concurrency settings
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 10 1000 10000 50000]
+    python -m benchmarks.bench_pipeline --fetch-mode http --latency-ms 80 --max-in-flight 4 16 64 --sizes 500
+    python -m benchmarks.bench_pipeline --save-baseline benchmarks/baseline_pipeline.json
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline_pipeline.json --tolerance 0.2
+"""
+import os
+
+# Benchmarks must never touch the real API, the on-disk cache or the plan's
+# rate limit; these are read when app.clients.fmp is imported.
+os.environ.setdefault("FMP_CACHE_ENABLED", "0")
+os.environ.setdefault("FMP_REQUESTS_PER_MINUTE", "100000000")
+os.environ.setdefault("FMP_BURST", "1000000")
+os.environ.setdefault("FMP_MAX_IN_FLIGHT", "256")
+os.environ.setdefault("FMP_API_KEY", "benchmark")
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+from app.clients import fmp
+from app.clients.fmp import build_ftoken_object, fetch_combined_ttm_many
+from app.models.Company import Company
+from app.models.MetricsSchema import get_metrics_schema
+from app.services.calculate_index import calculate_all_companies_indexes
+from app.services.calculate_min_max import calculate_metric_boundaries
+from app.services.create_company import createFinancialMetricsObject
+from app.services.data_collection import extract_all_metrics_dataframe
+
+STAGES = [
+    'fetch',
+    'build_ftoken_object',
+    'createFinancialMetricsObject',
+    'extract_all_metrics_dataframe',
+    'calculate_metric_boundaries',
+    'calculate_all_companies_indexes',
+]
+
+
+def synthetic_payloads(n: int, seed: int = 0, missing: float = 0.05) -> Dict[str, Dict[str, Any]]:
+    """
+    Flat combined TTM payloads for n synthetic tickers, with a fraction of missing values.
+    """
+    rng = np.random.default_rng(seed)
+    metrics = get_metrics_schema().metrics
+    centers = rng.normal(0, 5, len(metrics))
+    scales = rng.uniform(0.1, 3, len(metrics))
+    values = rng.normal(centers, scales, size=(n, len(metrics)))
+    holes = rng.random((n, len(metrics))) < missing
+    payloads = {}
+    for i in range(n):
+        symbol = f"T{i:05d}"
+        payload = {m: (None if holes[i, j] else float(values[i, j])) for j, m in enumerate(metrics)}
+        payload['symbol'] = symbol
+        payloads[symbol] = payload
+    return payloads
+
+
+def recorded_payloads(directory: str, n: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Recorded <SYMBOL>.json payloads, cycled and renamed to reach n tickers.
+    """
+    files = sorted(Path(directory).glob("*.json"))
+    if not files:
+        raise FileNotFoundError(f"No recorded payloads in {directory}")
+    recorded = []
+    for file in files:
+        with open(file) as f:
+            data = json.load(f)
+        recorded.append(data[0] if isinstance(data, list) else data)
+    payloads = {}
+    for i in range(n):
+        symbol = f"T{i:05d}"
+        payloads[symbol] = {**recorded[i % len(recorded)], 'symbol': symbol}
+    return payloads
+
+
+class PayloadServer:
+    """
+    Local FMP stand-in serving /<endpoint>?symbol=X with simulated latency.
+
+    Args:
+        payloads: Symbol -> payload served on every endpoint
+        latency_ms: Mean response latency
+        jitter_ms: Uniform jitter added to the latency
+    """
+
+    def __init__(self, payloads: Dict[str, Dict[str, Any]], latency_ms: float = 50.0, jitter_ms: float = 10.0):
+        encoded = {symbol: json.dumps([payload]).encode() for symbol, payload in payloads.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                symbol = parse_qs(urlparse(self.path).query).get('symbol', [''])[0]
+                time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1e3)
+                body = encoded.get(symbol, b"[]")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "PayloadServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def measure(func: Callable[[], Any], repeat: int = 1, memory: bool = True):
+    """
+    Run func repeat times; report the best wall and CPU time and, in one extra
+    traced run, the tracemalloc peak.
+
+    Returns:
+        Tuple of (result of the last run, {'wall_s', 'cpu_s', 'peak_mb'})
+    """
+    walls, cpus = [], []
+    result = None
+    for _ in range(max(1, repeat)):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = func()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    peak = float('nan')
+    if memory:
+        tracemalloc.start()
+        try:
+            result = func()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result, {'wall_s': min(walls), 'cpu_s': min(cpus), 'peak_mb': peak}
+
+
+def run_pipeline(payloads: Dict[str, Dict[str, Any]], fetch: Callable[[], Dict[str, Any]],
+                 repeat: int = 1, memory: bool = True) -> List[dict]:
+    """
+    Time every pipeline stage once on the given payloads.
+
+    Returns:
+        List of {'stage', 'wall_s', 'cpu_s', 'peak_mb'} rows in STAGES order
+    """
+    schema = get_metrics_schema().raw
+    rows = []
+
+    fetched, stats = measure(fetch, repeat, memory)
+    rows.append({'stage': 'fetch', **stats})
+    fetched = [p for p in fetched.values() if not isinstance(p, Exception)]
+
+    ftokens, stats = measure(lambda: [build_ftoken_object(p, schema) for p in fetched], repeat, memory)
+    rows.append({'stage': 'build_ftoken_object', **stats})
+
+    financials, stats = measure(lambda: [createFinancialMetricsObject(t) for t in ftokens], repeat, memory)
+    rows.append({'stage': 'createFinancialMetricsObject', **stats})
+    companies = [Company(ticker=t['symbol'], fiscalYear="2025", financials=f) for t, f in zip(ftokens, financials)]
+
+    df, stats = measure(lambda: extract_all_metrics_dataframe(companies), repeat, memory)
+    rows.append({'stage': 'extract_all_metrics_dataframe', **stats})
+
+    boundaries, stats = measure(lambda: calculate_metric_boundaries(df), repeat, memory)
+    rows.append({'stage': 'calculate_metric_boundaries', **stats})
+
+    _, stats = measure(lambda: calculate_all_companies_indexes(df, boundaries), repeat, memory)
+    rows.append({'stage': 'calculate_all_companies_indexes', **stats})
+    return rows
+
+
+def bench(n: int, fetch_mode: str = 'replay', max_in_flight: int = 16, latency_ms: float = 50.0,
+          payload_dir: Optional[str] = None, repeat: int = 1, memory: bool = True, seed: int = 0) -> List[dict]:
+    payloads = recorded_payloads(payload_dir, n) if payload_dir else synthetic_payloads(n, seed)
+    if fetch_mode == 'http':
+        with PayloadServer(payloads, latency_ms=latency_ms) as server:
+            fmp.FMP_BASE_URL = server.url
+            rows = run_pipeline(payloads, lambda: fetch_combined_ttm_many(list(payloads), max_in_flight),
+                                repeat, memory)
+    else:
+        encoded = {symbol: json.dumps([payload]) for symbol, payload in payloads.items()}
+        rows = run_pipeline(payloads, lambda: {s: json.loads(body)[0] for s, body in encoded.items()},
+                            repeat, memory)
+    for row in rows:
+        row.update({'tickers': n, 'fetch_mode': fetch_mode,
+                    'max_in_flight': max_in_flight if fetch_mode == 'http' else 0})
+    return rows
+
+
+def compare_to_baseline(results: pd.DataFrame, baseline: pd.DataFrame, tolerance: float,
+                        min_seconds: float = 0.01) -> pd.DataFrame:
+    """
+    Join results with the baseline on (tickers, fetch_mode, max_in_flight, stage)
+    and flag wall time or peak memory more than tolerance above it. Wall time
+    slowdowns under min_seconds are treated as timer noise.
+    """
+    keys = ['tickers', 'fetch_mode', 'max_in_flight', 'stage']
+    merged = results.merge(baseline[keys + ['wall_s', 'peak_mb']], on=keys, how='left', suffixes=('', '_base'))
+    merged['wall_ratio'] = merged['wall_s'] / merged['wall_s_base']
+    merged['peak_ratio'] = merged['peak_mb'] / merged['peak_mb_base']
+    slower = (merged['wall_ratio'] > 1 + tolerance) & (merged['wall_s'] - merged['wall_s_base'] > min_seconds)
+    merged['regression'] = slower | (merged['peak_ratio'] > 1 + tolerance)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--fetch-mode', choices=['replay', 'http'], default='replay')
+    parser.add_argument('--max-in-flight', type=int, nargs='+', default=[16],
+                        help="concurrency settings to sweep in http mode")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="simulated HTTP latency in http mode")
+    parser.add_argument('--payloads', help="directory of recorded <SYMBOL>.json payloads to replay")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage, the best is reported")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help="baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before a stage is a regression")
+    parser.add_argument('--min-seconds', type=float, default=0.01, help="ignore wall time slowdowns below this")
+    parser.add_argument('--save-baseline', help="write these results as the new baseline JSON")
+    args = parser.parse_args()
+
+    concurrency = args.max_in_flight if args.fetch_mode == 'http' else [0]
+    bench(10, memory=False, seed=args.seed)  # warm up lazy imports and first-call caches
+    rows = []
+    for n in args.sizes:
+        for max_in_flight in concurrency:
+            rows.extend(bench(n, args.fetch_mode, max_in_flight or 16, args.latency_ms, args.payloads,
+                              args.repeat, not args.no_memory, args.seed))
+    results = pd.DataFrame(rows)[['tickers', 'fetch_mode', 'max_in_flight', 'stage', 'wall_s', 'cpu_s', 'peak_mb']]
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = pd.DataFrame(json.load(f)['results'])
+        results = compare_to_baseline(results, baseline, args.tolerance, args.min_seconds)
+        regressed = bool(results['regression'].any())
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        columns = ['tickers', 'fetch_mode', 'max_in_flight', 'stage', 'wall_s', 'cpu_s', 'peak_mb']
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': sys.version.split()[0],
+                       'results': results[columns].to_dict(orient='records')}, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if regressed:
+        print(f"Regression: a stage exceeded the baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Encoding/decoding benchmark for on-chain publication payloads.
+
+Usage: python -m benchmarks.bench_publication [--sizes 100 1000 10000] [--changed 0.1]
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from app.services.publication import (PublishedState, build_publication_batches, decode_batch, merkle_leaf,
+                                      merkle_proof, verify_proof)
+
+
+def synthetic_scores(n: int, rng) -> pd.DataFrame:
+    return pd.DataFrame({'ticker': [f"T{i:05d}" for i in range(n)], 'index_score': rng.uniform(0, 1, n)})
+
+
+def bench(n: int, changed_fraction: float, repeat: int = 3, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    scores = synthetic_scores(n, rng)
+    empty = PublishedState(path="/dev/null")
+
+    # first publication registers every ticker
+    start = time.perf_counter()
+    first_batches, state = build_publication_batches(scores, empty, timestamp=0)
+    first_encode = time.perf_counter() - start
+
+    # daily update: a fraction of tickers move
+    moved = scores.copy()
+    mask = rng.random(n) < changed_fraction
+    moved.loc[mask, 'index_score'] = np.clip(moved.loc[mask, 'index_score'] + rng.normal(0, 0.02, mask.sum()), 0, 1)
+    encode_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        batches, _ = build_publication_batches(moved, state, threshold=0.0005, timestamp=0)
+        encode_times.append(time.perf_counter() - start)
+
+    decode_times = []
+    for _ in range(repeat):
+        replay = state.copy()
+        start = time.perf_counter()
+        for batch in batches:
+            decoded = decode_batch(batch.payload, replay)
+            replay.scores.update(decoded['scores'])
+        decode_times.append(time.perf_counter() - start)
+
+    proof_bytes = 0
+    start = time.perf_counter()
+    for batch in batches:
+        leaves = [merkle_leaf(t, s) for t, s in zip(batch.tickers, batch.scores)]
+        proof = merkle_proof(leaves, 0)
+        assert verify_proof(batch.tickers[0], batch.scores[0], proof, batch.merkle_root)
+        proof_bytes = max(proof_bytes, 33 * len(proof))
+    proof_time = time.perf_counter() - start
+
+    naive_bytes = len(json.dumps(dict(zip(moved['ticker'], moved['index_score']))).encode())
+    return {
+        'tickers': n,
+        'updated': sum(len(b.tickers) for b in batches),
+        'batches': len(batches),
+        'first_publication_bytes': sum(len(b.payload) for b in first_batches),
+        'first_encode_ms': first_encode * 1e3,
+        'delta_bytes': sum(len(b.payload) for b in batches),
+        'naive_full_json_bytes': naive_bytes,
+        'encode_ms': min(encode_times) * 1e3,
+        'decode_ms': min(decode_times) * 1e3,
+        'proof_ms': proof_time * 1e3,
+        'max_proof_bytes': proof_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--changed', type=float, default=0.1, help="fraction of tickers that move per update")
+    args = parser.parse_args()
+
+    results = pd.DataFrame([bench(n, args.changed) for n in args.sizes])
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Importing app.clients.fmp must not open the on-disk cache of a real run
+os.environ.setdefault("FMP_CACHE_ENABLED", "0")
+os.environ.setdefault("FMP_API_KEY", "test")
+
+
+class FakeServer:
+    """
+    Local HTTP server answering from a scripted list of responses.
+
+    Each entry of responses is (status, headers, body); body is JSON-encoded
+    unless it is None. Once the script runs out the last entry repeats. Every
+    request's path and headers are kept in requests; delay holds each
+    response back that many seconds.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append({"path": self.path, "headers": dict(self.headers)})
+                    index = min(len(server.requests), len(server.responses)) - 1
+                    status, headers, body = server.responses[index]
+                if server.delay:
+                    time.sleep(server.delay)
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def script(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def session():
+    import requests
+    session = requests.Session()
+    session.trust_env = False  # never route the local server through a proxy
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    # Specification and data paths are relative to the repository root
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from app.services.backtest import panel_from_snapshots
+from app.services.snapshot_store import SnapshotStore
+
+
+def append_run(store, run_date, value):
+    metrics = pd.DataFrame({'currentRatioTTM': [value, value + 1.0]}, index=pd.Index(['AAA', 'BBB'], name='ticker'))
+    scores = pd.DataFrame({'ticker': ['AAA', 'BBB'], 'index_score': [0.4, 0.6]})
+    store.append(metrics, {'currentRatioTTM': (0.0, 5.0)}, scores, run_date=run_date)
+
+
+def test_panel_skips_dates_without_a_completed_run(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    append_run(store, "2026-01-02", 1.0)
+    append_run(store, "2026-01-05", 2.0)
+    # An append interrupted before its rename leaves only the temporary run directory
+    (tmp_path / "snapshots" / "date=2026-01-03" / ".tmp-run=120000000000").mkdir(parents=True)
+
+    panel = panel_from_snapshots(store)
+
+    assert list(panel.dates.strftime("%Y-%m-%d")) == ["2026-01-02", "2026-01-05"]
+    assert panel.values.shape == (2, 2, 1)
+    np.testing.assert_allclose(panel.values[:, :, 0], [[1.0, 2.0], [2.0, 3.0]])
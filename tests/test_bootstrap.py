@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from app.services.bootstrap import bootstrap_index_scores
+from app.services.calculate_index import METRIC_WEIGHTS
+from app.services.calculate_min_max import calculate_metric_boundaries
+
+METRICS = [metric for pillar in METRIC_WEIGHTS.values() for metric in pillar]
+
+
+def test_sparse_companies_are_scored_but_not_resampled_into_boundaries():
+    rng = np.random.default_rng(3)
+    dense = pd.DataFrame(rng.normal(1.0, 1.0, (40, len(METRICS))), columns=METRICS,
+                         index=[f"D{i:02d}" for i in range(40)])
+    sparse = pd.DataFrame(np.nan, columns=METRICS, index=[f"S{i}" for i in range(10)])
+    sparse['currentRatioTTM'] = 500.0
+    companies = pd.concat([dense, sparse])
+    boundaries = calculate_metric_boundaries(companies, min_coverage=0.5)
+
+    everyone = bootstrap_index_scores(companies, boundaries, replicates=50, seed=11, min_coverage=0.5)
+    dense_only = bootstrap_index_scores(dense, boundaries, replicates=50, seed=11)
+
+    assert list(everyone['summary'].index) == list(companies.index)
+    pd.testing.assert_frame_equal(everyone['scores'][dense.index], dense_only['scores'])
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+from app.clients import fmp
+from app.clients.cache import CacheMissError, ResponseCache
+from app.clients.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def cached_fmp(monkeypatch, tmp_path, fake_server, session):
+    """
+    Point the FMP client at the fake server with an empty on-disk cache.
+    """
+    cache = ResponseCache(str(tmp_path / "fmp_cache.sqlite"), ttl_seconds=3600)
+    monkeypatch.setattr(fmp, "FMP_BASE_URL", fake_server.url)
+    monkeypatch.setattr(fmp, "FMP_CACHE_ENABLED", True)
+    monkeypatch.setattr(fmp, "FMP_OFFLINE", False)
+    monkeypatch.setattr(fmp, "_response_cache", cache)
+    monkeypatch.setattr(fmp, "_session", session)
+    monkeypatch.setattr(fmp, "rate_limiter", RateLimiter(requests_per_minute=60000, burst=50, backoff_base=0.01))
+    return cache
+
+
+def test_fresh_entry_is_served_without_a_request(cached_fmp, fake_server):
+    fake_server.script((200, {"ETag": '"v1"'}, [{"symbol": "AAPL", "currentRatioTTM": 1.5}]))
+
+    first = fmp.fetchFMP_RATIOS_TTM("AAPL")
+    second = fmp.fetchFMP_RATIOS_TTM("AAPL")
+
+    assert first == second == {"symbol": "AAPL", "currentRatioTTM": 1.5}
+    assert len(fake_server.requests) == 1
+    assert "symbol=AAPL" in fake_server.requests[0]["path"]
+
+
+def test_stale_entry_is_revalidated_with_304(cached_fmp, fake_server):
+    cached_fmp.ttl_seconds = 0
+    fake_server.script(
+        (200, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, [{"symbol": "AAPL", "peRatioTTM": 30.0}]),
+        (304, {"ETag": '"v1"'}, None),
+    )
+
+    fmp.fetchFMP_KEY_Metrics_TTM("AAPL")
+    fetched_at = cached_fmp.get(fmp.KEY_METRICS_TTM_ENDPOINT, "AAPL").fetched_at
+    time.sleep(0.01)
+    payload = fmp.fetchFMP_KEY_Metrics_TTM("AAPL")
+
+    assert payload == {"symbol": "AAPL", "peRatioTTM": 30.0}
+    assert len(fake_server.requests) == 2
+    revalidation = fake_server.requests[1]["headers"]
+    assert revalidation["If-None-Match"] == '"v1"'
+    assert revalidation["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert cached_fmp.get(fmp.KEY_METRICS_TTM_ENDPOINT, "AAPL").fetched_at > fetched_at
+
+
+def test_stale_entry_is_replaced_when_the_resource_changed(cached_fmp, fake_server):
+    cached_fmp.ttl_seconds = 0
+    fake_server.script(
+        (200, {"ETag": '"v1"'}, [{"symbol": "AAPL", "peRatioTTM": 30.0}]),
+        (200, {"ETag": '"v2"'}, [{"symbol": "AAPL", "peRatioTTM": 31.0}]),
+    )
+
+    fmp.fetchFMP_KEY_Metrics_TTM("AAPL")
+    payload = fmp.fetchFMP_KEY_Metrics_TTM("AAPL")
+
+    assert payload["peRatioTTM"] == 31.0
+    assert cached_fmp.get(fmp.KEY_METRICS_TTM_ENDPOINT, "AAPL").etag == '"v2"'
+
+
+def test_offline_miss_raises_without_a_request(cached_fmp, fake_server, monkeypatch):
+    monkeypatch.setattr(fmp, "FMP_OFFLINE", True)
+    fake_server.script((200, {}, [{"symbol": "MSFT"}]))
+
+    with pytest.raises(CacheMissError):
+        fmp.fetchFMP_RATIOS_TTM("MSFT")
+    assert fake_server.requests == []
+
+
+def test_offline_serves_stale_entries(cached_fmp, fake_server, monkeypatch):
+    fake_server.script((200, {}, [{"symbol": "MSFT", "currentRatioTTM": 1.2}]))
+    fmp.fetchFMP_RATIOS_TTM("MSFT")
+    cached_fmp.ttl_seconds = 0
+    monkeypatch.setattr(fmp, "FMP_OFFLINE", True)
+
+    assert fmp.fetchFMP_RATIOS_TTM("MSFT") == {"symbol": "MSFT", "currentRatioTTM": 1.2}
+    assert len(fake_server.requests) == 1
+
+
+def test_cache_is_opened_lazily(monkeypatch, tmp_path):
+    path = tmp_path / "cache" / "fmp_cache.sqlite"
+    monkeypatch.setattr(fmp, "FMP_CACHE_ENABLED", True)
+    monkeypatch.setattr(fmp, "FMP_CACHE_PATH", str(path))
+    monkeypatch.setattr(fmp, "_response_cache", None)
+
+    assert not path.parent.exists()
+    cache = fmp.get_response_cache()
+    assert path.exists()
+    assert fmp.get_response_cache() is cache
+
+
+def test_cache_disabled_returns_none(monkeypatch):
+    monkeypatch.setattr(fmp, "FMP_CACHE_ENABLED", False)
+    assert fmp.get_response_cache() is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("ratios-ttm", "A", {"v": 1})
+    time.sleep(0.01)
+    cache.put("ratios-ttm", "B", {"v": 2})
+    time.sleep(0.01)
+    cache.get("ratios-ttm", "A")
+    time.sleep(0.01)
+    cache.put("ratios-ttm", "C", {"v": 3})
+
+    assert len(cache) == 2
+    assert cache.get("ratios-ttm", "B") is None
+    assert cache.get("ratios-ttm", "A").payload == {"v": 1}
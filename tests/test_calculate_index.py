@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.calculate_index import (METRIC_WEIGHTS, PILLAR_WEIGHTS, ScoringEngine, calculate_all_companies_indexes,
+                                          calculate_company_index)
+from app.services.calculate_min_max import GLOBAL_COHORT, calculate_cohort_boundaries, calculate_metric_boundaries
+
+METRICS = [metric for pillar in METRIC_WEIGHTS.values() for metric in pillar]
+
+
+@pytest.fixture
+def companies():
+    rng = np.random.default_rng(7)
+    values = rng.normal(1.0, 2.0, size=(60, len(METRICS)))
+    values[rng.random(values.shape) < 0.15] = np.nan
+    return pd.DataFrame(values, index=[f"T{i:02d}" for i in range(60)], columns=METRICS)
+
+
+def scalar_scores(companies, boundaries, bounds_for=None):
+    rows = []
+    for ticker, row in companies.iterrows():
+        result = calculate_company_index(row, bounds_for(ticker) if bounds_for else boundaries)
+        rows.append({'ticker': ticker, 'index_score': result['index_score'],
+                     **{f'{pillar}_score': score for pillar, score in result['pillar_scores'].items()}})
+    return pd.DataFrame(rows)
+
+
+def assert_scores_match(batch, scalar):
+    assert list(batch['ticker']) == list(scalar['ticker'])
+    for column in scalar.columns.drop('ticker'):
+        np.testing.assert_allclose(batch[column].to_numpy(), scalar[column].to_numpy(), rtol=0, atol=1e-12,
+                                   err_msg=column)
+
+
+def test_batch_scores_match_scalar(companies):
+    boundaries = calculate_metric_boundaries(companies)
+
+    assert_scores_match(calculate_all_companies_indexes(companies, boundaries), scalar_scores(companies, boundaries))
+
+
+def test_batch_matches_scalar_with_degenerate_and_missing_boundaries(companies):
+    boundaries = calculate_metric_boundaries(companies)
+    boundaries['currentRatioTTM'] = (1.0, 1.0)
+    del boundaries['returnOnEquityTTM']
+    companies.loc['T00', 'currentRatioTTM'] = np.nan
+
+    assert_scores_match(calculate_all_companies_indexes(companies, boundaries), scalar_scores(companies, boundaries))
+
+
+def test_batch_matches_scalar_when_a_metric_column_is_absent(companies):
+    boundaries = calculate_metric_boundaries(companies)
+    partial = companies.drop(columns=['debtToEquityRatioTTM', 'operatingProfitMarginTTM'])
+
+    assert_scores_match(calculate_all_companies_indexes(partial, boundaries), scalar_scores(partial, boundaries))
+
+
+def test_batch_matches_scalar_with_custom_weights(companies):
+    boundaries = calculate_metric_boundaries(companies)
+    pillar_weights = {**PILLAR_WEIGHTS, 'Liquidity': 0.0, 'Profitability': 0.5}
+
+    batch = calculate_all_companies_indexes(companies, boundaries, pillar_weights=pillar_weights)
+    scalar = [calculate_company_index(row, boundaries, pillar_weights)['index_score'] for _, row in companies.iterrows()]
+
+    np.testing.assert_allclose(batch['index_score'].to_numpy(), scalar, rtol=0, atol=1e-12)
+
+
+def test_cohort_scores_match_scalar_with_cohort_boundaries(companies):
+    cohorts = pd.Series(['Tech', 'Energy', None] * 20, index=companies.index)
+    global_boundaries = calculate_metric_boundaries(companies)
+    cohort_boundaries = {
+        cohort: calculate_metric_boundaries(companies[cohorts == cohort]) for cohort in ['Tech', 'Energy']
+    }
+
+    batch = calculate_all_companies_indexes(companies, global_boundaries, cohorts=cohorts,
+                                            cohort_boundaries=cohort_boundaries)
+    scalar = scalar_scores(companies, global_boundaries,
+                           bounds_for=lambda ticker: cohort_boundaries.get(cohorts[ticker], global_boundaries))
+
+    assert_scores_match(batch, scalar)
+
+
+def test_unlabeled_and_small_cohort_companies_share_the_run_global_bounds(companies):
+    # Saved boundaries from an earlier run differ from this run's global ones
+    saved = {metric: (low - 1.0, high + 1.0) for metric, (low, high) in calculate_metric_boundaries(companies).items()}
+    cohorts = pd.Series(['Tech'] * 50 + ['Tiny'] * 3 + [None] * 7, index=companies.index)
+    cohort_boundaries = calculate_cohort_boundaries(companies, cohorts, min_cohort_size=10)
+    run_global = cohort_boundaries[GLOBAL_COHORT]
+
+    batch = calculate_all_companies_indexes(companies, saved, cohorts=cohorts,
+                                            cohort_boundaries=cohort_boundaries).set_index('ticker')
+
+    for ticker in companies.index[50:]:
+        expected = calculate_company_index(companies.loc[ticker], run_global)['index_score']
+        assert batch.loc[ticker, 'index_score'] == pytest.approx(expected, abs=1e-12)
+
+
+def test_scores_are_bounded_and_inverse_metrics_flip(companies):
+    boundaries = calculate_metric_boundaries(companies)
+    engine = ScoringEngine(boundaries)
+    column = engine.metric_index['debtToEquityRatioTTM']
+    low, high = boundaries['debtToEquityRatioTTM']
+
+    values = np.full((2, len(engine.metrics)), np.nan)
+    values[:, column] = [low, high]
+    normalized = engine.normalize(values)
+
+    assert normalized[:, column].tolist() == [1.0, 0.0]
+    scores = calculate_all_companies_indexes(companies, boundaries)['index_score']
+    assert scores.between(0.0, 1.0).all()
@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+
+import pytest
+
+import requests
+
+from app.clients import fmp
+from app.clients.providers import (ConsensusError, FMPProvider, FixtureProvider, Provider, aggregate_payloads,
+                                   fetch_consensus, fetch_consensus_many)
+from app.clients.rate_limiter import RateLimiter
+
+SYMBOLS = [f"SYM{i}" for i in range(24)]
+
+
+class CountingProvider(FixtureProvider):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def fetch(self, symbol):
+        with self._calls_lock:
+            self.calls += 1
+        return super().fetch(symbol)
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    """
+    One fixture directory per provider; the values differ slightly per source.
+    """
+    directories = {}
+    for offset, name in enumerate(["a", "b", "c"]):
+        directory = tmp_path / name
+        directory.mkdir()
+        for symbol in SYMBOLS:
+            payload = [{"symbol": symbol, "currentRatioTTM": 1.0 + offset * 0.01, "peRatioTTM": 20.0 + offset}]
+            (directory / f"{symbol}.json").write_text(json.dumps(payload))
+        directories[name] = directory
+    return directories
+
+
+def test_provider_must_implement_fetch():
+    with pytest.raises(TypeError):
+        Provider("incomplete")
+
+
+def test_quorum_is_reached_without_waiting_for_a_slow_provider(fixtures):
+    providers = [
+        FixtureProvider("a", fixtures["a"], max_in_flight=4),
+        FixtureProvider("b", fixtures["b"], max_in_flight=4),
+        CountingProvider("slow", fixtures["c"], delay=0.5, timeout=5.0, max_in_flight=2),
+    ]
+
+    started = time.monotonic()
+    results = fetch_consensus_many(SYMBOLS, providers, quorum=2, max_symbols_in_flight=8)
+    elapsed = time.monotonic() - started
+
+    assert all(not isinstance(r, Exception) for r in results.values()), results
+    assert elapsed < 2.0
+    for result in results.values():
+        assert set(result.sources) <= {"a", "b", "slow"}
+        assert len(result.sources) >= 2
+    # Calls still queued on the slow provider are cancelled once the quorum answers
+    assert providers[2].calls < len(SYMBOLS)
+
+
+def test_timeout_counts_from_when_the_call_starts(fixtures):
+    # Each call takes 0.1s but the provider runs one at a time, so later
+    # symbols queue for longer than the timeout before they start.
+    providers = [
+        FixtureProvider("a", fixtures["a"]),
+        FixtureProvider("b", fixtures["b"]),
+        FixtureProvider("serial", fixtures["c"], delay=0.1, timeout=0.3, max_in_flight=1),
+    ]
+
+    results = fetch_consensus_many(SYMBOLS[:6], providers, quorum=3, max_symbols_in_flight=6)
+
+    for symbol, result in results.items():
+        assert not isinstance(result, Exception), f"{symbol}: {result}"
+        assert sorted(result.sources) == ["a", "b", "serial"]
+
+
+def test_running_call_past_its_timeout_fails_the_quorum(fixtures):
+    providers = [
+        FixtureProvider("a", fixtures["a"]),
+        FixtureProvider("stuck", fixtures["b"], delay=1.0, timeout=0.2),
+    ]
+
+    started = time.monotonic()
+    with pytest.raises(ConsensusError, match="1/2"):
+        fetch_consensus("SYM0", providers, quorum=2)
+    assert time.monotonic() - started < 0.8
+
+
+def test_call_queued_behind_a_hung_call_fails_at_the_deadline(fixtures, tmp_path):
+    # The hung provider runs one call at a time, so every later symbol's call
+    # queues behind the first one and never starts.
+    providers = [
+        FixtureProvider("ok", fixtures["a"]),
+        FixtureProvider("hung", fixtures["b"], delay=2.0, timeout=0.2, max_in_flight=1),
+        FixtureProvider("missing", tmp_path / "missing"),
+    ]
+
+    started = time.monotonic()
+    results = fetch_consensus_many(SYMBOLS[:3], providers, quorum=2, deadline=0.5)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 1.5
+    assert all(isinstance(r, ConsensusError) for r in results.values()), results
+    assert any("deadline passed while queued" in str(r) for r in results.values())
+
+
+def test_deadline_defaults_to_twice_the_longest_timeout(fixtures):
+    providers = [
+        FixtureProvider("a", fixtures["a"], timeout=0.1),
+        FixtureProvider("blocker", fixtures["b"], delay=0.6, timeout=0.1, max_in_flight=1),
+    ]
+    blocked = providers[1].executor.submit(time.sleep, 0.6)
+
+    started = time.monotonic()
+    with pytest.raises(ConsensusError, match="queued"):
+        fetch_consensus("SYM0", providers, quorum=2)
+    assert time.monotonic() - started < 0.5
+    blocked.result()
+
+
+def test_fmp_provider_requests_are_bounded_by_a_timeout(monkeypatch, fake_server, session):
+    fake_server.script((200, {}, [{"symbol": "AAPL"}]))
+    fake_server.delay = 1.0
+    monkeypatch.setattr(fmp, "FMP_BASE_URL", fake_server.url)
+    monkeypatch.setattr(fmp, "FMP_CACHE_ENABLED", False)
+    monkeypatch.setattr(fmp, "FMP_OFFLINE", False)
+    monkeypatch.setattr(fmp, "FMP_REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(fmp, "_session", session)
+    monkeypatch.setattr(fmp, "rate_limiter", RateLimiter(requests_per_minute=60000, max_retries=0))
+
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        FMPProvider().fetch("AAPL")
+    assert time.monotonic() - started < 0.8
+
+
+def test_failed_provider_is_reported(fixtures, tmp_path):
+    providers = [
+        FixtureProvider("a", fixtures["a"]),
+        FixtureProvider("b", fixtures["b"]),
+        FixtureProvider("empty", tmp_path / "missing"),
+    ]
+
+    result = fetch_consensus("SYM1", providers, quorum=2)
+    assert sorted(result.sources) == ["a", "b"]
+    assert result.payload["symbol"] == "SYM1"
+
+    with pytest.raises(ConsensusError, match="FileNotFoundError"):
+        fetch_consensus("SYM1", providers, quorum=3)
+
+
+def test_aggregate_median_and_agreement():
+    payloads = {
+        "a": {"peRatioTTM": 20.0, "currency": "USD"},
+        "b": {"peRatioTTM": 21.0, "currency": "USD"},
+        "c": {"peRatioTTM": 40.0},
+    }
+
+    consensus, agreement = aggregate_payloads(payloads, tolerance=0.05)
+
+    assert consensus["peRatioTTM"] == 21.0
+    assert consensus["currency"] == "USD"
+    assert agreement["peRatioTTM"]["sources"] == 3
+    assert agreement["peRatioTTM"]["agreement"] == pytest.approx(2 / 3)
+    assert agreement["peRatioTTM"]["spread"] == pytest.approx(20.0 / 21.0)
+
+
+def test_aggregate_trimmed_mean_drops_outliers():
+    payloads = {name: {"x": value} for name, value in zip("abcde", [1.0, 2.0, 3.0, 4.0, 100.0])}
+
+    consensus, _ = aggregate_payloads(payloads, method="trimmed_mean", trim=0.2)
+
+    assert consensus["x"] == pytest.approx(3.0)
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.publication import PublishedState, build_publication_batches, decode_batch, quantize_scores
+
+
+def test_quantize_rejects_nan_scores():
+    with pytest.raises(ValueError, match="NaN"):
+        quantize_scores([0.5, np.nan])
+
+
+def test_quantize_clips_to_unit_range():
+    assert quantize_scores([-0.2, 0.12345, 1.7]).tolist() == [0, 1234, 10000]
+
+
+def test_nan_scores_are_left_out_and_keep_their_published_value(tmp_path):
+    state = PublishedState(str(tmp_path / "state.json"))
+    first = pd.DataFrame({'ticker': ['AAA', 'BBB', 'CCC'], 'index_score': [0.1, 0.2, 0.3]})
+    _, state = build_publication_batches(first, state, timestamp=0)
+
+    second = pd.DataFrame({'ticker': ['AAA', 'BBB', 'CCC', 'DDD'], 'index_score': [0.15, np.nan, 0.3, np.nan]})
+    batches, new_state = build_publication_batches(second, state, timestamp=0)
+
+    assert len(batches) == 1
+    assert decode_batch(batches[0].payload, state)['scores'] == {'AAA': 1500}
+    assert new_state.scores == {'AAA': 1500, 'BBB': 2000, 'CCC': 3000}
+    assert 'DDD' not in new_state.ticker_ids
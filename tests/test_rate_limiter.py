@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from app.clients.rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+
+
+def fast_limiter(**kwargs):
+    settings = dict(requests_per_minute=60000, burst=50, max_retries=3, backoff_base=0.01, backoff_max=0.05)
+    settings.update(kwargs)
+    return RateLimiter(**settings)
+
+
+def test_429_waits_for_retry_after_and_throttles(fake_server, session):
+    fake_server.script((429, {"Retry-After": "1"}, {"error": "slow down"}), (200, {}, [{"ok": True}]))
+    limiter = fast_limiter()
+
+    started = time.monotonic()
+    response = limiter.get(session, f"{fake_server.url}/ratios-ttm")
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    assert response.json() == [{"ok": True}]
+    assert len(fake_server.requests) == 2
+    assert elapsed >= 0.95
+    # Halved by the 429, then one recovery step for the success
+    assert limiter.bucket.rate_per_minute == pytest.approx(30000 + 3000)
+
+
+def test_pause_blocks_requests_until_deadline(fake_server, session):
+    fake_server.script((200, {}, []))
+    limiter = fast_limiter()
+    limiter.bucket.pause(0.5)
+    started = time.monotonic()
+    limiter.get(session, fake_server.url)
+    assert time.monotonic() - started >= 0.45
+
+
+def test_5xx_is_retried_until_success(fake_server, session):
+    fake_server.script((503, {}, None), (502, {}, None), (200, {}, [{"symbol": "AAPL"}]))
+    limiter = fast_limiter()
+
+    response = limiter.get(session, f"{fake_server.url}/key-metrics-ttm")
+
+    assert response.status_code == 200
+    assert response.json() == [{"symbol": "AAPL"}]
+    assert len(fake_server.requests) == 3
+    # 5xx responses do not throttle the rate
+    assert limiter.bucket.rate_per_minute == limiter.requests_per_minute
+
+
+def test_5xx_returns_last_response_after_max_retries(fake_server, session):
+    fake_server.script((500, {}, None))
+    limiter = fast_limiter(max_retries=2)
+
+    response = limiter.get(session, fake_server.url)
+
+    assert response.status_code == 500
+    assert len(fake_server.requests) == 3
+
+
+def test_rate_recovers_after_throttling(fake_server, session):
+    fake_server.script((429, {"Retry-After": "0"}, None), (200, {}, []))
+    limiter = fast_limiter()
+    limiter.get(session, fake_server.url)
+    rates = [limiter.bucket.rate_per_minute]
+
+    for _ in range(12):
+        limiter.get(session, fake_server.url)
+        rates.append(limiter.bucket.rate_per_minute)
+
+    assert rates[0] == pytest.approx(33000)
+    assert rates == sorted(rates)
+    assert rates[-1] == limiter.requests_per_minute
+
+
+def test_repeated_429_does_not_go_below_min_rate(fake_server, session):
+    fake_server.script((429, {"Retry-After": "0"}, None))
+    limiter = fast_limiter(requests_per_minute=60000, min_requests_per_minute=20000, max_retries=4)
+
+    response = limiter.get(session, fake_server.url)
+
+    assert response.status_code == 429
+    assert len(fake_server.requests) == 5
+    assert limiter.bucket.rate_per_minute == 20000
+
+
+def test_token_bucket_paces_requests_beyond_burst():
+    bucket = TokenBucket(rate_per_minute=600, burst=2)
+
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+
+    # Two from the burst, then three at 10 per second
+    assert time.monotonic() - started >= 0.28
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), ("7", 7.0), ("-3", 0.0), ("soon", None)])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
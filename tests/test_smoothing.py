@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.smoothing import DAY, SMOOTHED_COLUMN, STD_COLUMN, ScoreSmoother, ema_step, smooth_index_scores
+from app.services.snapshot_store import SnapshotStore
+
+
+def test_rebuild_replays_every_run_and_matches_the_live_state(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    live = ScoreSmoother(str(tmp_path / "live.json"))
+    metrics = pd.DataFrame({'currentRatioTTM': [1.0, 2.0, 3.0]}, index=pd.Index(['AAA', 'BBB', 'CCC'], name='ticker'))
+
+    # A full run followed by two intraday refreshes on the same date
+    for scores in ([0.2, 0.5, 0.8], [0.3, 0.5, 0.7], [0.4, np.nan, 0.6]):
+        indexes_df = pd.DataFrame({'ticker': metrics.index, 'index_score': scores})
+        indexes_df = smooth_index_scores(indexes_df, live)
+        store.append(metrics, {'currentRatioTTM': (0.0, 5.0)}, indexes_df)
+
+    rebuilt = ScoreSmoother(str(tmp_path / "rebuilt.json")).rebuild(store)
+
+    assert len(store.runs(store.dates()[0])) == 3
+    pd.testing.assert_frame_equal(rebuilt.frame(), live.frame())
+    assert rebuilt.count.tolist() == [3, 2, 3]
+
+
+def test_same_timestamp_update_is_not_ignored():
+    ema, variance = np.array([0.5]), np.array([0.0])
+    last_ts, count = np.array([0.0]), np.array([0])
+    ema_step(ema, variance, last_ts, count, np.array([0.5]), 1000.0, 7 * DAY)
+
+    ema_step(ema, variance, last_ts, count, np.array([0.9]), 1000.0, 7 * DAY)
+
+    assert 0.5 < ema[0] < 0.9
+    assert variance[0] > 0
+    assert count[0] == 2
+
+
+def test_update_weight_follows_the_elapsed_half_lives():
+    smoother = ScoreSmoother("unused.json", half_life_days=1.0)
+    smoother.update(pd.Series({'AAA': 0.0}), timestamp=0.0)
+
+    frame = smoother.update(pd.Series({'AAA': 1.0}), timestamp=DAY)
+
+    assert frame.loc['AAA', SMOOTHED_COLUMN] == pytest.approx(0.5)
+    assert frame.loc['AAA', STD_COLUMN] == pytest.approx(0.5)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.calculate_index import calculate_all_companies_indexes
+from app.services.calculate_min_max import calculate_metric_boundaries
+from app.services.validation import INCONSISTENT, JUMP, OUTLIER, OUT_OF_RANGE, robust_stats, validate_metrics
+
+METRIC = 'interestCoverageRatioTTM'
+
+
+def universe(extremes=(400.0, 250.0, 120.0), peers=20, day=0):
+    """
+    Peers around 8 plus a few stably extreme companies, with ~1% day-to-day drift.
+    """
+    base = np.concatenate([8.0 + np.random.default_rng(0).normal(0, 1.0, peers), extremes])
+    drift = 1.0 + np.random.default_rng(day + 1).normal(0, 0.01, len(base))
+    tickers = [f"P{i:02d}" for i in range(peers)] + [f"X{i}" for i in range(len(extremes))]
+    frame = pd.DataFrame({METRIC: base * drift, 'currentRatioTTM': 1.5, 'quickRatioTTM': 1.0},
+                         index=pd.Index(tickers, name='ticker'))
+    return frame
+
+
+def stacked_history(snapshots):
+    return pd.concat(snapshots)
+
+
+def test_stably_extreme_companies_are_not_flagged():
+    today = universe()
+    history = stacked_history([universe(day=day) for day in range(5)])
+
+    result = validate_metrics(today, history=history, previous=universe(day=4))
+
+    assert (result.flags.loc[['X0', 'X1', 'X2'], METRIC] == 0).all()
+    pd.testing.assert_frame_equal(result.cleaned, today)
+
+
+def test_validation_does_not_lower_scores_of_extreme_companies():
+    # Reproduces extreme interest coverage against peers around 8
+    today = universe()
+    boundaries = calculate_metric_boundaries(today)
+    raw = calculate_all_companies_indexes(today, boundaries).set_index('ticker')
+
+    for history in (None, stacked_history([universe(day=day) for day in range(5)])):
+        result = validate_metrics(today, history=history, previous=universe(day=4))
+        cleaned = calculate_all_companies_indexes(result.cleaned, boundaries).set_index('ticker')
+        np.testing.assert_allclose(cleaned.loc[['X0', 'X1', 'X2'], 'Solvency_score'],
+                                   raw.loc[['X0', 'X1', 'X2'], 'Solvency_score'])
+        assert (cleaned.loc[['X0', 'X1', 'X2'], 'Solvency_score'] == 1.0).all()
+
+
+def test_one_off_spike_falls_back_to_previous_value():
+    history = stacked_history([universe(day=day) for day in range(5)])
+    previous = universe(day=4)
+    today = universe(day=5)
+    today.loc['P03', METRIC] = 9000.0
+
+    result = validate_metrics(today, history=history, previous=previous, previous_age_days=1.0)
+
+    assert result.flags.loc['P03', METRIC] & OUTLIER
+    assert result.flags.loc['P03', METRIC] & JUMP
+    assert result.replaced.loc['P03', METRIC]
+    assert result.cleaned.loc['P03', METRIC] == pytest.approx(previous.loc['P03', METRIC], abs=0.1)
+    # The spike does not leak into other tickers
+    assert int((result.flags[METRIC] != 0).sum()) == 1
+
+
+def test_spike_without_a_good_previous_value_uses_the_ticker_median():
+    history = stacked_history([universe(day=day) for day in range(5)])
+    previous = universe(day=4)
+    previous.loc['X0', METRIC] = 50000.0
+    today = universe()
+    today.loc['X0', METRIC] = 60000.0
+
+    result = validate_metrics(today, history=history, previous=previous)
+
+    assert result.flags.loc['X0', METRIC] & OUTLIER
+    assert result.cleaned.loc['X0', METRIC] == pytest.approx(400.0, rel=0.02)
+
+
+def test_flagged_values_are_never_blanked():
+    today = universe()
+    today.loc['P01', 'quickRatioTTM'] = 3.0  # above the current ratio
+    today.loc['P02', 'currentRatioTTM'] = -1.0
+
+    result = validate_metrics(today)
+
+    assert result.flags.loc['P01', 'quickRatioTTM'] & INCONSISTENT
+    assert result.flags.loc['P02', 'currentRatioTTM'] & OUT_OF_RANGE
+    assert not result.cleaned[[METRIC, 'currentRatioTTM', 'quickRatioTTM']].isna().any().any()
+
+
+def test_short_history_is_not_outlier_checked():
+    history = stacked_history([universe(day=day) for day in range(2)])
+    today = universe()
+    today.loc['P00', METRIC] = 9000.0
+
+    result = validate_metrics(today, history=history, min_history=3)
+
+    assert result.flags.loc['P00', METRIC] == 0
+
+
+def test_circuit_breaker_trips_when_many_cells_are_flagged():
+    today = universe()
+    today['quickRatioTTM'] = 5.0
+
+    result = validate_metrics(today, circuit_breaker_fraction=0.25)
+
+    assert result.tripped
+    assert result.flagged_fraction == pytest.approx(1 / 3)
+
+
+def test_robust_stats_are_per_ticker():
+    history = pd.DataFrame({METRIC: [1.0, 2.0, 3.0, 100.0, 110.0, 120.0]}, index=['A', 'A', 'A', 'B', 'B', 'B'])
+
+    median, scale = robust_stats(history, [METRIC], pd.Index(['A', 'B', 'C']))
+
+    np.testing.assert_allclose(median[:2, 0], [2.0, 110.0])
+    np.testing.assert_allclose(scale[:2, 0], [1.4826, 14.826])
+    assert np.isnan(median[2, 0]) and np.isnan(scale[2, 0])